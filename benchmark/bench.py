@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""Benchmark delle fasi della pipeline su un repository sintetico (vedi genrepo.py).
+
+Misura separatamente, ripetendo ogni fase e tenendo la mediana:
+
+  collect_daily_tsv          git log --numstat + aggregazione awk (cache disattivata)
+  collect_daily_tsv_cached   lo stesso con la cache per-commit già calda
+  collect_daily_tsv_python   lo stesso con git_stats_engine.py (--engine python)
+  collect_ownership_tsv      git blame dell'albero a fine periodo (cache disattivata)
+  emit_json / emit_text      serializzazione del TSV giornaliero
+  multiproject_collector     git_multiproject_stats_collector.sh su due repository
+  plot_git_flatten / plot_multiproject_flatten   JSON -> DataFrame, in processo
+  plot_git_render / plot_multiproject_render     plotter completo (processo nuovo)
+  plot_git_summary           plot_git.py --summary-json (processo nuovo, senza matplotlib)
+  warehouse_ingest           JSON multi-progetto -> database SQLite (git_activity_warehouse.py)
+  warehouse_load             database -> JSON multi-progetto sull'intero periodo, in processo
+
+Le funzioni del collector sono chiamate una per una includendo git_stats_collector.sh
+con `source` (main parte solo quando lo script è eseguito direttamente), quindi si
+misura esattamente il codice usato in produzione, non una copia.
+
+Memoria dei file distinti: picco RSS della fase aggregate (--timings) dei due collector
+con conteggio esatto e con --approx-files, più l'errore della stima rispetto all'esatto
+(sezione "files_memory" dei risultati). Con --vendor-lines grande e --vendor-file-lines 1
+il commit vendorizzato tocca moltissimi file, il caso per cui esiste --approx-files.
+
+Controlli di equivalenza (il benchmark fallisce se uno non passa):
+  - TSV giornaliero identico fra motore awk e python;
+  - output json e text del collector identici fra --engine awk e --engine python (anche
+    con --approx-files);
+  - riepilogo per autore (plot_git.py --summary-json) identico fra JSON classico e
+    colonnare (v3), e fra JSON del collector e lo stesso JSON riletto dal database
+    (plot_git.py --from-db);
+  - ownership (sottocomando `ownership`, git blame --incremental) identica al conteggio
+    riga per riga di `git blame --line-porcelain`, e così ogni punto della serie mensile
+    (git_stats_engine.py ownership-series, diff propagati) al suo commit di riferimento.
+Inoltre plot_git.py --summary-json non deve importare matplotlib (`python3 -X importtime`):
+il riepilogo esiste per evitarne il costo, e il suo tempo è la fase plot_git_summary.
+
+Risultati in JSON (--output); con --baseline si confrontano con una esecuzione salvata:
+una fase è una regressione se è più lenta di oltre --threshold (frazione) E di oltre
+--min-delta secondi (le fasi da pochi millisecondi oscillano troppo in percentuale).
+
+Uso:
+  bench.py [--repo DIR | --commits N ...] [--since DATA] [--until DATA]
+           [--repeat 3] [--output risultati.json]
+           [--baseline base.json] [--threshold 0.25] [--min-delta 0.05]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.realpath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+COLLECTOR = os.path.join(ROOT, "git_stats_collector.sh")
+MULTI_COLLECTOR = os.path.join(ROOT, "git_multiproject_stats_collector.sh")
+WAREHOUSE = os.path.join(ROOT, "git_activity_warehouse.py")
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, ROOT)
+import genrepo  # noqa: E402
+import git_activity_warehouse  # noqa: E402
+
+# Fasi del collector: ognuna aggiunge a $STAGE_TIMES "nome<TAB>inizio<TAB>fine" (EPOCHREALTIME).
+# Non $TIMINGS: è una variabile globale del collector (--timings), riassegnata dal `source`.
+# Le variabili tmpdir/alias_tsv/ownership_* sono quelle che main() tiene come locali.
+STAGES_SCRIPT = r'''
+set -o pipefail
+source "$COLLECTOR" $CACHE_FLAG "$START" "$END" json
+cd "$REPO" || exit 1
+tmpdir=$(mktemp -d)
+trap 'rm -rf "$tmpdir"' EXIT
+alias_tsv="$tmpdir/aliases.tsv"
+dump_aliases_tsv > "$alias_tsv"
+[[ -s "$alias_tsv" ]] || alias_tsv=""
+project=$(basename "$(git rev-parse --show-toplevel)")
+ENGINE_MODULE=$(find_engine_module)
+ownership_tsv="" ownership_ref="" ownership_ref_date=""
+
+stage() {
+    local name="$1" s e
+    shift
+    s=$EPOCHREALTIME
+    "$@"
+    e=$EPOCHREALTIME
+    printf '%s\t%s\t%s\n' "$name" "$s" "$e" >> "$STAGE_TIMES"
+}
+
+if [[ "$CACHE_FLAG" == --no-cache ]]; then
+    stage collect_daily_tsv collect_daily_tsv "$alias_tsv" "$tmpdir" > "$OUT/daily.tsv"
+    stage collect_daily_tsv_python collect_daily_tsv_python "$alias_tsv" "$tmpdir" > "$OUT/daily_py.tsv"
+    stage collect_ownership_tsv collect_ownership_for_json
+    stage emit_json emit_json "$OUT/daily.tsv" "$project" "$ownership_tsv" "$ownership_ref" "$ownership_ref_date" > "$OUT/emit.json"
+    stage emit_text emit_text "$OUT/daily.tsv" TOTALE > "$OUT/emit.txt"
+else
+    collect_daily_tsv "$alias_tsv" "$tmpdir" > /dev/null   # riempie la cache
+    stage collect_daily_tsv_cached collect_daily_tsv "$alias_tsv" "$tmpdir" > /dev/null
+fi
+'''
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repo", help="repository esistente da usare invece di generarne uno")
+    parser.add_argument("--since", help="inizio del periodo analizzato (default: primo commit)")
+    parser.add_argument("--until", help="fine del periodo analizzato (default: ultimo commit)")
+    parser.add_argument("--repeat", type=int, default=3, help="ripetizioni per fase (mediana)")
+    parser.add_argument("--output", help="file JSON dei risultati")
+    parser.add_argument("--baseline", help="risultati di riferimento da confrontare")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="rallentamento massimo tollerato, in frazione (default 0.25)")
+    parser.add_argument("--min-delta", type=float, default=0.05,
+                        help="rallentamento assoluto minimo (s) per segnalare una regressione")
+    parser.add_argument("--keep", action="store_true", help="non cancella la cartella di lavoro")
+    gen = parser.add_argument_group("repository sintetico (vedi genrepo.py)")
+    defaults = genrepo.parse_args(["-"])
+    for name, value in genrepo.params_of(defaults).items():
+        gen.add_argument("--" + name.replace("_", "-"), type=type(value), default=value)
+    return parser.parse_args(argv)
+
+
+def run(cmd, **kwargs):
+    return subprocess.run(cmd, check=True, capture_output=True, **kwargs)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def collector_stages(repo, start, end, workdir, env, cache):
+    """Tempi (s) delle fasi del collector in una esecuzione di STAGES_SCRIPT."""
+    timings = os.path.join(workdir, "timings.tsv")
+    open(timings, "w").close()
+    env = dict(env, COLLECTOR=COLLECTOR, REPO=repo, START=start, END=end, OUT=workdir,
+               STAGE_TIMES=timings, CACHE_FLAG="" if cache else "--no-cache")
+    proc = subprocess.run(["bash", "-c", STAGES_SCRIPT], env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"fasi del collector fallite:\n{proc.stderr.decode(errors='replace')}")
+    with open(timings) as fh:
+        lines = fh.read().splitlines()
+    times = {}
+    for line in lines:
+        name, s, e = line.split("\t")
+        times[name] = float(e.replace(",", ".")) - float(s.replace(",", "."))
+    return times
+
+
+def plotter_flatten(module_name, payload_text):
+    import importlib
+    plotter = importlib.import_module(module_name)
+    plotter.import_numeric()
+    payload = json.loads(payload_text)
+    saved = sys.stdout
+    sys.stdout = io.StringIO()   # messaggi informativi del plotter
+    try:
+        return timed(lambda: plotter.flatten(payload, {}))
+    finally:
+        sys.stdout = saved
+
+
+def plotter_render(script, payload_text, workdir):
+    png = os.path.join(workdir, "render.png")
+    return timed(lambda: run([sys.executable, os.path.join(ROOT, script), "--output", png],
+                             input=payload_text.encode(), cwd=workdir))
+
+
+def plotter_summary(payload_text, workdir):
+    return timed(lambda: run([sys.executable, os.path.join(ROOT, "plot_git.py"), "--summary-json"],
+                             input=payload_text.encode(), cwd=workdir))
+
+
+def summary_imports(payload_text, workdir):
+    """Moduli importati da plot_git.py --summary-json, dalle righe di -X importtime su stderr
+    ("import time: self | cumulativo | modulo")."""
+    proc = run([sys.executable, "-X", "importtime", os.path.join(ROOT, "plot_git.py"), "--summary-json"],
+               input=payload_text.encode(), cwd=workdir)
+    return {line.rsplit("|", 1)[1].strip() for line in proc.stderr.decode(errors="replace").splitlines()
+            if line.startswith("import time:") and line.count("|") == 2}
+
+
+def line_porcelain_ownership(repo, end, rev=None):
+    """Ownership di riferimento (nomi grezzi): righe per autore contate una per una da
+    `git blame --line-porcelain`, sui file di testo dell'albero all'ultimo commit <= end
+    (o al commit `rev`)."""
+    git = ["git", "-C", repo]
+    if rev is None:
+        rev = run(git + ["rev-list", "-1", f"--before={end} 23:59:59", "HEAD"]).stdout.decode().strip()
+    empty = run(git + ["hash-object", "-t", "tree", "/dev/null"]).stdout.decode().strip()
+    binary = set()
+    for entry in run(git + ["diff", "--numstat", "-z", "--no-renames", empty, rev]).stdout.split(b"\0"):
+        parts = entry.split(b"\t", 2)
+        if len(parts) == 3 and parts[0] == b"-":
+            binary.add(parts[2])
+    lines = {}
+    for entry in run(git + ["ls-tree", "-r", "-z", rev]).stdout.split(b"\0"):
+        meta, _, path = entry.partition(b"\t")
+        if meta.split(b" ")[1:2] != [b"blob"] or path in binary:
+            continue
+        blame = run(git + ["blame", "--line-porcelain", rev, "--", os.fsdecode(path)]).stdout
+        for line in blame.splitlines():
+            if line.startswith(b"author "):
+                author = line[7:].decode("utf-8", "surrogateescape")
+                lines[author] = lines.get(author, 0) + 1
+    return lines
+
+
+def equivalence_checks(repo, start, end, workdir, env):
+    checks = {}
+    daily = [sorted(open(os.path.join(workdir, name), "rb").read().splitlines())
+             for name in ("daily.tsv", "daily_py.tsv")]   # python non ordina le righe
+    checks["daily_tsv_awk_eq_python"] = daily[0] == daily[1]
+    for fmt in ("json", "text"):
+        outputs = [run(["bash", COLLECTOR, "--no-cache", "--engine", engine, start, end, fmt],
+                       cwd=repo, env=env).stdout for engine in ("awk", "python")]
+        checks[f"collector_{fmt}_awk_eq_python"] = outputs[0] == outputs[1]
+    outputs = [run(["bash", COLLECTOR, "--no-cache", "--no-ownership", "--approx-files",
+                    "--engine", engine, start, end, "json"], cwd=repo, env=env).stdout
+               for engine in ("awk", "python")]
+    checks["collector_approx_files_awk_eq_python"] = outputs[0] == outputs[1]
+    classic = run(["bash", COLLECTOR, "--no-ownership", start, end, "json"], cwd=repo, env=env).stdout
+    columnar = run(["bash", COLLECTOR, "--no-ownership", "--columnar", start, end, "json"],
+                   cwd=repo, env=env).stdout
+    summaries = [run([sys.executable, os.path.join(ROOT, "plot_git.py"), "--summary-json"],
+                     input=payload).stdout for payload in (classic, columnar)]
+    checks["summary_classic_eq_columnar"] = summaries[0] == summaries[1]
+    db = os.path.join(workdir, "equivalence.db")
+    run([sys.executable, WAREHOUSE, "ingest", "--db", db], input=classic)
+    from_db = run([sys.executable, os.path.join(ROOT, "plot_git.py"), "--summary-json",
+                   "--from-db", db, "--start", start, "--end", end]).stdout
+    checks["summary_collector_eq_warehouse"] = summaries[0] == from_db
+    ownership = {}
+    for line in run(["bash", COLLECTOR, "--no-cache", "ownership", end], cwd=repo, env=env).stdout.splitlines():
+        author, _, count = line.decode("utf-8", "surrogateescape").partition("\t")
+        if author != "#":
+            ownership[author] = int(count)
+    checks["ownership_eq_line_porcelain"] = ownership == line_porcelain_ownership(repo, end)
+    series = json.loads(run([sys.executable, os.path.join(ROOT, "git_stats_engine.py"), "ownership-series",
+                             "--start", start, "--end", end, "--period", "month"], cwd=repo).stdout)
+    checks["ownership_series_eq_line_porcelain"] = len(series["points"]) > 1 and all(
+        {a: n for a, n in zip(series["authors"], p["lines"]) if n}
+        == line_porcelain_ownership(repo, end, p["ref_commit"]) for p in series["points"])
+    return checks
+
+
+def aggregate_record(payload):
+    """Fase di aggregazione da metadata.timings: (secondi, picco RSS in KB), sommati sui repository."""
+    stages = [s for s in payload["metadata"]["timings"]["stages"] if s["stage"] == "aggregate"]
+    return sum(s["wall_s"] for s in stages), sum(s["peak_rss_kb"] for s in stages)
+
+
+def files_memory(repo, repo2, start, end, env):
+    """Picco di memoria e durata dell'aggregazione, conteggio esatto contro --approx-files,
+    ed errore relativo della stima sui file per autore (collector singolo: somma dei giorni;
+    multi-progetto: distinti nel periodo)."""
+    result = {}
+    for name, cmd in (("single", ["bash", COLLECTOR, "--no-cache", "--no-ownership", "--timings"]),
+                      ("multi", ["bash", MULTI_COLLECTOR, "--timings"])):
+        tail = [start, end, "json"] if name == "single" else [start, end, repo, repo2]
+        payloads = {mode: json.loads(run(cmd + extra + tail, cwd=repo, env=env).stdout)
+                    for mode, extra in (("exact", []), ("approx_files", ["--approx-files"]))}
+        files = {}
+        for mode, payload in payloads.items():
+            for entry in payload["data"]:
+                key = (entry.get("project", ""), entry["author"])
+                files[mode, key] = entry["files"] if name == "multi" else \
+                    sum(d["files"] for d in entry["daily_data"])
+        errors = [abs(files["approx_files", key] - n) / n
+                  for (mode, key), n in files.items() if mode == "exact" and n]
+        record = {}
+        for mode, payload in payloads.items():
+            wall, rss = aggregate_record(payload)
+            record[mode] = {"aggregate_s": round(wall, 3), "peak_rss_kb": rss}
+        record["max_rel_error"] = round(max(errors, default=0.0), 4)
+        result[name] = record
+    return result
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Righe di confronto e numero di regressioni rispetto alla baseline."""
+    lines, regressions = [], 0
+    if baseline.get("params") != results.get("params"):
+        lines.append("Avviso: la baseline è stata misurata con parametri del repository diversi.")
+    for stage, cur in results["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        ratio = cur["median"] / base["median"] if base["median"] else float("inf")
+        slower = cur["median"] > base["median"] * (1 + threshold) and \
+            cur["median"] - base["median"] > min_delta
+        regressions += slower
+        lines.append(f"{'REGRESSIONE' if slower else 'ok':<11} {stage:<28} "
+                     f"{base['median']:8.3f}s -> {cur['median']:8.3f}s  ({ratio:5.2f}x)")
+    return lines, regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="git-activity-bench-")
+    # Cache dei collector isolata: né quella dell'utente né residui di run precedenti
+    env = dict(os.environ, GIT_ACTIVITY_CACHE_DIR=os.path.join(workdir, "cache"), LC_ALL="C.UTF-8")
+    try:
+        params = None
+        if args.repo:
+            repo = os.path.abspath(args.repo)
+        else:
+            repo = os.path.join(workdir, "repo")
+            params = {k: getattr(args, k) for k in genrepo.params_of(genrepo.parse_args(["-"]))}
+            print(f"Generazione repository sintetico ({args.commits} commit)...", file=sys.stderr)
+            if genrepo.main([repo] + [f"--{k.replace('_', '-')}={v}" for k, v in params.items()]):
+                return 1
+        # Secondo repository per il collector multi-progetto: un clone locale (hardlink)
+        repo2 = os.path.join(workdir, "repo2")
+        run(["git", "clone", "-q", "--local", repo, repo2])
+
+        log_dates = run(["git", "-C", repo, "log", "--format=%ad", "--date=short"]).stdout.split()
+        start = args.since or min(log_dates).decode()
+        end = args.until or max(log_dates).decode()
+
+        samples = {}
+
+        def add(stage, seconds):
+            samples.setdefault(stage, []).append(seconds)
+
+        for i in range(args.repeat):
+            print(f"Ripetizione {i + 1}/{args.repeat}...", file=sys.stderr)
+            for stage, seconds in collector_stages(repo, start, end, workdir, env, cache=False).items():
+                add(stage, seconds)
+            for stage, seconds in collector_stages(repo, start, end, workdir, env, cache=True).items():
+                add(stage, seconds)
+            add("multiproject_collector", timed(lambda: run(
+                ["bash", MULTI_COLLECTOR, start, end, repo, repo2], env=env)))
+
+        single_json = open(os.path.join(workdir, "emit.json")).read()
+        multi_json = run(["bash", MULTI_COLLECTOR, start, end, repo, repo2], env=env).stdout.decode()
+        for i in range(args.repeat):
+            add("plot_git_flatten", plotter_flatten("plot_git", single_json))
+            add("plot_multiproject_flatten", plotter_flatten("plot_multiproject", multi_json))
+            add("plot_git_render", plotter_render("plot_git.py", single_json, workdir))
+            add("plot_multiproject_render", plotter_render("plot_multiproject.py", multi_json, workdir))
+            add("plot_git_summary", plotter_summary(single_json, workdir))
+            db = os.path.join(workdir, f"warehouse{i}.db")
+            add("warehouse_ingest", timed(lambda: run([sys.executable, WAREHOUSE, "ingest", "--db", db],
+                                                      input=multi_json.encode())))
+            add("warehouse_load", timed(lambda: git_activity_warehouse.load_payload(db, start, end)))
+
+        print("Memoria dei file distinti (esatto / --approx-files)...", file=sys.stderr)
+        memory = files_memory(repo, repo2, start, end, env)
+
+        print("Controlli di equivalenza...", file=sys.stderr)
+        checks = equivalence_checks(repo, start, end, workdir, env)
+        checks["summary_json_without_matplotlib"] = not any(
+            m == "matplotlib" or m.startswith("matplotlib.") for m in summary_imports(single_json, workdir))
+
+        results = {
+            "metadata": {
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "revision": subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                                           capture_output=True, text=True).stdout.strip(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "repo": args.repo or "sintetico",
+                "period": [start, end],
+                "repeat": args.repeat,
+            },
+            "params": params,
+            "stages": {stage: {"median": round(statistics.median(v), 4),
+                               "min": round(min(v), 4),
+                               "runs": [round(x, 4) for x in v]}
+                       for stage, v in samples.items()},
+            "files_memory": memory,
+            "checks": checks,
+        }
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"Cartella di lavoro: {workdir}", file=sys.stderr)
+
+    for stage, r in results["stages"].items():
+        print(f"{stage:<28} {r['median']:8.3f}s  (min {r['min']:.3f}s)")
+    for name, r in results["files_memory"].items():
+        print(f"{'files_memory_' + name:<28} RSS {r['exact']['peak_rss_kb'] / 1024:7.1f} MB -> "
+              f"{r['approx_files']['peak_rss_kb'] / 1024:7.1f} MB con --approx-files "
+              f"({r['exact']['aggregate_s']:.3f}s -> {r['approx_files']['aggregate_s']:.3f}s, "
+              f"errore max {r['max_rel_error']:.1%})")
+    failed = [name for name, ok in checks.items() if not ok]
+    for name, ok in checks.items():
+        print(f"{'ok' if ok else 'DIVERSO':<11} {name}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+            fh.write("\n")
+
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            lines, regressions = compare(results, json.load(fh), args.threshold, args.min_delta)
+        print(f"\nConfronto con {args.baseline} (soglia +{args.threshold:.0%}, min {args.min_delta}s):")
+        print("\n".join(lines))
+
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Genera un repository Git sintetico, riproducibile, per i benchmark (vedi bench.py).
+
+La storia è scritta con `git fast-import` (nessun checkout per commit), quindi anche
+decine di migliaia di commit si generano in pochi secondi. Stesso seme, stessi
+parametri -> stessi SHA: due esecuzioni di bench.py su macchine diverse misurano lo
+stesso lavoro.
+
+Cosa contiene, regolabile da riga di comando:
+  - N commit distribuiti su un periodo, orari concentrati in orario lavorativo;
+  - A autori (più una seconda identità per il primo, "Autore 00 (laptop)", per
+    esercitare gli alias);
+  - file di testo modificati a ogni commit (righe aggiunte e rimosse), creati man mano
+    fino a un massimo;
+  - rename puri (rilevati da git log come tali), una frazione dei commit;
+  - file binari (numstat "-"), una frazione dei commit;
+  - un singolo commit vendorizzato molto grande a metà storia (vendor/), il caso che
+    gonfia il churn e pesa su blame; con --vendor-file-lines piccolo diventa invece un
+    commit da moltissimi file (il caso che pesa sulla memoria dei file distinti).
+
+Uso:
+  genrepo.py DEST [--commits 2000] [--authors 20] [--max-files 400]
+             [--files-per-commit 4] [--renames 0.02] [--binary 0.01]
+             [--vendor-lines 100000] [--vendor-file-lines 5000]
+             [--start 2025-01-01] [--days 365] [--seed 1]
+"""
+
+import argparse
+import datetime
+import os
+import random
+import subprocess
+import sys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dest", help="cartella del repository (non deve esistere)")
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--authors", type=int, default=20)
+    parser.add_argument("--max-files", type=int, default=400)
+    parser.add_argument("--files-per-commit", type=int, default=4,
+                        help="media dei file di testo toccati per commit")
+    parser.add_argument("--renames", type=float, default=0.02,
+                        help="frazione di commit che rinominano un file")
+    parser.add_argument("--binary", type=float, default=0.01,
+                        help="frazione di commit che aggiungono/modificano un file binario")
+    parser.add_argument("--vendor-lines", type=int, default=100000,
+                        help="righe del commit vendorizzato (0 = nessuno)")
+    parser.add_argument("--vendor-file-lines", type=int, default=5000,
+                        help="righe per file del commit vendorizzato")
+    parser.add_argument("--start", default="2025-01-01", help="data del primo commit")
+    parser.add_argument("--days", type=int, default=365, help="periodo coperto dai commit")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def params_of(args):
+    """Parametri che determinano il repository (registrati nei risultati di bench.py)."""
+    return {k: v for k, v in vars(args).items() if k != "dest"}
+
+
+class FastImport:
+    """Scrive lo stream di `git fast-import` (dati con lunghezza in byte)."""
+
+    def __init__(self, out):
+        self.out = out
+
+    def data(self, payload):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self.out.write(b"data %d\n" % len(payload))
+        self.out.write(payload)
+        self.out.write(b"\n")
+
+    def commit(self, mark, ident, when, message, ops):
+        stamp = f"{int(when.timestamp())} +0100"
+        self.out.write(f"commit refs/heads/main\nmark :{mark}\n"
+                       f"author {ident} {stamp}\ncommitter {ident} {stamp}\n".encode("utf-8"))
+        self.data(message)
+        for op in ops:
+            if op[0] == "M":
+                self.out.write(f"M 100644 inline {op[1]}\n".encode("utf-8"))
+                self.data(op[2])
+            elif op[0] == "R":
+                self.out.write(f"R {op[1]} {op[2]}\n".encode("utf-8"))
+        self.out.write(b"\n")
+
+
+def commit_times(rnd, n, start, days):
+    """n istanti ordinati nel periodo, per lo più fra le 9 e le 19 dei giorni feriali."""
+    times = []
+    for _ in range(n):
+        day = start + datetime.timedelta(days=rnd.randrange(days))
+        if day.weekday() >= 5 and rnd.random() < 0.8:
+            day -= datetime.timedelta(days=day.weekday() - 4)   # sposta al venerdì
+        hour = rnd.randint(9, 18) if rnd.random() < 0.9 else rnd.randrange(24)
+        times.append(datetime.datetime(day.year, day.month, day.day, hour,
+                                       rnd.randrange(60), rnd.randrange(60),
+                                       tzinfo=datetime.timezone(datetime.timedelta(hours=1))))
+    return sorted(times)
+
+
+def generate(args, out):
+    rnd = random.Random(args.seed)
+    fi = FastImport(out)
+    authors = [f"Autore {i:02d} <autore{i:02d}@example.com>" for i in range(args.authors)]
+    # Seconda identità della stessa persona: i collector la uniscono solo con un alias
+    authors.append("Autore 00 (laptop) <autore00@laptop.example.com>")
+    weights = [1.0 / (i + 1) for i in range(len(authors))]   # pochi autori fanno molto
+
+    files = {}          # percorso -> righe correnti
+    binaries = []
+    start = datetime.date.fromisoformat(args.start)
+    times = commit_times(rnd, args.commits, start, args.days)
+    vendor_at = args.commits // 2 if args.vendor_lines > 0 else -1
+
+    for n, when in enumerate(times, start=1):
+        ident = rnd.choices(authors, weights)[0]
+        ops = []
+        if n - 1 == vendor_at:
+            remaining, k = args.vendor_lines, 0
+            while remaining > 0:
+                size = min(args.vendor_file_lines, remaining)
+                body = "".join(f"var v{k}_{i} = {rnd.randrange(10**9)};\n" for i in range(size))
+                ops.append(("M", f"vendor/lib/pkg{k:03d}.js", body))
+                remaining -= size
+                k += 1
+            fi.commit(n, ident, when, f"Aggiunge dipendenze vendorizzate ({args.vendor_lines} righe)\n", ops)
+            continue
+
+        touched = max(1, min(len(files) + 1, int(rnd.expovariate(1.0 / args.files_per_commit)) + 1))
+        for _ in range(touched):
+            if not files or (len(files) < args.max_files and rnd.random() < 0.15):
+                path = f"src/mod{rnd.randrange(max(1, args.max_files // 20)):02d}/file{len(files):04d}.py"
+                files.setdefault(path, [])
+            else:
+                path = rnd.choice(list(files))
+            lines = files[path]
+            for _ in range(min(len(lines), rnd.randrange(6))):
+                del lines[rnd.randrange(len(lines))]
+            for _ in range(rnd.randint(1, 30)):
+                lines.insert(rnd.randint(0, len(lines)), f"x_{n}_{rnd.randrange(10**6)} = {rnd.random():.6f}\n")
+            ops.append(("M", path, "".join(lines)))
+
+        if files and rnd.random() < args.renames:
+            old = rnd.choice([p for p in files if all(op[1] != p for op in ops)] or [None])
+            if old:
+                new = f"src/renamed/{os.path.basename(old)[:-3]}_{n}.py"
+                ops.append(("R", old, new))
+                files[new] = files.pop(old)
+
+        if rnd.random() < args.binary:
+            if binaries and rnd.random() < 0.5:
+                path = rnd.choice(binaries)
+            else:
+                path = f"assets/blob{len(binaries):03d}.bin"
+                binaries.append(path)
+            ops.append(("M", path, bytes(rnd.randrange(256) for _ in range(2048)) + b"\0"))
+
+        fi.commit(n, ident, when, f"Commit sintetico {n}\n", ops)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if os.path.exists(args.dest):
+        print(f"Errore: {args.dest} esiste già.", file=sys.stderr)
+        return 1
+    subprocess.run(["git", "init", "-q", "-b", "main", args.dest], check=True)
+    proc = subprocess.Popen(["git", "-C", args.dest, "fast-import", "--quiet"],
+                            stdin=subprocess.PIPE)
+    generate(args, proc.stdin)
+    proc.stdin.close()
+    if proc.wait() != 0:
+        print("Errore: git fast-import fallito.", file=sys.stderr)
+        return 1
+    # Albero di lavoro allineato a HEAD: i collector richiedono un work tree
+    subprocess.run(["git", "-C", args.dest, "reset", "-q", "--hard"], check=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,6 +23,10 @@
 #   --threshold <pct>    Quota minima di churn per segnalare un candidato (default: 1.0)
 #   --depth <n>          Profondità delle cartelle aggregate, in numero di segmenti (default: 3)
 #   --top <n>            Massimo numero di candidati mostrati per sezione (default: 20)
+#   --prepare            Scrive/aggiorna prima il commit-graph con filtri di Bloom: le
+#                        ricerche per nome nella storia (Fase 1) scartano senza diff i
+#                        commit che non toccano il path (git >= 2.27; usa il
+#                        sottocomando prepare di git_stats_collector.sh, accanto a questo)
 #   -h, --help           Mostra questo help
 #
 # PARAMETRI POSIZIONALI:
@@ -66,6 +70,7 @@ SINCE=""
 THRESHOLD="1.0"
 DEPTH=3
 TOP=20
+PREPARE=false
 REPO_PATH="."
 
 while [[ $# -gt 0 ]]; do
@@ -78,8 +83,10 @@ while [[ $# -gt 0 ]]; do
             DEPTH="$2"; shift 2 ;;
         --top)
             TOP="$2"; shift 2 ;;
+        --prepare)
+            PREPARE=true; shift ;;
         -h|--help)
-            sed -n '3,66p' "$0" | sed 's/^# \{0,1\}//'
+            sed -n '3,70p' "$0" | sed 's/^# \{0,1\}//'
             exit 0 ;;
         -*)
             echo "Opzione non valida: $1" >&2; exit 1 ;;
@@ -99,6 +106,17 @@ fi
 REPO_PATH="$(git rev-parse --show-toplevel)"
 cd "$REPO_PATH"
 
+# Commit-graph con filtri di Bloom (--prepare): sottocomando `prepare` di
+# git_stats_collector.sh, dove è spiegato cosa ne fa git.
+if [[ "$PREPARE" == true ]]; then
+    collector="$(dirname "$(readlink -f "$0")")/git_stats_collector.sh"
+    if [[ -f "$collector" ]]; then
+        bash "$collector" --no-compare prepare
+    else
+        echo "Avviso: --prepare richiede git_stats_collector.sh accanto a $0, commit-graph non aggiornato." >&2
+    fi
+fi
+
 # Formattazione numerica indipendente dalla locale: con LC_NUMERIC che usa la virgola
 # come separatore decimale, il printf builtin di bash rifiuta un numero come "63.28"
 # prodotto da awk (punto). Facciamo fare ad awk anche l'arrotondamento per la stampa,
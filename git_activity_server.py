@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""Server residente dei report (socket Unix locale), usato dall'estensione VS Code.
+
+Ogni comando dell'estensione lancerebbe altrimenti l'intera pipeline da zero: bash,
+git, awk, due interpreti Python e l'import a freddo di pandas+matplotlib, che da solo
+vale la maggior parte dei secondi di attesa. Questo processo resta in vita e tiene
+caldi:
+
+  - l'interprete con pandas, numpy, matplotlib e i due plotter già importati: il
+    grafico è disegnato IN PROCESSO chiamando main() di plot_git.py /
+    plot_multiproject.py, con lo stesso stdin/argv/cwd che avrebbero da riga di comando;
+  - il JSON del collector per richiesta, finché la storia non cambia: la chiave
+    include lo SHA di HEAD di ogni repository (i collector analizzano HEAD) e la data di
+    modifica del file alias in uso, quindi un nuovo commit, un checkout o un alias
+    modificato invalidano da soli la voce. La raccolta vera resta quella dei collector
+    (con la loro cache per-commit su disco): nessuna seconda implementazione.
+
+Le richieste sono servite una alla volta (il plotter scrive nella cartella corrente del
+processo). Protocollo: una riga JSON per connessione, una riga JSON di risposta.
+
+  richiesta: {"paths": ["/repo", ...], "start": "YYYY-MM-DD", "end": "YYYY-MM-DD",
+              "author": "", "formats": ["png"], "output": "/percorso/report.png"}
+  risposta:  {"ok": true, "png": "/repo/git_stats.png", "files": [...],
+              "warnings": ["Avviso: ..."], "log": "..."}
+             {"ok": false, "error": "..."}
+
+Con un solo path si usa git_stats_collector.sh + plot_git.py (cartella di output: il
+repository), con più path git_multiproject_stats_collector.sh + plot_multiproject.py
+(cartella di output: il primo), come fa l'estensione lanciando gitstats/gitstats-multi.
+"output" (opzionale) è il percorso del PNG, passato al plotter come --output.
+
+Uso:
+
+  git_activity_server.py [--socket PATH]
+
+Socket di default: $GIT_ACTIVITY_SOCKET, altrimenti
+$XDG_RUNTIME_DIR/git-activity-reports.sock, altrimenti server.sock nella cartella
+cache ($GIT_ACTIVITY_CACHE_DIR, default ~/.cache/git-activity-reports).
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+from collections import OrderedDict
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+SOCKET_NAME = "git-activity-reports.sock"
+MAX_CACHED_PAYLOADS = 32
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+# Stesse regex dell'estensione VS Code (src/extension.ts)
+PNG_RES = (
+    re.compile(r"Grafico generato con successo: (.*\.png)"),
+    re.compile(r"Report multi-progetto .* generato con successo: (.*\.png)"),
+)
+EXTRA_RE = re.compile(r"Generato anche: (.*)")
+
+
+def default_socket_path():
+    if os.environ.get("GIT_ACTIVITY_SOCKET"):
+        return os.environ["GIT_ACTIVITY_SOCKET"]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], SOCKET_NAME)
+    cache = os.environ.get("GIT_ACTIVITY_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "git-activity-reports")
+    return os.path.join(cache, "server.sock")
+
+
+# -----------------------------------------------------------------------------
+# Moduli caldi
+# -----------------------------------------------------------------------------
+sys.path.insert(0, SCRIPT_DIR)
+import plot_git  # noqa: E402
+import plot_multiproject  # noqa: E402
+
+# I plotter importano le librerie pesanti solo al bisogno: qui si caricano subito, una volta
+for plotter in (plot_git, plot_multiproject):
+    plotter.import_numeric()
+    plotter.import_plotting()
+import matplotlib.pyplot as plt  # noqa: E402
+
+
+class chdir:
+    """os.chdir reversibile (contextlib.chdir esiste solo da Python 3.11)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.previous = os.getcwd()
+        os.chdir(self.path)
+
+    def __exit__(self, *exc):
+        os.chdir(self.previous)
+
+
+def render(plotter, payload_text, formats, output=None):
+    """Esegue main() del plotter nella cartella corrente, come `... | plotter --formats`.
+
+    Restituisce (exit code, stdout). sys.exit() dei plotter (input vuoto, nessun dato nel
+    periodo) è intercettato; le figure sono chiuse comunque, il processo vive a lungo.
+    """
+    out = io.StringIO()
+    saved = sys.argv, sys.stdin, sys.stdout
+    sys.argv = [plotter.__file__, "--formats", ",".join(formats)]
+    if output:
+        sys.argv += ["--output", output]
+    sys.stdin = io.StringIO(payload_text)
+    sys.stdout = out
+    try:
+        plotter.main()
+        code = 0
+    except SystemExit as exc:
+        code = exc.code if isinstance(exc.code, int) else (0 if exc.code is None else 1)
+    finally:
+        sys.argv, sys.stdin, sys.stdout = saved
+        plt.close("all")
+    return code, out.getvalue()
+
+
+# -----------------------------------------------------------------------------
+# Raccolta (collector) con memo per stato della storia
+# -----------------------------------------------------------------------------
+_payloads = OrderedDict()
+
+
+def history_key(paths):
+    """SHA di HEAD di ogni repository + file alias in uso (percorso e mtime)."""
+    h = hashlib.sha1()
+    for path in paths:
+        head = subprocess.run(["git", "-C", path, "rev-parse", "HEAD"],
+                              capture_output=True, text=True)
+        h.update(f"{path}\0{head.stdout.strip()}\0".encode())
+    with chdir(paths[0]):
+        aliases = plot_git.find_aliases_file()
+        if aliases:
+            h.update(f"{os.path.abspath(aliases)}\0{os.stat(aliases).st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def collect(paths, start, end, author):
+    """JSON del collector e avvisi "Avviso:" del suo stderr (dal memo se la storia non è cambiata)."""
+    key = (tuple(paths), start, end, author, history_key(paths))
+    if key in _payloads:
+        _payloads.move_to_end(key)
+        return _payloads[key]
+
+    if len(paths) > 1:
+        cmd = ["bash", os.path.join(SCRIPT_DIR, "git_multiproject_stats_collector.sh"),
+               start, end, *paths]
+    else:
+        cmd = ["bash", os.path.join(SCRIPT_DIR, "git_stats_collector.sh"), start, end, "json"]
+        if author:
+            cmd.append(author)
+    proc = subprocess.run(cmd, cwd=paths[0], capture_output=True, text=True,
+                          errors="surrogateescape")
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or f"collector terminato con codice {proc.returncode}")
+    warnings = [line.strip() for line in proc.stderr.splitlines()
+                if line.strip().startswith("Avviso:")]
+    result = (proc.stdout, warnings)
+    _payloads[key] = result
+    while len(_payloads) > MAX_CACHED_PAYLOADS:
+        _payloads.popitem(last=False)
+    return result
+
+
+# -----------------------------------------------------------------------------
+# Richieste
+# -----------------------------------------------------------------------------
+def handle_request(request):
+    paths = request.get("paths")
+    start, end = request.get("start", ""), request.get("end", "")
+    author = request.get("author") or ""
+    formats = request.get("formats") or ["png"]
+    output = request.get("output") or None
+    if not (paths and isinstance(paths, list)
+            and all(isinstance(p, str) and os.path.isdir(p) for p in paths)):
+        return {"ok": False, "error": "paths: serve una lista di cartelle esistenti."}
+    if not all(isinstance(d, str) and DATE_RE.match(d) for d in (start, end)):
+        return {"ok": False, "error": "start/end: date in formato YYYY-MM-DD."}
+    if not isinstance(author, str):
+        return {"ok": False, "error": "author: serve una stringa."}
+    if not (isinstance(output, str) or output is None):
+        return {"ok": False, "error": "output: serve il percorso del PNG come stringa."}
+    if not isinstance(formats, list) or not all(isinstance(f, str) for f in formats):
+        return {"ok": False, "error": "formats: serve una lista di stringhe."}
+    unknown = [f for f in formats if f not in plot_git.OUTPUT_FORMATS]
+    if unknown:
+        return {"ok": False, "error": f"formats: valori ammessi {', '.join(plot_git.OUTPUT_FORMATS)}"}
+    paths = [os.path.abspath(p) for p in paths]
+
+    try:
+        payload_text, warnings = collect(paths, start, end, author)
+    except (RuntimeError, OSError) as exc:  # collector fallito o non avviabile
+        return {"ok": False, "error": str(exc)}
+
+    plotter = plot_multiproject if len(paths) > 1 else plot_git
+    with chdir(paths[0]):
+        try:
+            code, log = render(plotter, payload_text, formats, output)
+        except Exception as exc:  # un errore di rendering non deve fermare il server
+            return {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+    if code != 0:
+        return {"ok": False, "error": log.strip() or f"plotter terminato con codice {code}"}
+
+    png = None
+    for regex in PNG_RES:
+        match = regex.search(log)
+        if match:
+            png = os.path.join(paths[0], match.group(1).strip())
+            break
+    files = ([png] if png else []) + [os.path.join(paths[0], m.group(1).strip())
+                                      for m in EXTRA_RE.finditer(log)]
+    return {"ok": True, "png": png, "files": files, "warnings": warnings, "log": log}
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+        except ValueError as exc:  # JSON malformato o riga non UTF-8 (UnicodeDecodeError)
+            reply = {"ok": False, "error": f"richiesta non valida: {exc}"}
+        else:
+            try:
+                reply = handle_request(request) if isinstance(request, dict) else \
+                    {"ok": False, "error": "richiesta non valida: serve un oggetto JSON."}
+            except Exception as exc:  # qualunque errore diventa una risposta, non un traceback
+                reply = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        self.wfile.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8", "surrogateescape"))
+
+
+def socket_in_use(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def stop(signum, frame):
+    """SIGTERM come Ctrl-C: in entrambi i casi si esce dal ciclo e si rimuove il socket."""
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=default_socket_path(),
+                        help="percorso del socket Unix (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.socket):
+        if socket_in_use(args.socket):
+            print(f"Errore: un server è già in ascolto su {args.socket}.", file=sys.stderr)
+            return 1
+        os.unlink(args.socket)  # socket orfano di un server terminato male
+    os.makedirs(os.path.dirname(args.socket) or ".", exist_ok=True)
+
+    signal.signal(signal.SIGTERM, stop)
+    old_umask = os.umask(0o177)  # socket leggibile/scrivibile solo dall'utente
+    try:
+        server = socketserver.UnixStreamServer(args.socket, Handler)
+    finally:
+        os.umask(old_umask)
+    print(f"Server dei report in ascolto su {args.socket}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""Archivio locale SQLite dell'attività giornaliera, con aggregati settimanali e mensili.
+
+Ogni report ricava tutto da git: confrontare lo stesso portafoglio di repository su più
+trimestri vuol dire rilanciare ogni volta il collector multi-progetto sull'intera storia.
+Questo modulo conserva invece le righe giornaliere (progetto, autore, data) già prodotte
+dai collector in un database SQLite, e i due plotter le rileggono con --from-db senza
+toccare git.
+
+TABELLE
+-------
+  daily    una riga per (data, progetto, autore): commit, aggiunte, rimozioni, file
+           distinti nel giorno. Chiave primaria con la data in testa (WITHOUT ROWID): una
+           query per periodo legge un solo tratto contiguo dell'indice, qualunque sia il
+           numero di progetti. Un secondo indice (progetto, data) serve l'ingest, che
+           sostituisce il periodo di un progetto alla volta.
+  weekly   aggregati per settimana (lunedì) e mensili per primo del mese, con anche i
+  monthly  giorni attivi. Ricalcolati a ogni ingest SOLO per le settimane/mesi toccati.
+  ingests  periodi caricati per progetto: un periodo richiesto ma mai caricato viene
+           segnalato con un "Avviso:", non scambiato per inattività. Il JSON
+           multi-progetto non elenca i progetti senza attività nel periodo: per quelli il
+           periodo non risulta caricato e l'avviso compare comunque.
+
+L'ingest è idempotente: per ogni progetto del JSON le righe del suo periodo
+(metadata.start_date..end_date) vengono sostituite, quindi ricaricare un trimestre dopo
+nuovi commit o un alias modificato non duplica nulla. Per lo stesso motivo un JSON
+filtrato per autore (metadata.author) è rifiutato: sostituirebbe il periodo del progetto
+con le sole righe di quell'autore.
+
+LIMITE: FILE DISTINTI
+---------------------
+Il database conserva i file distinti PER GIORNO, non l'elenco dei file: su un periodo il
+valore per (progetto, autore) è la somma dei giorni, un limite superiore dei file distinti
+del periodo che riporta il collector multi-progetto (un file toccato in 10 giorni conta
+10). L'indice composito, calcolato giorno per giorno, è invece identico. Punch card,
+ownership, cartelle e hotspot non sono archiviati: i pannelli relativi vengono saltati.
+
+Uso:
+
+  git_multiproject_stats_collector.sh 2025-01-01 2025-03-31 ~/repo1 ~/repo2 \\
+      | git_activity_warehouse.py ingest [--db PATH]
+  git_activity_warehouse.py query [--db PATH] --start DATA --end DATA
+                                  [--by day|week|month] [--project NOME ...]
+  plot_multiproject.py --from-db PATH --start DATA --end DATA
+  plot_git.py --from-db PATH --start DATA --end DATA [--project NOME]
+
+Accetta in ingresso anche il JSON di git_stats_collector.sh (progetto da
+metadata.project), non il formato colonnare né quello legacy senza metadata.
+Database di default: activity.db nella cartella cache ($GIT_ACTIVITY_CACHE_DIR, default
+~/.cache/git-activity-reports).
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+
+DB_NAME = "activity.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily (
+    date TEXT NOT NULL, project TEXT NOT NULL, author TEXT NOT NULL,
+    commits INTEGER NOT NULL, added INTEGER NOT NULL, deleted INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    PRIMARY KEY (date, project, author)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS weekly (
+    period TEXT NOT NULL, project TEXT NOT NULL, author TEXT NOT NULL,
+    commits INTEGER NOT NULL, added INTEGER NOT NULL, deleted INTEGER NOT NULL,
+    files INTEGER NOT NULL, active_days INTEGER NOT NULL,
+    PRIMARY KEY (period, project, author)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS monthly (
+    period TEXT NOT NULL, project TEXT NOT NULL, author TEXT NOT NULL,
+    commits INTEGER NOT NULL, added INTEGER NOT NULL, deleted INTEGER NOT NULL,
+    files INTEGER NOT NULL, active_days INTEGER NOT NULL,
+    PRIMARY KEY (period, project, author)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ingests (
+    project TEXT NOT NULL, start_date TEXT NOT NULL, end_date TEXT NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ingests_project ON ingests (project);
+CREATE INDEX IF NOT EXISTS daily_project ON daily (project, date);
+CREATE INDEX IF NOT EXISTS weekly_project ON weekly (project, period);
+CREATE INDEX IF NOT EXISTS monthly_project ON monthly (project, period);
+"""
+
+# Inizio del periodo di una data, in SQL (SQLite) e in Python: devono coincidere.
+# 'weekday 0' porta alla domenica successiva (o resta se è già domenica), -6 giorni al lunedì.
+PERIOD_SQL = {
+    "day": "date",
+    "week": "date(date, 'weekday 0', '-6 days')",
+    "month": "strftime('%Y-%m-01', date)",
+}
+
+
+def default_db_path():
+    cache = os.environ.get("GIT_ACTIVITY_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "git-activity-reports")
+    return os.path.join(cache, DB_NAME)
+
+
+def period_start(by, day):
+    if by == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if by == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(by, start):
+    if by == "week":
+        return start + datetime.timedelta(days=7)
+    if by == "month":
+        return (start + datetime.timedelta(days=32)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+
+def connect(path, create=False):
+    """Connessione al database; con create=True lo crea (schema incluso) se manca."""
+    if not create and not os.path.exists(path):
+        raise FileNotFoundError(f"database {path} inesistente (crealo con `ingest`)")
+    if create:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# -----------------------------------------------------------------------------
+# Ingest
+# -----------------------------------------------------------------------------
+def payload_rows(payload):
+    """(start, end, {progetto: [righe (data, progetto, autore, commit, +, -, file)]})."""
+    if not isinstance(payload, dict) or "data" not in payload:
+        raise ValueError("serve il JSON dei collector con metadata (il formato legacy non ha il periodo)")
+    meta = payload.get("metadata") or {}
+    if meta.get("format"):
+        raise ValueError("formato colonnare non supportato: rilancia il collector senza --columnar")
+    start, end = meta.get("start_date"), meta.get("end_date")
+    if not (start and end):
+        raise ValueError("metadata.start_date/end_date mancanti")
+    # ingest sostituisce il periodo dell'intero progetto: un JSON con un solo autore
+    # cancellerebbe tutti gli altri
+    if meta.get("author"):
+        raise ValueError(f"JSON filtrato per l'autore \"{meta['author']}\" (metadata.author): "
+                         "rilancia il collector senza il filtro autore")
+    projects = {}
+    for entry in payload["data"]:
+        project = entry.get("project") or meta.get("project")
+        if not project:
+            raise ValueError("progetto assente sia nelle righe sia in metadata.project")
+        author = entry.get("author") or "Sconosciuto"
+        rows = projects.setdefault(project, [])
+        for d in entry.get("daily_data") or []:
+            if start <= d["date"] <= end:
+                rows.append((d["date"], project, author, int(d.get("commits", 0) or 0),
+                             int(d.get("added", 0) or 0), int(d.get("deleted", 0) or 0),
+                             int(d.get("files", 0) or 0)))
+    # Il collector singolo non ha righe per i progetti senza attività: il periodo va
+    # comunque registrato, altrimenti risulterebbe "non caricato"
+    if not projects and meta.get("project"):
+        projects[meta["project"]] = []
+    return start, end, projects
+
+
+def refresh_rollups(conn, project, start, end):
+    """Ricalcola weekly/monthly del progetto per i periodi che intersecano [start, end]."""
+    day0, day1 = datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)
+    for by, table in (("week", "weekly"), ("month", "monthly")):
+        lo = period_start(by, day0)
+        hi = next_period(by, period_start(by, day1)) - datetime.timedelta(days=1)
+        conn.execute(f"DELETE FROM {table} WHERE period BETWEEN ? AND ? AND project = ?",
+                     (lo.isoformat(), hi.isoformat(), project))
+        conn.execute(
+            f"INSERT INTO {table} SELECT {PERIOD_SQL[by]}, project, author, SUM(commits), "
+            "SUM(added), SUM(deleted), SUM(files), SUM(commits > 0) FROM daily "
+            "WHERE date BETWEEN ? AND ? AND project = ? GROUP BY 1, 2, 3",
+            (lo.isoformat(), hi.isoformat(), project))
+
+
+def ingest(conn, payload):
+    """Carica il JSON di un collector sostituendo il periodo di ogni suo progetto.
+
+    Restituisce (progetti, righe giornaliere scritte). Tutto in una transazione: un
+    ingest interrotto non lascia un periodo caricato a metà.
+    """
+    start, end, projects = payload_rows(payload)
+    now = datetime.datetime.now().isoformat(timespec="seconds")
+    written = 0
+    with conn:
+        for project, rows in sorted(projects.items()):
+            conn.execute("DELETE FROM daily WHERE date BETWEEN ? AND ? AND project = ?",
+                         (start, end, project))
+            conn.executemany("INSERT INTO daily VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            refresh_rollups(conn, project, start, end)
+            conn.execute("INSERT INTO ingests VALUES (?, ?, ?, ?)", (project, start, end, now))
+            written += len(rows)
+    return sorted(projects), written
+
+
+# -----------------------------------------------------------------------------
+# Lettura
+# -----------------------------------------------------------------------------
+def project_filter(projects, column="project"):
+    if not projects:
+        return "", ()
+    return f" AND {column} IN ({','.join('?' * len(projects))})", tuple(projects)
+
+
+def coverage_gaps(conn, start, end, projects=None):
+    """{progetto: [(da, a), ...]} dei tratti di [start, end] mai caricati, per i progetti
+    presenti nel database (tutti, o quelli richiesti)."""
+    where, params = project_filter(projects)
+    spans = {}
+    for project, lo, hi in conn.execute(
+            f"SELECT project, start_date, end_date FROM ingests WHERE 1{where} "
+            "ORDER BY project, start_date", params):
+        spans.setdefault(project, []).append((lo, hi))
+    gaps = {}
+    for project, intervals in spans.items():
+        cursor = datetime.date.fromisoformat(start)
+        last = datetime.date.fromisoformat(end)
+        missing = []
+        for lo, hi in intervals:
+            lo, hi = datetime.date.fromisoformat(lo), datetime.date.fromisoformat(hi)
+            if lo > cursor:
+                missing.append((cursor, min(lo - datetime.timedelta(days=1), last)))
+            cursor = max(cursor, hi + datetime.timedelta(days=1))
+            if cursor > last:
+                break
+        if cursor <= last:
+            missing.append((cursor, last))
+        missing = [(a.isoformat(), b.isoformat()) for a, b in missing if a <= b]
+        if missing:
+            gaps[project] = missing
+    return gaps, sorted(spans)
+
+
+def warn_gaps(gaps):
+    for project, missing in sorted(gaps.items()):
+        spans = ", ".join(f"{a}..{b}" for a, b in missing)
+        print(f"Avviso: progetto {project} non caricato nel database per {spans} "
+              "(nessun dato, non necessariamente inattività).", file=sys.stderr)
+
+
+def load_payload(path, start, end, projects=None, single=False):
+    """JSON equivalente a quello dei collector, letto dal database per [start, end].
+
+    single=False: formato di git_multiproject_stats_collector.sh (una voce per progetto e
+    autore). single=True: formato di git_stats_collector.sh, con i progetti selezionati
+    sommati per autore e giorno (punch card vuota: non archiviata).
+    """
+    conn = connect(path)
+    try:
+        gaps, known = coverage_gaps(conn, start, end, projects)
+        if not known:
+            wanted = f" per {', '.join(projects)}" if projects else ""
+            raise LookupError(f"nessun progetto caricato nel database {path}{wanted}")
+        warn_gaps(gaps)
+        where, params = project_filter(projects)
+        if single:
+            cursor = conn.execute(
+                "SELECT '', author, date, SUM(commits), SUM(added), SUM(deleted), SUM(files) "
+                f"FROM daily WHERE date BETWEEN ? AND ?{where} GROUP BY date, author",
+                (start, end) + params)
+        else:
+            cursor = conn.execute(
+                "SELECT project, author, date, commits, added, deleted, files "
+                f"FROM daily WHERE date BETWEEN ? AND ?{where}", (start, end) + params)
+        # Righe in ordine di data (chiave primaria): ogni lista per voce resta ordinata
+        groups = {}
+        for project, author, date_s, commits, added, deleted, files in cursor:
+            groups.setdefault((project, author), []).append(
+                {"date": date_s, "commits": commits, "added": added,
+                 "deleted": deleted, "files": files})
+    finally:
+        conn.close()
+
+    meta = {"start_date": start, "end_date": end, "date_basis": "author",
+            "source": {"warehouse": os.path.abspath(path), "files": "daily_sum"}}
+    data = []
+    for (project, author) in sorted(groups):
+        days = groups[(project, author)]
+        if single:
+            for d in days:
+                d["day"] = datetime.date.fromisoformat(d["date"]).strftime("%A")
+                d["lines"] = d["added"] + d["deleted"]
+            data.append({"author": author,
+                         "total_commits": sum(d["commits"] for d in days),
+                         "daily_data": days, "punch_card": []})
+            continue
+        added = sum(d["added"] for d in days)
+        deleted = sum(d["deleted"] for d in days)
+        data.append({
+            "project": project,
+            "author": author,
+            "commits": sum(d["commits"] for d in days),
+            "added": added,
+            "deleted": deleted,
+            "lines": added + deleted,
+            "files": sum(d["files"] for d in days),
+            "active_days": sum(1 for d in days if d["commits"] > 0),
+            "daily_data": days,
+        })
+    if single:
+        selected = projects or known
+        meta["project"] = selected[0] if len(selected) == 1 else f"{len(selected)} progetti"
+    return {"metadata": meta, "data": data}
+
+
+def query_rollup(conn, start, end, by, projects=None):
+    """Totali per (periodo, progetto, autore) su [start, end].
+
+    I periodi interamente nel range si leggono dagli aggregati materializzati; solo quelli
+    tagliati dagli estremi (al massimo due) si ricalcolano dalle righe giornaliere.
+    """
+    where, params = project_filter(projects)
+    if by == "day":
+        return conn.execute(
+            "SELECT date, project, author, commits, added, deleted, files, commits > 0 "
+            f"FROM daily WHERE date BETWEEN ? AND ?{where} ORDER BY 1, 2, 3",
+            (start, end) + params).fetchall()
+    day0, day1 = datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)
+    first = period_start(by, day0)
+    if first < day0:
+        first = next_period(by, first)
+    after = next_period(by, period_start(by, day1))
+    if after - datetime.timedelta(days=1) > day1:
+        after = period_start(by, day1)
+    table = "weekly" if by == "week" else "monthly"
+    if first < after:
+        full = (first.isoformat(), (after - datetime.timedelta(days=1)).isoformat())
+        partial = ((start, (first - datetime.timedelta(days=1)).isoformat()),
+                   (after.isoformat(), end))
+    else:
+        full = None
+        partial = ((start, end),)
+    parts, values = [], []
+    if full:
+        parts.append(f"SELECT period, project, author, commits, added, deleted, files, "
+                     f"active_days FROM {table} WHERE period BETWEEN ? AND ?{where}")
+        values += list(full) + list(params)
+    for lo, hi in partial:
+        if lo > hi:
+            continue
+        parts.append(f"SELECT {PERIOD_SQL[by]}, project, author, SUM(commits), SUM(added), "
+                     "SUM(deleted), SUM(files), SUM(commits > 0) FROM daily "
+                     f"WHERE date BETWEEN ? AND ?{where} GROUP BY 1, 2, 3")
+        values += [lo, hi] + list(params)
+    return conn.execute(" UNION ALL ".join(parts) + " ORDER BY 1, 2, 3", values).fetchall()
+
+
+# -----------------------------------------------------------------------------
+# Riga di comando
+# -----------------------------------------------------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ingest = sub.add_parser("ingest", help="carica da stdin il JSON di un collector")
+    p_query = sub.add_parser("query", help="totali per giorno, settimana o mese (TSV)")
+    for p in (p_ingest, p_query):
+        p.add_argument("--db", default=default_db_path(),
+                       help="database SQLite (default: %(default)s)")
+    p_query.add_argument("--start", required=True, help="inizio periodo (YYYY-MM-DD)")
+    p_query.add_argument("--end", required=True, help="fine periodo (YYYY-MM-DD)")
+    p_query.add_argument("--by", choices=("day", "week", "month"), default="month",
+                         help="granularità (default: %(default)s)")
+    p_query.add_argument("--project", action="append",
+                         help="limita al progetto (ripetibile; default: tutti)")
+    args = parser.parse_args(argv)
+    if args.command == "query":
+        for name in ("start", "end"):
+            try:
+                datetime.date.fromisoformat(getattr(args, name))
+            except ValueError:
+                parser.error(f"--{name}: data in formato YYYY-MM-DD")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "ingest":
+        raw = sys.stdin.read().strip()
+        if not raw:
+            print("Errore: Nessun dato ricevuto in input.", file=sys.stderr)
+            return 1
+        try:
+            payload = json.loads(raw)
+            conn = connect(args.db, create=True)
+            projects, written = ingest(conn, payload)
+        except (json.JSONDecodeError, ValueError) as exc:
+            print(f"Errore: JSON non caricabile ({exc}).", file=sys.stderr)
+            return 1
+        conn.close()
+        print(f"Caricati {written} giorni-autore per {len(projects)} progetti "
+              f"({payload['metadata']['start_date']} → {payload['metadata']['end_date']}) "
+              f"in {args.db}", file=sys.stderr)
+        return 0
+
+    try:
+        conn = connect(args.db)
+    except FileNotFoundError as exc:
+        print(f"Errore: {exc}.", file=sys.stderr)
+        return 1
+    warn_gaps(coverage_gaps(conn, args.start, args.end, args.project)[0])
+    print("periodo\tprogetto\tautore\tcommit\taggiunte\trimozioni\tfile\tgiorni_attivi")
+    for row in query_rollup(conn, args.start, args.end, args.by, args.project):
+        print("\t".join(str(v) for v in row))
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
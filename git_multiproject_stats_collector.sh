@@ -16,6 +16,19 @@
 #   --start <data>   Data di inizio periodo (alternativa a posizionale)
 #   --end <data>     Data di fine periodo (alternativa a posizionale)
 #   --fetch          Abilita l'aggiornamento dei repository con git fetch
+#   --fetch-ttl <m>  Come --fetch, ma salta i repository già aggiornati negli ultimi <m> minuti
+#   --jobs <n>       Repository clonati/aggiornati e analizzati in parallelo (default: nproc)
+#   --columnar       JSON in formato colonnare compatto (v3, vedi git_stats_engine.py)
+#   --sidecar <f>    Come --columnar, con la tabella giornaliera nel file .npy indicato
+#   --timings        Tempi, picco di memoria e throughput per fase (stderr e metadata.timings)
+#   --prepare        Commit-graph con filtri di Bloom per ogni repository prima dell'analisi
+#   --approx-files   File distinti stimati con HyperLogLog, a memoria limitata (vedi sotto)
+#   --ownership      Aggiunge l'ownership (git blame) di ogni repository al JSON (vedi sotto)
+#   --blame-jobs <n> Tetto di git blame contemporanei sull'intera macchina (default: nproc)
+#   --blame-max-size <KB>  Con --ownership, salta (segnalandoli) i file più grandi di <KB> KB
+#   --resume         Riprende una run interrotta: salta i repository già completati (checkpoint)
+#   --repo-timeout <s>  Interrompe dopo <s> secondi clone/fetch, analisi o ownership di un
+#                    repository, segnalandolo come fallito invece di bloccare il portafoglio
 #   -h, --help       Mostra questo help
 #
 # PARAMETRI POSIZIONALI:
@@ -30,16 +43,46 @@
 #     (es. "Luca" catturava anche "Luca Bianchi").
 #   - I giorni sono assegnati per AUTHOR-DATE, non per committer-date: un rebase o un
 #     cherry-pick non sposta più il lavoro nel periodo sbagliato.
-#   - `files` conta i file DISTINTI toccati, non le righe di --numstat.
+#   - `files` conta i file DISTINTI toccati, non le righe di --numstat. Con --approx-files
+#     i distinti (del giorno e del periodo) sono stimati con uno sketch HyperLogLog per
+#     gruppo invece che contati su un insieme esatto: memoria limitata anche con commit da
+#     centinaia di migliaia di file, errore relativo tipico 1,6%, dichiarato nel JSON in
+#     `metadata.files_estimate` (vedi il commento sopra file_sketch_registers).
 #   - Gli alias autore sono applicati QUI, prima di ogni aggregazione.
 #   - L'output include `daily_data`: senza granularità giornaliera il tetto anti-outlier
 #     applicato dal plotter saturava su periodi lunghi, appiattendo tutti gli autori.
+#   - I repository sono analizzati in parallelo (--jobs, default nproc), ognuno su un
+#     proprio file TSV: l'unione è ordinata prima del JSON, quindi l'output è identico
+#     byte per byte a quello di un'esecuzione sequenziale (--jobs 1). Un repository la cui
+#     analisi fallisce viene segnalato e saltato senza fermare gli altri; il tempo di
+#     analisi di ciascun repository è riportato su stderr.
+#   - Con --timings ogni fase è misurata a parte (durata, picco RSS, throughput): sync
+#     (clone/fetch), analyze (tutti i repository) e, per repository, log (git log, rename
+#     inclusi) e aggregate (awk), infine emit (JSON). Il riepilogo va su stderr e nel blocco
+#     `metadata.timings` del JSON. Per separare git log dall'aggregazione il log di ogni
+#     repository passa da un file invece che da una pipe (vedi timed_stage).
+#   - Con --ownership, dopo l'analisi, ogni repository riceve anche la fotografia
+#     dell'ownership a DATA_FINE, calcolata da git_stats_collector.sh (sottocomando
+#     `ownership`, stessa cache per blob). I repository girano in parallelo (--jobs), ma i
+#     git blame di TUTTI condividono un unico tetto di macchina (--blame-jobs, o
+#     $GIT_ACTIVITY_BLAME_JOBS, default nproc) invece di nproc per repository: con 20
+#     repository e --jobs 4 i processi blame restano nproc, non 4 × nproc. Il throughput
+#     complessivo (file blamati al secondo, sul portafoglio) è riportato su stderr.
+#   - Ogni repository completato lascia i suoi risultati in un checkpoint su disco (sotto
+#     $GIT_ACTIVITY_CACHE_DIR, default ~/.cache/git-activity-reports/checkpoints): se la
+#     run muore a metà (rete, memoria, Ctrl-C), la successiva con --resume salta i
+#     repository già fatti e produce lo stesso JSON di una run pulita. --repo-timeout <s>
+#     limita ogni fase di un repository: uno bloccato è segnalato come fallito e gli altri
+#     proseguono. A fine run i repository non completati sono elencati su stderr (vedi il
+#     commento sopra CHECKPOINT_DIR).
 #
 # REPOSITORY REMOTI:
 #   Ogni "percorso" (posizionale o riga del file --file) può essere un path locale oppure un URL
 #   Git (es. https://github.com/org/repo.git o git@github.com:org/repo.git). Gli URL vengono clonati
-#   (la prima volta) o aggiornati (con --fetch) in una cartella locale visibile sotto
-#   $GIT_ACTIVITY_REPOS_DIR (default: ~/repos), poi analizzati come un repository locale qualsiasi.
+#   (la prima volta, senza checkout: serve solo la storia) o aggiornati (con --fetch) in una
+#   cartella locale visibile sotto $GIT_ACTIVITY_REPOS_DIR (default: ~/repos), poi analizzati come
+#   un repository locale qualsiasi. Clone e fetch di tutti i repository avvengono in parallelo;
+#   --fetch-ttl <minuti> salta il fetch dei repository già aggiornati di recente.
 #   Se quella cartella corrisponde già a un checkout locale su cui stai lavorando (stesso remote
 #   "origin" dell'URL richiesto), viene riusata senza clonare di nuovo.
 #   In caso di collisione di nome tra URL diversi, lo script si ferma con un errore: assegna un nome
@@ -79,11 +122,20 @@
 #   I campi top-level (project, author, lines, commits, added, files) sono mantenuti per
 #   retrocompatibilità; `deleted`, `active_days` e `daily_data` sono nuovi.
 #
+#   Con --ownership si aggiunge, per progetto, lo stesso blocco del collector singolo
+#   (alias applicati; assente per un progetto senza commit prima di DATA_FINE):
+#     "ownership": {
+#       "backend": {
+#         "ref_commit": "abcdef0123...", "ref_date": "2025-11-28", "total_lines": 48213,
+#         "by_author": [ { "author": "Mario Rossi", "lines": 30112, "pct": 62.45 } ]
+#       }
+#     }
+#
 # NOTE:
 #   - Lo script può essere eseguito da qualsiasi directory
 #   - Ogni percorso deve puntare a un repository Git valido (.git presente), oppure essere un URL Git
-#   - Repository locali non validi vengono saltati con warning; errori di risoluzione URL (es.
-#     collisione di nome cartella) interrompono l'intera esecuzione
+#   - Repository locali non validi e clonazioni fallite vengono saltati con warning; errori di
+#     risoluzione URL (es. collisione di nome cartella) interrompono l'intera esecuzione
 #   - I merge commits sono esclusi dalle statistiche
 #   - `lines` = aggiunte + eliminate (indicatore di volume, non di valore)
 #   - Il nome del progetto è estratto dal nome della cartella
@@ -101,6 +153,27 @@ PROJECT_FILE=""
 START_DATE=""
 END_DATE=""
 FETCH_ENABLED=false
+JOBS=""
+FETCH_TTL=""
+COLUMNAR=false
+SIDECAR_FILE=""
+TIMINGS=false
+TIMINGS_FILE=""
+PREPARE=false
+PREPARE_ONLY=false
+APPROX_FILES=false
+OWNERSHIP=false
+BLAME_JOBS=""
+BLAME_MAX_KB=""
+RESUME=false
+REPO_TIMEOUT=""
+FAILURES_FILE=""
+
+# Sottocomando `prepare`: solo commit-graph dei repository (vedi prepare_worker), senza date
+if [[ "$1" == "prepare" ]]; then
+    PREPARE_ONLY=true
+    shift
+fi
 
 while [[ $# -gt 0 ]]; do
     case $1 in
@@ -124,16 +197,104 @@ while [[ $# -gt 0 ]]; do
             FETCH_ENABLED=true
             shift
             ;;
+        --fetch-ttl)
+            if ! [[ "$2" =~ ^[0-9]+$ ]]; then
+                echo "Errore: --fetch-ttl richiede un numero di minuti." >&2
+                exit 1
+            fi
+            FETCH_ENABLED=true
+            FETCH_TTL="$2"
+            shift 2
+            ;;
+        --jobs)
+            if ! [[ "$2" =~ ^[1-9][0-9]*$ ]]; then
+                echo "Errore: --jobs richiede un numero intero positivo." >&2
+                exit 1
+            fi
+            JOBS="$2"
+            shift 2
+            ;;
+        --columnar)
+            COLUMNAR=true
+            shift
+            ;;
+        --sidecar)
+            if [[ -z "$2" || "$2" =~ ^- ]]; then
+                echo "Errore: --sidecar richiede un percorso di file (.npy)." >&2
+                exit 1
+            fi
+            COLUMNAR=true
+            SIDECAR_FILE="$2"
+            shift 2
+            ;;
+        --timings)
+            TIMINGS=true
+            shift
+            ;;
+        --prepare)
+            PREPARE=true
+            shift
+            ;;
+        --approx-files)
+            APPROX_FILES=true
+            shift
+            ;;
+        --ownership)
+            OWNERSHIP=true
+            shift
+            ;;
+        --blame-jobs)
+            if ! [[ "$2" =~ ^[1-9][0-9]*$ ]]; then
+                echo "Errore: --blame-jobs richiede un numero intero positivo." >&2
+                exit 1
+            fi
+            BLAME_JOBS="$2"
+            shift 2
+            ;;
+        --blame-max-size)
+            if ! [[ "$2" =~ ^[1-9][0-9]*$ ]]; then
+                echo "Errore: --blame-max-size richiede una dimensione in KB (intero positivo)." >&2
+                exit 1
+            fi
+            BLAME_MAX_KB="$2"
+            shift 2
+            ;;
+        --resume)
+            RESUME=true
+            shift
+            ;;
+        --repo-timeout)
+            if ! [[ "$2" =~ ^[1-9][0-9]*$ ]]; then
+                echo "Errore: --repo-timeout richiede un numero di secondi (intero positivo)." >&2
+                exit 1
+            fi
+            REPO_TIMEOUT="$2"
+            shift 2
+            ;;
         -h|--help)
             cat << 'EOF'
 UTILIZZO:
   ./git_multiproject_stats_collector.sh [OPZIONI] <DATA_INIZIO> <DATA_FINE> [percorsi...]
+  ./git_multiproject_stats_collector.sh prepare [--file <file>] [--fetch] [--jobs <n>] [percorsi...]
 
 OPZIONI:
   --file <file>    Legge i percorsi/URL dei repository da file (uno per riga)
   --start <data>   Data di inizio periodo (alternativa a posizionale)
   --end <data>     Data di fine periodo (alternativa a posizionale)
   --fetch          Abilita l'aggiornamento dei repository con git fetch
+  --fetch-ttl <m>  Come --fetch, ma salta i repository già aggiornati negli ultimi <m> minuti
+  --jobs <n>       Repository clonati/aggiornati e analizzati in parallelo (default: nproc)
+  --columnar       JSON in formato colonnare compatto (v3)
+  --sidecar <file.npy>  Come --columnar, con la tabella giornaliera nel file binario indicato
+  --timings        Tempi, picco di memoria e throughput per fase (su stderr e in metadata.timings)
+  --prepare        Scrive/aggiorna il commit-graph con filtri di Bloom di ogni repository prima dell'analisi
+  --approx-files   File distinti stimati (HyperLogLog, errore tipico 1,6%) a memoria limitata
+  --ownership      Aggiunge l'ownership (git blame a DATA_FINE) di ogni repository al JSON
+  --blame-jobs <n> Tetto di git blame contemporanei sull'intera macchina, per tutti i repository (default: nproc)
+  --blame-max-size <KB>  Con --ownership, salta (segnalandoli) i file più grandi di <KB> KB (default: nessun limite)
+  --resume         Riprende una run interrotta: salta i repository già completati (checkpoint su disco)
+  --repo-timeout <s>  Tempo massimo in secondi per clone/fetch, analisi e ownership di ogni
+                   repository: oltre, il repository è segnalato come fallito e gli altri proseguono
   -h, --help       Mostra questo help
 
 PARAMETRI POSIZIONALI:
@@ -157,6 +318,17 @@ ESEMPI:
   # Repository remoto (clonato/aggiornato sotto ~/repos, override con GIT_ACTIVITY_REPOS_DIR)
   ./git_multiproject_stats_collector.sh 2025-11-01 2025-11-30 https://github.com/org/repo.git ~/repo2
 
+  # Ownership di tutto il portafoglio, al più 8 git blame alla volta sulla macchina
+  ./git_multiproject_stats_collector.sh --ownership --blame-jobs 8 --file repos.txt 2025-11-01 2025-11-30
+
+  # Portafoglio lungo: al più 10 minuti per fase e repository; se la run si interrompe,
+  # la stessa riga con --resume riparte dai repository non ancora completati
+  ./git_multiproject_stats_collector.sh --repo-timeout 600 --file repos.txt 2025-11-01 2025-11-30
+  ./git_multiproject_stats_collector.sh --resume --repo-timeout 600 --file repos.txt 2025-11-01 2025-11-30
+
+  # Solo preparazione (commit-graph con filtri di Bloom), ad es. da cron prima dei report
+  ./git_multiproject_stats_collector.sh prepare --fetch --file repos.txt
+
 NOTE:
   - I giorni sono attribuiti per author-date (rebase-safe), non per committer-date
   - `files` conta i file distinti toccati, non le modifiche per file
@@ -176,11 +348,13 @@ EOF
 done
 
 # Se date non specificate con --start/--end, usa i primi due argomenti
-if [[ -z "$START_DATE" ]]; then
+if [[ "$PREPARE_ONLY" == true ]]; then
+    :   # nessuna data: tutti i posizionali sono percorsi
+elif [[ -z "$START_DATE" ]]; then
     START_DATE="$1"
     shift
 fi
-if [[ -z "$END_DATE" ]]; then
+if [[ "$PREPARE_ONLY" != true && -z "$END_DATE" ]]; then
     END_DATE="$1"
     shift
 fi
@@ -202,8 +376,8 @@ if [ -n "$PROJECT_FILE" ]; then
 fi
 
 # Validazione date (formato base)
-if ! [[ "$START_DATE" =~ ^[0-9]{4}-[0-9]{2}-[0-9]{2}$ ]] || \
-   ! [[ "$END_DATE" =~ ^[0-9]{4}-[0-9]{2}-[0-9]{2}$ ]]; then
+if [[ "$PREPARE_ONLY" != true ]] && { ! [[ "$START_DATE" =~ ^[0-9]{4}-[0-9]{2}-[0-9]{2}$ ]] || \
+   ! [[ "$END_DATE" =~ ^[0-9]{4}-[0-9]{2}-[0-9]{2}$ ]]; }; then
     echo "Errore: Date devono essere in formato YYYY-MM-DD" >&2
     exit 1
 fi
@@ -248,8 +422,10 @@ except Exception:
 ' "$REPOS_MAP_FILE" "$url"
 }
 
-# Clona/aggiorna un repository remoto sotto $REPOS_DIR e stampa su stdout il path locale risultante.
-# In caso di errore/collisione non stampa nulla e ritorna 1.
+# Stampa su stdout il path locale (sotto $REPOS_DIR) di un repository remoto, SENZA clonarlo
+# né aggiornarlo: quello avviene dopo, in parallelo per tutti i repository (sync_repo).
+# In caso di collisione (cartella esistente che non corrisponde all'URL) non stampa nulla e
+# ritorna 1.
 resolve_remote_repo() {
     local url="$1"
     local mapped_name default_name target_name target
@@ -259,15 +435,7 @@ resolve_remote_repo() {
     target_name="${mapped_name:-$default_name}"
     target="$REPOS_DIR/$target_name"
 
-    mkdir -p "$REPOS_DIR" 2>/dev/null
-
-    if [[ ! -d "$target" ]]; then
-        echo "Clonazione di $url in $target..." >&2
-        if ! git clone --quiet "$url" "$target"; then
-            echo "Errore: clonazione di $url fallita." >&2
-            return 1
-        fi
-    else
+    if [[ -d "$target" ]]; then
         if [[ ! -d "$target/.git" ]]; then
             echo "Errore: $target esiste già ma non è un repository Git (richiesto per $url)." >&2
             echo "Configura un nome di cartella dedicato per questo URL nel file di mapping: $REPOS_MAP_FILE" >&2
@@ -285,16 +453,75 @@ resolve_remote_repo() {
             echo "Esempio: { \"$url\": \"nome-cartella-alternativo\" }" >&2
             return 1
         fi
-
-        if [[ "$FETCH_ENABLED" == true ]]; then
-            echo "Aggiornamento repository remoto in $target..." >&2
-            git -C "$target" fetch --quiet 2>/dev/null || echo "Avviso: fetch fallito per $target." >&2
-        fi
     fi
 
     echo "$target"
 }
 
+# Vero se il repository in $1 ha fatto fetch negli ultimi $FETCH_TTL minuti (data di modifica
+# di FETCH_HEAD, che git riscrive a ogni fetch). Sempre falso senza --fetch-ttl.
+fetch_is_fresh() {
+    [[ -n "$FETCH_TTL" ]] || return 1
+    local fh mtime
+    fh=$(git -C "$1" rev-parse --git-path FETCH_HEAD 2>/dev/null) || return 1
+    [[ "$fh" == /* ]] || fh="$1/$fh"
+    mtime=$(stat -c %Y "$fh" 2>/dev/null) || return 1
+    (( $(date +%s) - mtime < FETCH_TTL * 60 ))
+}
+
+# Porta il repository $1 allo stato da analizzare: lo clona se è un URL ($2) non ancora
+# presente, altrimenti lo aggiorna con git fetch se richiesto (--fetch/--fetch-ttl).
+# Clone SENZA checkout: i collector leggono solo la storia (git log/blame su commit), mai
+# i file dell'albero di lavoro, quindi il checkout sarebbe solo I/O sprecato. La cartella
+# resta un normale repository con .git (non un bare clone): un checkout già presente su
+# cui si lavora continua a essere riconosciuto e riusato come prima, e `git checkout`
+# dentro un clone creato qui lo rende un checkout completo.
+# Un clone fallito è segnalato con un avviso: il repository viene poi saltato in analisi
+# (cartella assente) senza fermare gli altri.
+sync_repo() {
+    local target="$1" url="$2"
+    local name
+    name=$(basename "$target")
+
+    if [[ -n "$url" && ! -d "$target" ]]; then
+        echo "Clonazione di $url in $target..." >&2
+        mkdir -p "$REPOS_DIR" 2>/dev/null
+        repo_timeout git clone --quiet --no-checkout "$url" "$target"
+        case $? in
+            0) ;;
+            124)
+                echo "Avviso: clonazione di $url interrotta dopo ${REPO_TIMEOUT}s (--repo-timeout)." >&2
+                record_failure "$url" clone timeout
+                rm -rf -- "${target:?}"
+                ;;
+            *)
+                echo "Avviso: clonazione di $url fallita." >&2
+                record_failure "$url" clone errore
+                rm -rf -- "${target:?}"
+                ;;
+        esac
+        return 0
+    fi
+
+    [[ -d "$target/.git" ]] || return 0   # non valido: lo segnala analyze_project
+
+    if [[ "$FETCH_ENABLED" != true ]]; then
+        echo "Skip aggiornamento per $name (usa --fetch per abilitare)." >&2
+        return 0
+    fi
+    if fetch_is_fresh "$target"; then
+        echo "Skip aggiornamento per $name: fetch eseguito meno di $FETCH_TTL minuti fa (--fetch-ttl)." >&2
+        return 0
+    fi
+    echo "Aggiornamento remote per $name..." >&2
+    repo_timeout git -C "$target" fetch --quiet 2>/dev/null
+    case $? in
+        0) echo "$name aggiornato con successo." >&2 ;;
+        124) echo "Avviso: fetch di $name interrotto dopo ${REPO_TIMEOUT}s (--repo-timeout), analizzato lo stato locale." >&2 ;;
+        *) echo "Avviso: Impossibile aggiornare $name (problemi di connettività o repository senza remote)." >&2 ;;
+    esac
+}
+
 # Risolve un argomento "path locale o URL" nel path locale da usare per l'analisi.
 resolve_repo_path() {
     local input="$1"
@@ -392,32 +619,16 @@ except Exception:
 # Analisi di un singolo progetto
 # -----------------------------------------------
 # Emette TSV: progetto \t autore \t data \t commits \t added \t deleted \t files_giorno \t files_periodo
+# $1 = percorso/URL come indicato dall'utente (per i messaggi), $2 = path locale già risolto,
+# $4 = file dove scrivere il log di git con --timings (log e aggregazione misurati a parte).
 analyze_project() {
-    local input_path="$1" alias_tsv="$2"
-    local project_path
-    project_path=$(resolve_repo_path "$input_path")
-    if [[ $? -ne 0 || -z "$project_path" ]]; then
-        # Errore di risoluzione (es. collisione di nome): non è un caso "repo non valido" da
-        # saltare, richiede una correzione di configurazione, quindi interrompiamo tutta l'analisi.
-        exit 1
-    fi
+    local input_path="$1" project_path="$2" alias_tsv="$3" log_file="$4"
     local project_name
     project_name=$(basename "$project_path")
 
     if [ ! -d "$project_path" ] || [ ! -d "$project_path/.git" ]; then
         echo "Avviso: $input_path non è una cartella valida o un repository Git. Saltato." >&2
-        return
-    fi
-
-    if [[ "$FETCH_ENABLED" == true ]]; then
-        echo "Aggiornamento remote per $project_name..." >&2
-        if git -C "$project_path" fetch --quiet 2>/dev/null; then
-            echo "$project_name aggiornato con successo." >&2
-        else
-            echo "Avviso: Impossibile aggiornare $project_name (problemi di connettività o repository senza remote)." >&2
-        fi
-    else
-        echo "Skip aggiornamento per $project_name (usa --fetch per abilitare)." >&2
+        return 3   # saltato (già segnalato), distinto da un'analisi fallita
     fi
 
     echo "Analisi di $project_name ($project_path)..." >&2
@@ -425,9 +636,77 @@ analyze_project() {
     local since_margin
     since_margin=$(date -d "$START_DATE -31 days" +%Y-%m-%d 2>/dev/null || echo "$START_DATE")
 
+    if [[ "$TIMINGS" == true ]]; then
+        timed_stage "log:$project_name" project_log_stream "$project_path" "$since_margin" > "$log_file"
+        timing_log_counts "$log_file" "log:$project_name"
+        timed_stage "aggregate:$project_name" aggregate_project "$alias_tsv" "$project_name" < "$log_file"
+        local status=$?
+        timing_log_counts "$log_file" "aggregate:$project_name"
+        return $status
+    fi
+    project_log_stream "$project_path" "$since_margin" | aggregate_project "$alias_tsv" "$project_name"
+}
+
+project_log_stream() {
+    local project_path="$1" since_margin="$2"
     git -C "$project_path" log --no-merges --since="$since_margin" \
-        --pretty=format:'%x01%H%x09%an%x09%ad' --date=short --numstat 2>/dev/null \
-    | awk -v start="$START_DATE" -v end="$END_DATE" -v aliasfile="$alias_tsv" -v project="$project_name" '
+        --pretty=format:'%x01%H%x09%an%x09%ad' --date=short --numstat 2>/dev/null
+}
+
+# File distinti approssimati (--approx-files): gli insiemi esatti seenday[autore, data,
+# percorso] e seenperiod[autore, percorso] crescono con autori × giorni × percorsi, e un
+# commit vendorizzato da centinaia di migliaia di file li porta da solo a gigabyte. In
+# questa modalità ogni gruppo (autore-giorno, autore-periodo) ha invece uno sketch
+# HyperLogLog sparso da FILE_SKETCH_REGISTERS registri: solo i registri toccati, al più
+# 4096 voci per gruppo quanti che siano i file, errore relativo tipico 1.04 / sqrt(4096) =
+# 1,6% (entro ~3,3% nel 95% dei casi), quasi sempre esatto sotto qualche centinaio di file.
+# Stesso hash e stessa stima di git_stats_collector.sh e git_stats_engine.py (FileSketch).
+FILE_SKETCH_REGISTERS=4096
+file_sketch_registers() {
+    [[ "$APPROX_FILES" == true ]] && echo "$FILE_SKETCH_REGISTERS" || echo 0
+}
+
+# Aggrega il flusso di project_log_stream (stdin) nel TSV descritto sopra analyze_project.
+aggregate_project() {
+    local alias_tsv="$1" project_name="$2"
+    awk -v start="$START_DATE" -v end="$END_DATE" -v aliasfile="$alias_tsv" -v project="$project_name" \
+        -v hllm="$(file_sketch_registers)" '
+        # --approx-files: registro (hj) e rango (hr) HyperLogLog di un percorso (vedi il
+        # commento sopra file_sketch_registers). Prodotti modulo il primo a 16 bit per volta:
+        # restano interi esatti in doppia precisione.
+        function hll_hash(p,   i, n, c, h1, h2, t) {
+            h1 = 0; h2 = 0; n = length(p)
+            for (i = 1; i <= n; i++) {
+                c = ord[substr(p, i, 1)] + 1
+                h1 = (h1 * 1000003 + c) % 4294967291
+                h2 = (h2 * 999983 + c) % 4294967291
+            }
+            h1 = mulmod(mulmod(h1, h1), h1); h2 = mulmod(mulmod(h2, h2), h2)
+            hj = h1 % hllm
+            hr = 1; t = 4294967291 / 2
+            while (h2 < t && hr < 33) { hr++; t /= 2 }
+        }
+        function mulmod(a, b) {
+            return ((a * int(b / 65536)) % 4294967291 * 65536 + a * (b % 65536)) % 4294967291
+        }
+        # Registri per gruppo in reg[gruppo, registro]; nset e sum per gruppo (registri non
+        # vuoti e somma intera di 2^(33 - rango)) tengono la stima a costo costante.
+        function hll_add(reg, nset, sum, key,   k, old) {
+            k = key SUBSEP hj
+            old = (k in reg) ? reg[k] : 0
+            if (hr <= old) return
+            reg[k] = hr
+            if (old == 0) nset[key]++
+            else sum[key] -= 2 ^ (33 - old)
+            sum[key] += 2 ^ (33 - hr)
+        }
+        function hll_count(nset, sum, key,   v, e) {
+            if (!(key in nset)) return 0
+            v = hllm - nset[key]
+            e = 0.7213 / (1 + 1.079 / hllm) * hllm * hllm * 8589934592 / (sum[key] + v * 8589934592)
+            if (e <= 2.5 * hllm && v > 0) e = hllm * log(hllm / v)
+            return int(e + 0.5)
+        }
         BEGIN {
             FS = "\t"; OFS = "\t"
             if (aliasfile != "") {
@@ -437,6 +716,7 @@ analyze_project() {
                 }
                 close(aliasfile)
             }
+            if (hllm) for (i = 1; i < 256; i++) ord[sprintf("%c", i)] = i
             active = 0
         }
         substr($0, 1, 1) == "\001" {
@@ -458,6 +738,12 @@ analyze_project() {
                 added[cur] += $1
                 deleted[cur] += $2
             }
+            if (hllm) {
+                hll_hash($3)
+                hll_add(dreg, dset, dsum, cur)
+                hll_add(preg, pset, psum, cur_a)
+                next
+            }
             # file distinti nel giorno
             fkey = cur SUBSEP $3
             if (!(fkey in seenday)) { seenday[fkey] = 1; files[cur]++ }
@@ -467,18 +753,311 @@ analyze_project() {
             next
         }
         END {
+            if (hllm) for (a in pset) pfiles[a] = hll_count(pset, psum, a)
             for (k in commits) {
                 split(k, kk, SUBSEP)
+                if (hllm) files[k] = hll_count(dset, dsum, k)
                 print project, kk[1], kk[2], commits[k], added[k] + 0, deleted[k] + 0, files[k] + 0, pfiles[kk[1]] + 0
             }
         }'
 }
 
+# -----------------------------------------------
+# Formato colonnare (--columnar / --sidecar)
+# -----------------------------------------------
+# La conversione è delegata a git_stats_engine.py (columnar_multi), unica implementazione
+# del formato v3 condivisa con git_stats_collector.sh. Stampa il percorso del modulo
+# accanto a questo script (risolvendo eventuali symlink); vuoto se assente.
+find_engine_module() {
+    local self engine
+    self=$(readlink -f "${BASH_SOURCE[0]}" 2>/dev/null || echo "${BASH_SOURCE[0]}")
+    engine="$(dirname "$self")/git_stats_engine.py"
+    [[ -f "$engine" ]] && echo "$engine"
+}
+
+# -----------------------------------------------
+# Ownership per repository (--ownership)
+# -----------------------------------------------
+# Il git blame (con la sua cache per blob e il tetto di macchina sui processi, vedi
+# collect_ownership_tsv) vive in git_stats_collector.sh: qui lo si invoca per repository con
+# il sottocomando `ownership`, che emette nomi grezzi. Stampa il percorso del collector
+# accanto a questo script; vuoto se assente.
+find_single_collector() {
+    local self collector
+    self=$(readlink -f "${BASH_SOURCE[0]}" 2>/dev/null || echo "${BASH_SOURCE[0]}")
+    collector="$(dirname "$self")/git_stats_collector.sh"
+    [[ -f "$collector" ]] && echo "$collector"
+}
+
+# Riepilogo del portafoglio su stderr, dalle intestazioni "#\tfiles\t<albero>\t<blamati>"
+# dei TSV $3...: $1 = secondi della fase, $2 = tetto dei git blame.
+report_ownership_throughput() {
+    local wall="$1" cap="$2"
+    shift 2
+    awk -F'\t' -v wall="$wall" -v cap="$cap" '
+        FNR == 1 { repos++ }
+        $1 == "#" && $2 == "files" { files += $3; blamed += $4 }
+        END {
+            printf "Ownership: %d repository, %d file (%d blamati, %d dalla cache) in %.1fs, %.0f file blamati/s, al più %d git blame sulla macchina.\n",
+                repos, files, blamed, files - blamed, wall, (wall > 0 ? blamed / wall : 0), cap > "/dev/stderr"
+        }' "$@"
+}
+
+# -----------------------------------------------
+# Checkpoint per repository (--resume) e timeout (--repo-timeout)
+# -----------------------------------------------
+# Un portafoglio lungo può morire a metà (rete durante un fetch, memoria su un repository
+# enorme, Ctrl-C): i risultati stavano solo nella cartella temporanea e la run successiva
+# ripartiva dal primo repository. Ogni repository completato lascia quindi i suoi risultati
+# in $CHECKPOINT_DIR/<chiave>/: `shard.tsv` (le stesse righe che entrano in all.tsv) e, con
+# --ownership, `ownership.tsv` (l'output del collector singolo). La prima riga di ogni file è
+# "# \t head \t <commit>", l'HEAD letto PRIMA di calcolare quel file: HEAD e dati stanno
+# nello stesso file, scritto con un solo mv, quindi un'analisi rifatta dopo un nuovo commit
+# non può far sembrare attuale un'ownership vecchia (e viceversa). La chiave (checkpoint_key)
+# combina versione degli script (hash del contenuto di questo e, con --ownership, di
+# git_stats_collector.sh), percorso canonico del repository, periodo, hash degli alias e
+# opzioni che cambiano i risultati (--approx-files, --ownership, --blame-max-size).
+#   - Con --resume un repository con checkpoint completo e lo stesso HEAD non è né aggiornato
+#     né rianalizzato: i suoi file entrano nel report come se fossero appena calcolati, e
+#     risultati e ordine non dipendono da come sono stati ottenuti, quindi il JSON è identico
+#     a quello di una run pulita. Un HEAD diverso (qualcuno ha fatto fetch nel frattempo)
+#     invalida il checkpoint: il repository si rifà.
+#   - Senza --resume si ricalcola tutto, riscrivendo i checkpoint: sono sempre quelli
+#     dell'ultima run, pronti per riprenderla.
+#   - Scritture atomiche (file temporaneo + mv): un file di checkpoint è completo o non c'è.
+#   - A run conclusa senza repository falliti i checkpoint della run sono rimossi; quelli di
+#     run abbandonate scadono dopo CHECKPOINT_KEEP_DAYS giorni.
+# I fallimenti (clone, analisi, ownership; per errore o per --repo-timeout) finiscono in
+# $FAILURES_FILE e sono riepilogati su stderr a fine run: sono i repository che --resume
+# riproverà.
+
+CHECKPOINT_DIR="${GIT_ACTIVITY_CACHE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/git-activity-reports}/checkpoints"
+CHECKPOINT_KEEP_DAYS=7
+REPO_TIMEOUT_KILL_AFTER=10
+
+# checkpoint_key <path> <versione> <hash alias>: "<nome>-<hash>", come le chiavi delle cache
+# del collector singolo.
+checkpoint_key() {
+    local path version="$2" aliases="$3" key
+    path=$(readlink -m "$1")
+    key=$(printf '%s\t' "$version" "$path" "$START_DATE" "$END_DATE" "$aliases" \
+        "$APPROX_FILES" "$OWNERSHIP" "$BLAME_MAX_KB" | git hash-object --stdin)
+    echo "$(basename "$path")-${key:0:16}"
+}
+
+# HEAD attuale del repository $1 (vuoto per un repository senza commit).
+repo_head() {
+    git -C "$1" rev-parse -q --verify HEAD 2>/dev/null
+}
+
+# Vero se il file $2 del checkpoint $1 esiste ed è stato calcolato con l'HEAD attuale del
+# repository $3.
+checkpoint_valid() {
+    local dir="$1" file="$2" repo="$3" line
+    [[ -f "$dir/$file" ]] || return 1
+    IFS= read -r line < "$dir/$file" || return 1
+    [[ "$line" == "#"$'\t'"head"$'\t'"$(repo_head "$repo")" ]]
+}
+
+# checkpoint_load <cartella> <file>: contenuto del file di checkpoint, senza la riga dell'HEAD.
+checkpoint_load() {
+    tail -n +2 "$1/$2"
+}
+
+# checkpoint_save <cartella> <file> <sorgente> <head>: <sorgente> come <file> del checkpoint,
+# preceduto da <head> (letto dal chiamante prima del calcolo), con un solo mv.
+checkpoint_save() {
+    local dir="$1" file="$2" src="$3" head="$4"
+    mkdir -p "$dir" 2>/dev/null || return 0
+    { printf '#\thead\t%s\n' "$head"; cat "$src"; } > "$dir/$file.tmp.$$" 2>/dev/null &&
+        mv -f "$dir/$file.tmp.$$" "$dir/$file"
+}
+
+# record_failure <repository> <fase> <motivo>: una riga in $FAILURES_FILE (scrittura breve in
+# append, atomica anche dai worker paralleli).
+record_failure() {
+    [[ -n "$FAILURES_FILE" ]] && printf '%s\t%s\t%s\n' "$1" "$2" "$3" >> "$FAILURES_FILE"
+    return 0
+}
+
+# repo_timeout <comando...>: esegue il comando; con --repo-timeout <s> lo interrompe dopo <s>
+# secondi (TERM, poi KILL REPO_TIMEOUT_KILL_AFTER secondi dopo) con codice 124, come
+# timeout(1), che lo lancia in un proprio gruppo di processi: muoiono anche i figli (git log,
+# awk, git blame). Una funzione non è un eseguibile: l'analisi passa a un bash figlio con
+# export -f, insieme alle variabili globali che legge.
+repo_timeout() {
+    if [[ -z "$REPO_TIMEOUT" ]]; then
+        "$@"
+        return
+    fi
+    if [[ "$(type -t "$1")" == function ]]; then
+        export -f analyze_project project_log_stream aggregate_project file_sketch_registers \
+            timed_stage timing_log_counts
+        export START_DATE END_DATE TIMINGS TIMINGS_FILE APPROX_FILES FILE_SKETCH_REGISTERS
+        timeout -k "$REPO_TIMEOUT_KILL_AFTER" "$REPO_TIMEOUT" bash -c '"$@"' _ "$@"
+    else
+        timeout -k "$REPO_TIMEOUT_KILL_AFTER" "$REPO_TIMEOUT" "$@"
+    fi
+}
+
+# Riepilogo su stderr dei repository non completati ($FAILURES_FILE). Vero se non ce ne sono.
+report_failures() {
+    [[ -s "$FAILURES_FILE" ]] || return 0
+    awk -F'\t' '
+        { what[$1] = what[$1] (what[$1] != "" ? ", " : "") $2 " (" $3 ")"; if (!($1 in seen)) { seen[$1] = 1; order[++n] = $1 } }
+        END {
+            printf "Repository non completati: %d (rilancia con --resume per riprovare solo questi):\n", n > "/dev/stderr"
+            for (i = 1; i <= n; i++) printf "  %s: %s\n", order[i], what[order[i]] > "/dev/stderr"
+        }' "$FAILURES_FILE"
+    return 1
+}
+
+# -----------------------------------------------
+# Esecuzione parallela
+# -----------------------------------------------
+# run_parallel <n> <funzione> <argomenti...>: esegue `<funzione> <arg>` per ogni argomento,
+# al più <n> alla volta, e attende la fine di tutti. Pool di slot su una FIFO (funziona
+# con Bash 4.0, senza `wait -n`): ogni worker prende un token prima di partire e lo
+# restituisce alla fine. I worker sono subshell: leggono le variabili del chiamante ma non
+# possono modificarle — i risultati passano da file.
+run_parallel() {
+    local n="$1" fn="$2"
+    shift 2
+    [[ $# -gt 0 ]] || return 0
+    local slots
+    slots=$(mktemp -u "${TMPDIR:-/tmp}/git-activity-slots.XXXXXX")
+    mkfifo "$slots" || return 1
+    exec 3<>"$slots"
+    rm -f "$slots"
+    local i
+    for ((i = 0; i < n; i++)); do echo >&3; done
+    for i in "$@"; do
+        read -r -u 3
+        ( "$fn" "$i"; echo >&3 ) &
+    done
+    wait
+    exec 3>&-
+}
+
+# -----------------------------------------------
+# Tempi per fase (--timings)
+# -----------------------------------------------
+# Stesse funzioni di git_stats_collector.sh. Ogni fase aggiunge a $TIMINGS_FILE righe
+# "fase[:progetto] \t chiave \t valore": wall_s, peak_rss_kb e i contatori da cui si ricava
+# il throughput. Le fasi per repository girano nei worker paralleli: ogni riga è una
+# scrittura breve in append, atomica anche con più scrittori.
+
+# timed_stage <fase> <comando...>: esegue il comando (stdin/stdout del chiamante) e ne
+# registra durata e picco di memoria. Il picco RSS è quello del processo più grande fra
+# quelli lanciati dalla fase: finito il comando la subshell si sostituisce (exec) con
+# python3, che legge getrusage(RUSAGE_CHILDREN) — i figli già attesi, nipoti compresi,
+# restano contabilizzati attraverso exec. Nessuna dipendenza da /usr/bin/time. Il codice
+# di uscita è quello del comando. Senza --timings il comando gira nella shell corrente,
+# esattamente come prima.
+timed_stage() {
+    local stage="$1"
+    shift
+    if [[ "$TIMINGS" != true ]]; then
+        "$@"
+        return
+    fi
+    (
+        t0=$(date +%s.%N)
+        "$@"
+        status=$?
+        t1=$(date +%s.%N)
+        exec python3 -c '
+import resource, sys
+stage, status, t0, t1 = sys.argv[1:5]
+print(f"{stage}\twall_s\t{float(t1) - float(t0):.6f}")
+print(f"{stage}\tpeak_rss_kb\t{resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}")
+sys.exit(int(status))
+' "$stage" "$status" "$t0" "$t1" >> "$TIMINGS_FILE"
+    )
+}
+
+# timing_count <fase> <contatore> <valore>
+timing_count() {
+    printf '%s\t%s\t%s\n' "$1" "$2" "$3" >> "$TIMINGS_FILE"
+}
+
+# Commit e righe --numstat del flusso di git log $1, come contatori della fase $2.
+timing_log_counts() {
+    [[ "$TIMINGS" == true ]] || return 0
+    awk -F'\t' -v stage="$2" '
+        substr($0, 1, 1) == "\001" { c++; next }
+        NF >= 3 { n++ }
+        END { printf "%s\tcommits\t%d\n%s\tnumstat_lines\t%d\n", stage, c, stage, n }' "$1" >> "$TIMINGS_FILE"
+}
+
+# Riepilogo su stderr. Con un file JSON ($1) lo ristampa su stdout con metadata.timings
+# aggiunto, nella stessa serializzazione (indentata, o compatta per il formato v3).
+# $2 = inizio dell'esecuzione (date +%s.%N), per il totale.
+report_timings() {
+    python3 -c '
+import json, sys
+
+timings_path, json_path, t0, t1 = sys.argv[1:5]
+RATES = {"commits": "commit", "numstat_lines": "righe numstat", "files": "file blamati",
+         "rows": "righe TSV"}
+stages = {}
+with open(timings_path, encoding="utf-8") as fh:
+    for line in fh:
+        stage, key, value = line.rstrip("\n").split("\t")
+        stages.setdefault(stage, {})[key] = float(value) if key == "wall_s" else int(value)
+
+records = []
+for stage, values in stages.items():
+    wall = values.get("wall_s", 0.0)
+    name, _, project = stage.partition(":")
+    record = {"stage": name}
+    if project:
+        record["project"] = project
+    record["wall_s"] = round(wall, 3)
+    record["peak_rss_kb"] = values.get("peak_rss_kb", 0)
+    for key in RATES:
+        if key in values:
+            record[key] = values[key]
+            record[key + "_per_s"] = round(values[key] / wall, 1) if wall > 0 else None
+    records.append(record)
+total = round(float(t1) - float(t0), 3)
+
+print("Tempi per fase (--timings):", file=sys.stderr)
+labels = [r["stage"] + (" " + r["project"] if "project" in r else "") for r in records]
+width = max(len(label) for label in labels + ["totale"])
+for label, r in zip(labels, records):
+    wall, rss_mb = r["wall_s"], r["peak_rss_kb"] / 1024
+    rates = []
+    for key, what in RATES.items():
+        if key in r:
+            per_s = r[key + "_per_s"] or 0
+            rates.append(f"{r[key]} {what} ({per_s:.0f}/s)")
+    print(f"  {label:<{width}}  {wall:8.3f}s  RSS max {rss_mb:7.1f} MB"
+          + ("  " + ", ".join(rates) if rates else ""), file=sys.stderr)
+print("  " + "totale".ljust(width) + f"  {total:8.3f}s", file=sys.stderr)
+
+if json_path:
+    with open(json_path, encoding="utf-8", errors="surrogateescape") as fh:
+        payload = json.load(fh)
+    payload["metadata"]["timings"] = {"total_s": total, "stages": records}
+    sys.stdout.reconfigure(errors="surrogateescape")
+    if payload["metadata"].get("format") == 3:
+        json.dump(payload, sys.stdout, ensure_ascii=False, separators=(",", ":"))
+    else:
+        json.dump(payload, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+' "$TIMINGS_FILE" "$1" "$2" "$(date +%s.%N)"
+}
+
 # -----------------------------------------------
 # Logica Principale
 # -----------------------------------------------
 main() {
-    if [ ${#PROJECT_PATHS[@]} -eq 0 ] || [ -z "$START_DATE" ] || [ -z "$END_DATE" ]; then
+    if [[ "$PREPARE_ONLY" == true && ${#PROJECT_PATHS[@]} -eq 0 ]]; then
+        echo "Errore: Specificare almeno un percorso progetto (o --file)." >&2
+        exit 1
+    fi
+    if [[ "$PREPARE_ONLY" != true ]] && { [ ${#PROJECT_PATHS[@]} -eq 0 ] || [ -z "$START_DATE" ] || [ -z "$END_DATE" ]; }; then
         echo "Errore: Specificare date e almeno un percorso progetto." >&2
         echo "Utilizzo:" >&2
         echo "  $0 <DATA_INIZIO> <DATA_FINE> <percorso_progetto1> [percorso_progetto2...]" >&2
@@ -487,22 +1066,250 @@ main() {
         exit 1
     fi
 
+    local single_collector=""
+    if [[ "$OWNERSHIP" == true || "$PREPARE" == true || "$PREPARE_ONLY" == true ]]; then
+        single_collector=$(find_single_collector)
+        if [[ -z "$single_collector" ]]; then
+            echo "Errore: --ownership, --prepare e prepare richiedono git_stats_collector.sh accanto a $0." >&2
+            exit 1
+        fi
+    fi
+
+    local engine_module=""
+    if [[ "$COLUMNAR" == true ]]; then
+        engine_module=$(find_engine_module)
+        if [[ -z "$engine_module" ]]; then
+            echo "Errore: --columnar richiede git_stats_engine.py accanto a $0." >&2
+            exit 1
+        fi
+    fi
+
     local tmpdir
     tmpdir=$(mktemp -d)
     trap 'rm -rf "$tmpdir"' EXIT
     local alias_tsv="$tmpdir/aliases.tsv"
     local all_tsv="$tmpdir/all.tsv"
+    FAILURES_FILE="$tmpdir/failures.tsv"
+    : > "$FAILURES_FILE"
+
+    local t_main=""
+    if [[ "$TIMINGS" == true ]]; then
+        t_main=$(date +%s.%N)
+        TIMINGS_FILE="$tmpdir/timings.tsv"
+        : > "$TIMINGS_FILE"
+    fi
 
     dump_aliases_tsv > "$alias_tsv"
     [[ -s "$alias_tsv" ]] || alias_tsv=""
 
-    : > "$all_tsv"
-    local path
+    # Risoluzione URL -> path locale PRIMA di ogni operazione di rete, in sequenza e senza
+    # clonare: un errore qui (es. collisione di nome cartella, anche fra due URL della stessa
+    # lista che finirebbero nella stessa cartella) richiede una correzione di configurazione,
+    # non è un caso "repo non valido" da saltare, quindi interrompe tutta l'analisi.
+    local -a resolved=() urls=()
+    local -A url_of_target=()
+    local path project_path url
     for path in "${PROJECT_PATHS[@]}"; do
-        analyze_project "$path" "$alias_tsv" >> "$all_tsv"
+        project_path=$(resolve_repo_path "$path")
+        if [[ $? -ne 0 || -z "$project_path" ]]; then
+            exit 1
+        fi
+        url=""
+        if is_repo_url "$path"; then
+            url="$path"
+            local seen="${url_of_target[$project_path]}"
+            if [[ -n "$seen" && "$(normalize_repo_url "$seen")" != "$(normalize_repo_url "$url")" ]]; then
+                echo "Errore: $seen e $url verrebbero clonati entrambi in $project_path" >&2
+                echo "Configura un nome di cartella dedicato per uno dei due URL nel file di mapping: $REPOS_MAP_FILE" >&2
+                exit 1
+            fi
+            url_of_target[$project_path]="$url"
+        fi
+        resolved+=("$project_path")
+        urls+=("$url")
+    done
+
+    # Checkpoint dei repository (vedi il commento sopra CHECKPOINT_DIR): una cartella per
+    # repository, dalla chiave di checkpoint_key.
+    local self version alias_hash=""
+    self=$(readlink -f "${BASH_SOURCE[0]}" 2>/dev/null || echo "${BASH_SOURCE[0]}")
+    version=$(cat "$self" ${single_collector:+"$single_collector"} | git hash-object --stdin)
+    [[ -n "$alias_tsv" ]] && alias_hash=$(git hash-object "$alias_tsv")
+    find "$CHECKPOINT_DIR" -mindepth 1 -maxdepth 1 -type d -mtime +"$CHECKPOINT_KEEP_DAYS" \
+        -exec rm -rf {} + 2>/dev/null
+    local -a ckpt=()
+    for path in "${resolved[@]}"; do
+        ckpt+=("$CHECKPOINT_DIR/$(checkpoint_key "$path" "$version" "$alias_hash")")
     done
 
-    sort -t$'\t' -k1,1 -k2,2 -k3,3 "$all_tsv" | python3 -c '
+    local jobs="$JOBS"
+    [[ -n "$jobs" ]] || jobs=$(nproc 2>/dev/null)
+    jobs="${jobs:-4}"
+    (( jobs > ${#resolved[@]} )) && jobs=${#resolved[@]}
+
+    # Clone e fetch di tutti i repository in parallelo (attesa di rete, non CPU), una sola
+    # volta per cartella anche se la lista la nomina più volte.
+    local -A synced=()
+    local -a sync_idx=()
+    local i
+    for i in "${!resolved[@]}"; do
+        [[ -n "${synced[${resolved[$i]}]}" ]] && continue
+        synced[${resolved[$i]}]=1
+        sync_idx+=("$i")
+    done
+    sync_worker() {
+        if [[ "$RESUME" == true ]] && checkpoint_valid "${ckpt[$1]}" shard.tsv "${resolved[$1]}" &&
+                { [[ "$OWNERSHIP" != true ]] || checkpoint_valid "${ckpt[$1]}" ownership.tsv "${resolved[$1]}"; }; then
+            echo "Skip aggiornamento per $(basename "${resolved[$1]}"): già completato in una run precedente (--resume)." >&2
+            return 0
+        fi
+        sync_repo "${resolved[$1]}" "${urls[$1]}"
+    }
+    timed_stage sync run_parallel "$jobs" sync_worker "${sync_idx[@]}"
+
+    # Commit-graph dopo clone/fetch (i commit appena scaricati ne fanno parte), una volta per
+    # cartella come la sincronizzazione, con il sottocomando `prepare` di git_stats_collector.sh
+    # (dove è spiegato cosa fa git con il grafo): conta soprattutto per i clone creati da
+    # sync_repo, che non lo hanno mai. Un repository assente o non valido è saltato qui e
+    # segnalato dall'analisi.
+    prepare_worker() {
+        if ! git -C "${resolved[$1]}" rev-parse --git-dir > /dev/null 2>&1; then
+            [[ "$PREPARE_ONLY" == true ]] && echo "Avviso: ${PROJECT_PATHS[$1]} non è un repository Git valido, saltato." >&2
+            return 0
+        fi
+        bash "$single_collector" --repo "${resolved[$1]}" --no-compare prepare
+    }
+    if [[ "$PREPARE_ONLY" == true ]]; then
+        run_parallel "$jobs" prepare_worker "${sync_idx[@]}"
+        # Misure in sequenza: in parallelo si disturberebbero a vicenda (il grafo è già
+        # aggiornato, resta solo il confronto)
+        for i in "${sync_idx[@]}"; do
+            git -C "${resolved[$i]}" rev-parse --git-dir > /dev/null 2>&1 &&
+                bash "$single_collector" --repo "${resolved[$i]}" prepare
+        done
+        exit 0
+    fi
+    if [[ "$PREPARE" == true ]]; then
+        timed_stage prepare run_parallel "$jobs" prepare_worker "${sync_idx[@]}"
+    fi
+
+    # Ogni repository scrive il proprio shard; un worker che fallisce (es. awk terminato per
+    # memoria, o oltre --repo-timeout) viene segnalato e il suo shard, potenzialmente
+    # incompleto, scartato — gli altri proseguono. Uno shard completo è anche il checkpoint
+    # del repository; con --resume lo si rilegge invece di rifare l'analisi.
+    analysis_worker() {
+        local i="$1"
+        local shard="$tmpdir/shard.$i.tsv" t0 t1 name head
+        name=$(basename "${resolved[$i]}")
+        if [[ "$RESUME" == true ]] && checkpoint_valid "${ckpt[$i]}" shard.tsv "${resolved[$i]}"; then
+            checkpoint_load "${ckpt[$i]}" shard.tsv > "$shard"
+            echo "Analisi di $name ripresa dal checkpoint (--resume)." >&2
+            return 0
+        fi
+        head=$(repo_head "${resolved[$i]}")
+        t0=$(date +%s.%N)
+        repo_timeout analyze_project "${PROJECT_PATHS[$i]}" "${resolved[$i]}" "$alias_tsv" "$tmpdir/log.$i" > "$shard.part"
+        case $? in
+            0)
+                mv "$shard.part" "$shard"
+                checkpoint_save "${ckpt[$i]}" shard.tsv "$shard" "$head"
+                t1=$(date +%s.%N)
+                awk -v n="$name" -v t0="$t0" -v t1="$t1" \
+                    'BEGIN { printf "Analisi di %s completata in %.1fs.\n", n, t1 - t0 > "/dev/stderr" }'
+                ;;
+            3)
+                rm -f "$shard.part"
+                ;;
+            124)
+                rm -f "$shard.part"
+                echo "Avviso: analisi di ${PROJECT_PATHS[$i]} interrotta dopo ${REPO_TIMEOUT}s (--repo-timeout), repository escluso dal report." >&2
+                record_failure "${PROJECT_PATHS[$i]}" analisi timeout
+                ;;
+            *)
+                rm -f "$shard.part"
+                echo "Avviso: analisi di ${PROJECT_PATHS[$i]} fallita, repository escluso dal report." >&2
+                record_failure "${PROJECT_PATHS[$i]}" analisi errore
+                ;;
+        esac
+    }
+    timed_stage analyze run_parallel "$jobs" analysis_worker "${!resolved[@]}"
+
+    # Ownership dei repository analizzati con successo, una volta per cartella. Ogni worker
+    # lancia il collector singolo, il cui pool di git blame prende gli slot del tetto di
+    # macchina: --jobs decide quanti repository sono in corsa, --blame-jobs quanti blame.
+    # Manifest "progetto \t TSV" per emit_json, nell'ordine di sync_idx.
+    local manifest="$tmpdir/ownership.lst"
+    : > "$manifest"
+    ownership_worker() {
+        local i="$1" name out head
+        name=$(basename "${resolved[$i]}")
+        out="$tmpdir/ownership.$i.tsv"
+        if [[ "$RESUME" == true ]] && checkpoint_valid "${ckpt[$i]}" ownership.tsv "${resolved[$i]}"; then
+            # Nessun file blamato in questa run: il riepilogo del throughput non deve contarli
+            checkpoint_load "${ckpt[$i]}" ownership.tsv \
+                | awk -F'\t' -v OFS='\t' '$1 == "#" && $2 == "files" { $4 = 0 } 1' > "$out"
+            echo "Ownership di $name ripresa dal checkpoint (--resume)." >&2
+            return 0
+        fi
+        head=$(repo_head "${resolved[$i]}")
+        timed_stage "ownership:$name" repo_timeout bash "$single_collector" ownership --repo "${resolved[$i]}" \
+            ${BLAME_JOBS:+--blame-jobs "$BLAME_JOBS"} ${BLAME_MAX_KB:+--blame-max-size "$BLAME_MAX_KB"} \
+            "$END_DATE" > "$out.part"
+        case $? in
+            0) ;;
+            124)
+                rm -f "$out.part"
+                echo "Avviso: ownership di ${PROJECT_PATHS[$i]} interrotta dopo ${REPO_TIMEOUT}s (--repo-timeout), non calcolata." >&2
+                record_failure "${PROJECT_PATHS[$i]}" ownership timeout
+                return 0
+                ;;
+            *)
+                rm -f "$out.part"
+                echo "Avviso: ownership di ${PROJECT_PATHS[$i]} non calcolata." >&2
+                record_failure "${PROJECT_PATHS[$i]}" ownership errore
+                return 0
+                ;;
+        esac
+        mv "$out.part" "$out"
+        checkpoint_save "${ckpt[$i]}" ownership.tsv "$out" "$head"
+        [[ "$TIMINGS" == true ]] &&
+            timing_count "ownership:$name" files "$(awk -F'\t' '$1 == "#" && $2 == "files" { print $4 }' "$out")"
+    }
+    if [[ "$OWNERSHIP" == true ]]; then
+        local -a own_idx=()
+        for i in "${sync_idx[@]}"; do
+            [[ -f "$tmpdir/shard.$i.tsv" ]] && own_idx+=("$i")
+        done
+        local t_own t_own_end cap
+        cap="${BLAME_JOBS:-$GIT_ACTIVITY_BLAME_JOBS}"
+        [[ "$cap" =~ ^[1-9][0-9]*$ ]] || cap=$(nproc 2>/dev/null)
+        t_own=$(date +%s.%N)
+        timed_stage ownership run_parallel "$jobs" ownership_worker "${own_idx[@]}"
+        t_own_end=$(date +%s.%N)
+        local -a own_files=()
+        for i in "${own_idx[@]}"; do
+            [[ -s "$tmpdir/ownership.$i.tsv" ]] || continue
+            own_files+=("$tmpdir/ownership.$i.tsv")
+            printf '%s\t%s\n' "$(basename "${resolved[$i]}")" "$tmpdir/ownership.$i.tsv" >> "$manifest"
+        done
+        if [[ ${#own_files[@]} -gt 0 ]]; then
+            report_ownership_throughput "$(awk -v a="$t_own" -v b="$t_own_end" 'BEGIN { print b - a }')" \
+                "${cap:-4}" "${own_files[@]}"
+            [[ "$TIMINGS" == true ]] &&
+                timing_count ownership files "$(cat "${own_files[@]}" | awk -F'\t' '$1 == "#" && $2 == "files" { n += $4 } END { print n + 0 }')"
+        fi
+    fi
+
+    # Unione deterministica: l'ordine di completamento dei worker non conta, il sort sotto
+    # ordina comunque le righe (a parità di chiave, sull'intera riga).
+    : > "$all_tsv"
+    for i in "${!resolved[@]}"; do
+        [[ -f "$tmpdir/shard.$i.tsv" ]] && cat "$tmpdir/shard.$i.tsv" >> "$all_tsv"
+    done
+
+    # Serializzazione (sort + python). Funzione, per poterla misurare come fase "emit".
+    emit_json() {
+        sort -t$'\t' -k1,1 -k2,2 -k3,3 "$all_tsv" | python3 -c '
 import sys, json
 
 start, end = sys.argv[1], sys.argv[2]
@@ -543,12 +1350,88 @@ for (project, author) in sorted(groups):
         "daily_data": days,
     })
 
-json.dump({
+payload = {
     "metadata": {"start_date": start, "end_date": end, "date_basis": "author"},
     "data": data,
-}, sys.stdout, ensure_ascii=False, indent=2)
+}
+# --approx-files: registri dello sketch dei file distinti in argv[5] (0 = conteggio esatto)
+sketch_registers = int(sys.argv[5] or 0) if len(sys.argv) > 5 else 0
+if sketch_registers:
+    payload["metadata"]["files_estimate"] = {
+        "method": "hyperloglog",
+        "registers": sketch_registers,
+        "relative_error": round(1.04 / sketch_registers ** 0.5, 4),
+    }
+
+# --ownership: argv[6] = manifest "progetto \t TSV del collector singolo" (nomi grezzi),
+# argv[7] = alias "nome-git \t nome-visualizzato", applicati qui sommando le righe.
+manifest_path = sys.argv[6] if len(sys.argv) > 6 else ""
+if manifest_path:
+    aliases = {}
+    if len(sys.argv) > 7 and sys.argv[7]:
+        with open(sys.argv[7], encoding="utf-8", errors="surrogateescape") as fh:
+            for line in fh:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) >= 2 and parts[0]:
+                    aliases[parts[0]] = parts[1]
+    ownership = {}
+    with open(manifest_path, encoding="utf-8", errors="surrogateescape") as fh:
+        manifest = [line.rstrip("\n").split("\t", 1) for line in fh if line.strip()]
+    for project, tsv_path in manifest:
+        ref, ref_date, lines_by = "", "", {}
+        with open(tsv_path, encoding="utf-8", errors="surrogateescape") as fh:
+            for line in fh:
+                parts = line.rstrip("\n").split("\t")
+                if parts[0] == "#":
+                    if parts[1] == "ref":
+                        ref, ref_date = parts[2], parts[3]
+                    continue
+                if len(parts) < 2:
+                    continue
+                author = aliases.get(parts[0], parts[0])
+                lines_by[author] = lines_by.get(author, 0) + int(parts[1])
+        total = sum(lines_by.values())
+        if total > 0:
+            entries = sorted(lines_by.items(), key=lambda e: e[1], reverse=True)
+            ownership[project] = {
+                "ref_commit": ref,
+                "ref_date": ref_date,
+                "total_lines": total,
+                "by_author": [
+                    {"author": a, "lines": n, "pct": round(n / total * 100, 2)}
+                    for a, n in entries
+                ],
+            }
+    payload["ownership"] = ownership
+
+# Formato colonnare (v3): argv[3] = git_stats_engine.py, vuoto se non richiesto
+if len(sys.argv) > 3 and sys.argv[3]:
+    import os
+    sys.path.insert(0, os.path.dirname(sys.argv[3]))
+    import git_stats_engine
+    sidecar = sys.argv[4] if len(sys.argv) > 4 else ""
+    git_stats_engine.dump_payload(git_stats_engine.columnar_multi(payload, sidecar), sys.stdout, True)
+    sys.exit(0)
+
+json.dump(payload, sys.stdout, ensure_ascii=False, indent=2)
 sys.stdout.write("\n")
-' "$START_DATE" "$END_DATE"
+' "$START_DATE" "$END_DATE" "$engine_module" "$SIDECAR_FILE" "$(file_sketch_registers)" \
+            "${single_collector:+$manifest}" "$alias_tsv"
+    }
+
+    if [[ "$TIMINGS" == true ]]; then
+        # JSON su file, ristampato con metadata.timings da report_timings
+        timed_stage emit emit_json > "$tmpdir/report.json"
+        timing_count emit rows "$(wc -l < "$all_tsv")"
+        report_timings "$tmpdir/report.json" "$t_main"
+    else
+        emit_json
+    fi
+    local emitted=$?
+
+    # Run conclusa: con il report emesso e senza repository falliti i checkpoint non servono più
+    report_failures && [[ $emitted -eq 0 ]] && rm -rf -- "${ckpt[@]}"
+    return $emitted
 }
 
 main
@@ -26,7 +26,98 @@
 #   Costo misurato: un git blame per file è inevitabile; su un repository reale da 3133
 #   file, ~15-17s in parallelo (fino a `nproc` processi) contro ~98s in sequenza. Su
 #   repository molto grandi puo' comunque essere significativo: --no-ownership salta
-#   il calcolo.
+#   il calcolo. I risultati di `git blame` per file sono salvati in cache (per blob, rispetto
+#   al commit di riferimento): a un nuovo riferimento discendente si ri-blamano solo i file
+#   toccati nel frattempo, con risultato identico a un calcolo a freddo — vedi il commento
+#   sopra select_ownership_snapshot. --ownership-cache-stats ne stampa hit/miss su stderr.
+#   I git blame contemporanei sono limitati a livello di MACCHINA, non di processo:
+#   --blame-jobs <n> (o $GIT_ACTIVITY_BLAME_JOBS, default nproc) è un tetto condiviso da
+#   tutti i collector che usano la stessa cartella cache, anche lanciati in parallelo o dal
+#   collector multi-progetto (vedi il commento sopra blame_slots_dir). Il sottocomando
+#   `ownership <DATA_FINE>` calcola solo l'ownership e la stampa come TSV (nomi grezzi,
+#   senza alias): è quello che usa git_multiproject_stats_collector.sh --ownership.
+#   I file binari (stesso criterio di `git diff --numstat`) non sono blamati: le loro
+#   "righe" non significano nulla. --blame-max-size <KB> salta anche i file più grandi
+#   della soglia (opt-in, nessun limite di default); entrambi sono segnalati su stderr.
+#   --ownership-sample <n|p%> blama solo un campione di file, stratificato per dimensione, e
+#   STIMA le righe per autore con un intervallo di confidenza al 95% sulla quota: per alberi
+#   dove anche il blame parallelo di tutto è troppo lento (vedi il commento sopra
+#   OWNERSHIP_SAMPLE_STRATA). Il JSON lo dichiara (`ownership.estimate`, `pct_ci`).
+#
+# SERIE DELL'OWNERSHIP (--ownership-series month|week):
+#   Solo json, richiede git_stats_engine.py. Oltre alla fotografia, le righe possedute per
+#   autore a fine di ogni mese (o settimana, domenica) del periodo e a DATA_FINE: sezione
+#   `ownership_series`. Non un git blame per punto: il blame completo si fa una volta al primo
+#   punto, poi si applicano i diff dei commit fra un punto e il successivo all'autore di ogni
+#   riga; si ri-blamano solo i file toccati da un merge o da un diff binario. Il costo cresce
+#   con i cambiamenti, non con punti × file, e il risultato è quello di git blame a ogni
+#   punto (vedi OwnershipSeries nel modulo). I punti sono l'ultimo commit <= data sulla
+#   catena first-parent del riferimento dell'ownership. Niente cache ownership, niente
+#   --blame-max-size e niente --ownership-sample per la serie (sempre esatta); --blame-jobs
+#   vale anche qui.
+#
+# CACHE PER-COMMIT (--no-cache per disattivare, insieme a quella dell'ownership):
+#   Il risultato di `git log --numstat` di ogni commit già analizzato è salvato su disco
+#   (per repository, sotto $GIT_ACTIVITY_CACHE_DIR, default ~/.cache/git-activity-reports):
+#   una nuova esecuzione chiede a git il diff dei soli commit mai visti. Output identico
+#   a quello senza cache — vedi il commento sopra cached_log_stream per le garanzie
+#   (chiave SHA, storia riscritta, alias applicati dopo la cache).
+#
+# FORMATO COLONNARE (--columnar, --sidecar <file.npy>):
+#   Solo json. Invece di un oggetto per autore-giorno (chiavi ripetute, indentazione) emette
+#   il formato v3: tabelle per colonna, nomi autore codificati una volta e referenziati per
+#   indice, date come offset in giorni, JSON compatto. Con --sidecar la tabella giornaliera
+#   va in un file .npy (memory-map nei plotter) e il JSON ne riporta il percorso assoluto.
+#   I plotter riconoscono da soli entrambi i formati. Richiede git_stats_engine.py accanto
+#   allo script (unica implementazione del formato, vedi columnar_single).
+#
+# MOTORE DI AGGREGAZIONE (--engine awk|python):
+#   Default `awk`: git log | awk | sort | python3 (serializzazione JSON). Con `--engine python`
+#   lo stesso flusso di git log (cache inclusa) è letto da git_stats_engine.py, che aggrega e
+#   serializza in un solo processo, senza sort intermedio. JSON identico byte per byte; il
+#   modulo deve trovarsi accanto a questo script (anche installato in /usr/local/bin).
+#
+# TEMPI PER FASE (--timings):
+#   Misura durata, picco di memoria (RSS) e throughput di ogni fase: log (git log, rilevamento
+#   rename incluso), aggregate (awk o motore python), ownership (git blame), emit (json/text),
+#   più fetch se richiesto. Il riepilogo va su stderr e, con formato json, nel blocco
+#   `metadata.timings` (assente senza l'opzione). Per separare git log dall'aggregazione il
+#   flusso del log è scritto su file e poi riletto, invece di passare in pipe: il totale può
+#   quindi essere un po' più alto di quello di un'esecuzione normale. Vedi timed_stage.
+#
+# PER CARTELLA (--by-directory <profondità>):
+#   Per i monorepo: commit, righe e file distinti anche per cartella, cioè i primi
+#   <profondità> segmenti della cartella di ogni file ("." per i file in radice; per un
+#   rename conta la destinazione). Calcolato nello STESSO passaggio sul log, attribuendo
+#   ogni riga numstat alla sua cartella, con qualunque numero di cartelle: non lanciare il
+#   collector una volta per sottoalbero con un pathspec, che oltre a ripetere il log rompe
+#   il rilevamento rename (vedi "Nessun pathspec di esclusione" più sotto). Un commit conta una
+#   volta per ogni cartella che tocca. In json aggiunge la sezione `directories` (richiede
+#   git_stats_engine.py accanto allo script), in text una tabella per cartella in coda.
+#
+# HOTSPOT (--hotspots <k>):
+#   I <k> file con più righe modificate e i <k> file toccati da più commit nel periodo,
+#   calcolati sullo stesso flusso numstat con memoria limitata (top-K in streaming, vedi il
+#   commento sopra hotspot_capacity): nessun git log per file, nessuna tabella completa dei
+#   percorsi. In json la sezione `hotspots` (richiede git_stats_engine.py), in text due
+#   tabelle in coda. Con un filtro autore contano solo i suoi commit.
+#
+# FILE DISTINTI APPROSSIMATI (--approx-files):
+#   Per i repository con commit enormi (vendorizzazioni, monorepo): `files` stimato con uno
+#   sketch HyperLogLog a memoria limitata per ogni gruppo invece che contato su un insieme
+#   esatto di percorsi, la struttura che in quei casi porta awk a gigabyte di memoria.
+#   Errore relativo tipico 1,6% (vedi il commento sopra file_sketch_registers); commit,
+#   righe e ogni altro valore restano esatti. In json la stima è dichiarata in
+#   `metadata.files_estimate`, in text da una nota sotto la tabella.
+#
+# COMMIT-GRAPH (--prepare, sottocomando prepare):
+#   Con --prepare, dopo l'eventuale fetch e prima dell'analisi, scrive o aggiorna il
+#   commit-graph del repository con i filtri di Bloom dei path modificati: git log lo usa per
+#   percorrere la storia e git blame (ownership) per scartare senza diff i commit che non
+#   toccano il file. Se il grafo è già aggiornato non fa nulla. `prepare [DATA_INIZIO]` fa
+#   solo questo e misura su stderr le stesse operazioni senza e con grafo (--no-compare: solo
+#   la scrittura). È l'unica implementazione: git_multiproject_stats_collector.sh e
+#   find_generated_candidates.sh chiamano `prepare --no-compare`. Richiede git >= 2.27.
 #
 # METODO DI RACCOLTA:
 #   - Un SOLO `git log` per repository (non uno per giorno/autore): il raggruppamento
@@ -55,6 +146,7 @@
 #
 # OUTPUT:
 #   - Formato TEXT: Tabella giornaliera con commit, righe aggiunte/rimosse, file
+#     (settimanale o mensile con --group-by week|month: settimane ISO da lunedì, mesi solari)
 #   - Formato JSON: metadata + array di oggetti con statistiche giornaliere per autore
 #
 # FORMATO JSON:
@@ -89,8 +181,18 @@
 #       "ref_commit": "abcdef0123...",
 #       "ref_date": "2025-11-30",
 #       "total_lines": 48213,
+#       "estimate": { "method": "stratified_sample", "sampled_files": 2000,
+#                     "population_files": 150400, "strata": 10, "confidence": 0.95 },
 #       "by_author": [
-#         { "author": "Nome Autore", "lines": 30112, "pct": 62.45 }
+#         { "author": "Nome Autore", "lines": 30112, "pct": 62.45, "pct_ci": [58.1, 66.8] }
+#       ]
+#     },
+#     "ownership_series": {
+#       "period": "month",
+#       "authors": ["Nome Autore", "Altro Autore"],
+#       "points": [
+#         { "date": "2025-10-31", "ref_commit": "0123abcd...", "ref_date": "2025-10-30",
+#           "total_lines": 47020, "lines": [29870, 17150] }
 #       ]
 #     }
 #   }
@@ -99,6 +201,9 @@
 #   dal range in metadata. Per retrocompatibilità `plot_git.py` accetta ancora anche
 #   il vecchio formato (array JSON senza metadata, senza punch_card/ownership).
 #
+#   `metadata.author` (solo con il filtro [autore]): il nome, dopo gli alias, a cui è
+#   ristretto `data`. Chi somma o archivia il JSON deve sapere che gli altri autori mancano.
+#
 #   `punch_card`: distribuzione dei commit per giorno della settimana (0=lunedì..6=domenica,
 #   convenzione Python `date.weekday()`) e ora (0-23, ora locale registrata nel commit —
 #   nessuna conversione a un fuso comune), aggregata su tutto il periodo richiesto.
@@ -108,13 +213,22 @@
 #   secondo `git blame` — chi ha scritto per ultimo ogni riga ancora presente nell'albero.
 #   Include anche autori mai attivi nel periodo richiesto, se hanno ancora codice presente.
 #   Nessuna esclusione di file generati/vendorizzati (stessa scelta fatta per il churn).
+#   `estimate` e `pct_ci` solo con --ownership-sample: righe e totale sono estrapolati dal
+#   campione, `pct_ci` è l'intervallo al 95% della quota (limitato a 0-100). Senza campione
+#   (tutto in cache, o campione grande quanto l'albero) il blocco è esatto e non li ha.
+#
+#   `ownership_series` (solo con --ownership-series): un punto per fine mese/settimana del
+#   periodo più DATA_FINE, con commit di riferimento e righe per autore (`lines`, nello
+#   stesso ordine di `authors`, che segue le righe all'ultimo punto). Alias applicati.
 #
 # REPOSITORY REMOTI (--repo):
 #   Senza --repo, lo script analizza il repository nella cartella corrente (comportamento storico).
 #   Con --repo <url> (es. https://github.com/org/repo.git o git@github.com:org/repo.git), il repository
-#   viene clonato (la prima volta) o aggiornato (con --fetch) in una cartella locale sotto
-#   $GIT_ACTIVITY_REPOS_DIR (default: ~/repos), poi analizzato normalmente. --repo accetta anche un path
-#   locale, equivalente a lanciare lo script da dentro quella cartella.
+#   viene clonato (la prima volta, senza checkout: serve solo la storia) o aggiornato (con --fetch)
+#   in una cartella locale sotto $GIT_ACTIVITY_REPOS_DIR (default: ~/repos), poi analizzato
+#   normalmente. --fetch-ttl <minuti> salta il fetch se ne è già stato fatto uno di recente.
+#   --repo accetta anche un path locale, equivalente a lanciare lo script da dentro quella
+#   cartella.
 #   Se una cartella con lo stesso nome esiste già ma non corrisponde all'URL richiesto, lo script si
 #   ferma con un errore: definisci un nome dedicato nel file di mapping (vedi git_multiproject_stats_collector.sh
 #   per i dettagli, la convenzione è condivisa tra i due script).
@@ -125,7 +239,7 @@
 #   - `lines` = aggiunte + eliminate (indicatore di volume, non di valore)
 #   - I file binari contano come file toccati ma non contribuiscono alle righe
 #   - Richiede GNU date (su macOS: brew install coreutils, usa gdate)
-#   - Di default, il repository non viene aggiornato con git fetch (usa --fetch per abilitare)
+#   - Di default, il repository non viene aggiornato con git fetch (usa --fetch o --fetch-ttl)
 #
 # REQUISITI:
 #   - Bash 4.0+
@@ -144,8 +258,31 @@ END_DATE=""
 OUTPUT_FORMAT="text"
 CLI_AUTHOR_FILTER=""
 FETCH_ENABLED=false
+FETCH_TTL=""
 REPO_ARG=""
 OWNERSHIP_ENABLED=true
+CACHE_ENABLED=true
+OWNERSHIP_CACHE_STATS=false
+OWNERSHIP_ONLY=false
+BLAME_MAX_KB=0
+BLAME_JOBS=""
+OWNERSHIP_SAMPLE=""
+ENGINE="awk"
+ENGINE_MODULE=""
+COLUMNAR=false
+SIDECAR_FILE=""
+TIMINGS=false
+TIMINGS_FILE=""
+TIMED_LOG=""
+GROUP_BY=""
+PREPARE=false
+PREPARE_ONLY=false
+PREPARE_COMPARE=true
+BY_DIRECTORY=""
+HOTSPOTS=""
+HOTSPOT_AUTHOR=""
+APPROX_FILES=false
+OWNERSHIP_SERIES=""
 
 # Parse positional and optional arguments
 TEMP_ARGS=()
@@ -155,10 +292,120 @@ while [[ $# -gt 0 ]]; do
             FETCH_ENABLED=true
             shift
             ;;
+        --fetch-ttl)
+            if ! [[ "$2" =~ ^[0-9]+$ ]]; then
+                echo "Errore: --fetch-ttl richiede un numero di minuti." >&2
+                exit 1
+            fi
+            FETCH_ENABLED=true
+            FETCH_TTL="$2"
+            shift 2
+            ;;
         --no-ownership)
             OWNERSHIP_ENABLED=false
             shift
             ;;
+        --no-cache)
+            CACHE_ENABLED=false
+            shift
+            ;;
+        --ownership-cache-stats)
+            OWNERSHIP_CACHE_STATS=true
+            shift
+            ;;
+        --blame-jobs)
+            if ! [[ "$2" =~ ^[1-9][0-9]*$ ]]; then
+                echo "Errore: --blame-jobs richiede un numero intero positivo." >&2
+                exit 1
+            fi
+            BLAME_JOBS="$2"
+            shift 2
+            ;;
+        --blame-max-size)
+            if ! [[ "$2" =~ ^[1-9][0-9]*$ ]]; then
+                echo "Errore: --blame-max-size richiede una dimensione in KB (intero positivo)." >&2
+                exit 1
+            fi
+            BLAME_MAX_KB="$2"
+            shift 2
+            ;;
+        --ownership-sample)
+            if ! [[ "$2" =~ ^[1-9][0-9]*%?$ ]] || [[ "$2" =~ % && ${2%\%} -ge 100 ]]; then
+                echo "Errore: --ownership-sample richiede un numero di file o una percentuale (es. 2000 o 5%)." >&2
+                exit 1
+            fi
+            OWNERSHIP_SAMPLE="$2"
+            shift 2
+            ;;
+        --ownership-series)
+            if [[ "$2" != "month" && "$2" != "week" ]]; then
+                echo "Errore: --ownership-series accetta 'month' o 'week'." >&2
+                exit 1
+            fi
+            OWNERSHIP_SERIES="$2"
+            shift 2
+            ;;
+        --engine)
+            if [[ "$2" != "awk" && "$2" != "python" ]]; then
+                echo "Errore: --engine accetta 'awk' o 'python'." >&2
+                exit 1
+            fi
+            ENGINE="$2"
+            shift 2
+            ;;
+        --columnar)
+            COLUMNAR=true
+            shift
+            ;;
+        --sidecar)
+            if [[ -z "$2" || "$2" =~ ^- ]]; then
+                echo "Errore: --sidecar richiede un percorso di file (.npy)." >&2
+                exit 1
+            fi
+            COLUMNAR=true
+            SIDECAR_FILE="$2"
+            shift 2
+            ;;
+        --timings)
+            TIMINGS=true
+            shift
+            ;;
+        --prepare)
+            PREPARE=true
+            shift
+            ;;
+        --no-compare)
+            PREPARE_COMPARE=false
+            shift
+            ;;
+        --by-directory)
+            if ! [[ "$2" =~ ^[1-9][0-9]*$ ]]; then
+                echo "Errore: --by-directory richiede una profondità (numero di segmenti, >= 1)." >&2
+                exit 1
+            fi
+            BY_DIRECTORY="$2"
+            shift 2
+            ;;
+        --hotspots)
+            if ! [[ "$2" =~ ^[1-9][0-9]*$ ]]; then
+                echo "Errore: --hotspots richiede il numero di file da riportare (>= 1)." >&2
+                exit 1
+            fi
+            HOTSPOTS="$2"
+            shift 2
+            ;;
+        --approx-files)
+            APPROX_FILES=true
+            shift
+            ;;
+        --group-by)
+            if [[ "$2" != "week" && "$2" != "month" ]]; then
+                echo "Errore: --group-by accetta 'week' o 'month'." >&2
+                exit 1
+            fi
+            GROUP_BY="$2"
+            shift 2
+            ;;
         --repo)
             if [[ -z "$2" || "$2" =~ ^- ]]; then
                 echo "Errore: --repo richiede un argomento (path locale o URL)." >&2
@@ -171,11 +418,32 @@ while [[ $# -gt 0 ]]; do
             cat << 'EOF'
 UTILIZZO:
   ./git_stats_collector.sh [OPZIONI] <DATA_INIZIO> <DATA_FINE> [formato] [autore]
+  ./git_stats_collector.sh [--repo <path|url>] [--fetch] [--no-compare] prepare [DATA_INIZIO]
+  ./git_stats_collector.sh [--repo <path|url>] [--blame-jobs <n>] [--blame-max-size <KB>] [--ownership-sample <n|p%>] ownership <DATA_FINE>
 
 OPZIONI:
   --fetch          Abilita l'aggiornamento del repository con git fetch
+  --fetch-ttl <m>  Come --fetch, ma salta il fetch se già eseguito negli ultimi <m> minuti
   --repo <path|url>  Analizza questo repository (path locale o URL) invece della cartella corrente
   --no-ownership   Salta il calcolo dell'ownership (git blame per file, solo formato json)
+  --no-cache       Non usa (né aggiorna) le cache persistenti (commit e ownership)
+  --ownership-cache-stats  Stampa su stderr hit/miss/tempo risparmiato della cache ownership
+  --blame-jobs <n> Tetto di git blame contemporanei per TUTTA la macchina, condiviso con gli
+                   altri collector in esecuzione (default: $GIT_ACTIVITY_BLAME_JOBS, poi nproc)
+  --blame-max-size <KB>  Ownership: salta (segnalandoli) i file più grandi di <KB> KB (default: nessun limite)
+  --ownership-sample <n|p%>  Ownership stimata da un campione di <n> file (o <p>% dei file), stratificato
+                   per dimensione, con intervallo di confidenza al 95% per ogni autore
+  --ownership-series <month|week>  Anche le righe possedute a fine di ogni mese/settimana (solo json)
+  --engine <awk|python>  Motore di aggregazione (default: awk); 'python' usa git_stats_engine.py
+  --columnar       JSON in formato colonnare compatto (v3, solo formato json)
+  --sidecar <file.npy>  Come --columnar, con la tabella giornaliera nel file binario indicato
+  --timings        Tempi, picco di memoria e throughput per fase (su stderr e in metadata.timings)
+  --group-by <week|month>  Formato text: una riga per settimana ISO o per mese invece che per giorno
+  --prepare        Scrive/aggiorna il commit-graph con filtri di Bloom prima dell'analisi
+  --no-compare     Con `prepare`: solo il commit-graph, senza il confronto dei tempi senza/con
+  --by-directory <n>  Churn e file anche per cartella (primi <n> segmenti del percorso), stesso git log
+  --hotspots <k>   I <k> file con più righe modificate e i <k> toccati più spesso nel periodo
+  --approx-files   File distinti stimati (HyperLogLog, errore tipico 1,6%) a memoria limitata
   -h, --help       Mostra questo help
 
 PARAMETRI:
@@ -200,6 +468,12 @@ ESEMPI:
   # Repository remoto (clonato/aggiornato sotto ~/repos, override con GIT_ACTIVITY_REPOS_DIR)
   ./git_stats_collector.sh --repo https://github.com/org/repo.git 2025-11-01 2025-11-30 json
 
+  # Solo preparazione: commit-graph con filtri di Bloom e confronto dei tempi senza/con
+  ./git_stats_collector.sh prepare 2025-01-01
+
+  # Solo ownership all'ultimo commit <= DATA_FINE, come TSV (autore, righe; nomi grezzi)
+  ./git_stats_collector.sh ownership 2025-11-30
+
 NOTE:
   - I giorni sono attribuiti per author-date (rebase-safe), non per committer-date
   - `files` conta i file distinti toccati, non le modifiche per file
@@ -220,6 +494,16 @@ done
 
 # Ripristina gli argomenti posizionali
 set -- "${TEMP_ARGS[@]}"
+# Sottocomando `prepare`: solo commit-graph (vedi prepare_commit_graph), data opzionale
+if [[ "$1" == "prepare" ]]; then
+    PREPARE_ONLY=true
+    shift
+fi
+# Sottocomando `ownership`: solo la data di fine (riferimento dell'ownership)
+if [[ "$1" == "ownership" ]]; then
+    OWNERSHIP_ONLY=true
+    set -- "$2" "$2"
+fi
 START_DATE="$1"
 END_DATE="$2"
 OUTPUT_FORMAT="${3:-text}" # Predefinito a 'text'
@@ -238,6 +522,8 @@ CLI_AUTHOR_FILTER="$4"     # Filtro opzionale da riga di comando
 
 REPOS_DIR="${GIT_ACTIVITY_REPOS_DIR:-$HOME/repos}"
 REPOS_MAP_FILE="${XDG_CONFIG_HOME:-$HOME/.config}/git-activity-reports/git-activity-repos-map.json"
+# GIT_ACTIVITY_CACHE_DIR: radice delle cache persistenti (vedi "Cache per-commit" più sotto).
+CACHE_DIR="${GIT_ACTIVITY_CACHE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/git-activity-reports}"
 
 # Riconosce URL Git: qualsiasi schema URI (http/https/git/ssh/file/...) oppure forma scp (git@host:percorso)
 is_repo_url() {
@@ -265,8 +551,12 @@ except Exception:
 ' "$REPOS_MAP_FILE" "$url"
 }
 
-# Clona/aggiorna un repository remoto sotto $REPOS_DIR e stampa su stdout il path locale risultante.
-# In caso di errore/collisione non stampa nulla e ritorna 1.
+# Clona (se assente) un repository remoto sotto $REPOS_DIR e stampa su stdout il path locale
+# risultante. In caso di errore/collisione non stampa nulla e ritorna 1. L'aggiornamento
+# (--fetch/--fetch-ttl) non avviene qui ma in main, una sola volta, come per i path locali.
+# Clone SENZA checkout: lo script legge solo la storia (git log, git blame su un commit),
+# mai i file dell'albero di lavoro. La cartella resta un normale repository con .git (non
+# un bare clone): `git checkout` al suo interno la rende un checkout completo.
 resolve_remote_repo() {
     local url="$1"
     local mapped_name default_name target_name target
@@ -280,7 +570,7 @@ resolve_remote_repo() {
 
     if [[ ! -d "$target" ]]; then
         echo "Clonazione di $url in $target..." >&2
-        if ! git clone --quiet "$url" "$target"; then
+        if ! git clone --quiet --no-checkout "$url" "$target"; then
             echo "Errore: clonazione di $url fallita." >&2
             return 1
         fi
@@ -302,16 +592,21 @@ resolve_remote_repo() {
             echo "Esempio: { \"$url\": \"nome-cartella-alternativo\" }" >&2
             return 1
         fi
-
-        if [[ "$FETCH_ENABLED" == true ]]; then
-            echo "Aggiornamento repository remoto in $target..." >&2
-            git -C "$target" fetch --quiet 2>/dev/null || echo "Avviso: fetch fallito per $target." >&2
-        fi
     fi
 
     echo "$target"
 }
 
+# Vero se il repository corrente ha fatto fetch negli ultimi $FETCH_TTL minuti (data di
+# modifica di FETCH_HEAD, che git riscrive a ogni fetch). Sempre falso senza --fetch-ttl.
+fetch_is_fresh() {
+    [[ -n "$FETCH_TTL" ]] || return 1
+    local fh mtime
+    fh=$(git rev-parse --git-path FETCH_HEAD 2>/dev/null) || return 1
+    mtime=$(stat -c %Y "$fh" 2>/dev/null) || return 1
+    (( $(date +%s) - mtime < FETCH_TTL * 60 ))
+}
+
 # Risolve un argomento "path locale o URL" nel path locale da usare per l'analisi.
 resolve_repo_path() {
     local input="$1"
@@ -322,6 +617,142 @@ resolve_repo_path() {
     fi
 }
 
+# -----------------------------------------------
+# Commit-graph con filtri di Bloom (--prepare, sottocomando prepare)
+# -----------------------------------------------
+# Senza commit-graph `git log --since` deve decomprimere ogni oggetto commit per conoscerne
+# genitori e date, e le ricerche per path (`git log -- <path>`, e la storia che git blame
+# ripercorre per ogni file) calcolano un diff per ogni commit attraversato. Il commit-graph
+# (objects/info nella git-dir) tiene genitori e date in un file indicizzato; i filtri di
+# Bloom dei path modificati (--changed-paths) permettono di scartare senza diff i commit
+# che non toccano un path. Git li usa da solo quando ci sono, ma li scrivono solo
+# `git gc`/`git maintenance`, e senza filtri di Bloom salvo richiesta esplicita: un clone
+# creato da questi script sotto $GIT_ACTIVITY_REPOS_DIR non li ha mai.
+#
+# Il grafo è riscritto solo se manca, se un suo strato non ha i filtri di Bloom (chunk
+# BIDX nell'intestazione) o se un ref è stato aggiornato dopo la sua scrittura (commit
+# nuovi fuori dal grafo). La scrittura è incrementale (--split): solo i commit nuovi e i
+# loro filtri; se però uno strato esistente non ha i filtri il grafo è riscritto per intero
+# (--split=replace), così i filtri coprono tutta la storia. Richiede git >= 2.27; con un
+# git più vecchio resta un avviso e l'analisi prosegue come prima.
+
+# Vero se il commit-graph della git-dir $1 esiste, ha i filtri di Bloom in ogni strato ed è
+# più recente di tutti i ref.
+commit_graph_is_fresh() {
+    local gitdir="$1" info="$1/objects/info" newest="" f
+    local -a graphs=()
+    [[ -f "$info/commit-graph" ]] && graphs+=("$info/commit-graph")
+    for f in "$info"/commit-graphs/*.graph; do
+        [[ -f "$f" ]] && graphs+=("$f")
+    done
+    [[ ${#graphs[@]} -gt 0 ]] || return 1
+    commit_graph_has_bloom "$gitdir" || return 1
+    for f in "${graphs[@]}"; do
+        [[ -z "$newest" || "$f" -nt "$newest" ]] && newest="$f"
+    done
+    [[ -z "$(find "$gitdir/refs" "$gitdir/packed-refs" -newer "$newest" -print -quit 2>/dev/null)" ]]
+}
+
+# Vero se nessuno strato esistente del commit-graph della git-dir $1 è privo dei filtri di
+# Bloom (vero anche senza grafo).
+commit_graph_has_bloom() {
+    local info="$1/objects/info" f
+    for f in "$info/commit-graph" "$info"/commit-graphs/*.graph; do
+        [[ -f "$f" ]] || continue
+        # Tabella dei chunk nei primi byte del file: basta leggere quella
+        head -c 256 "$f" | LC_ALL=C grep -q -a BIDX || return 1
+    done
+    return 0
+}
+
+# Scrive o aggiorna il commit-graph del repository $1 se serve. Fallisce solo se git non
+# riesce a scriverlo (l'analisi prosegue comunque, senza grafo).
+prepare_commit_graph() {
+    local repo="$1" name gitdir split=--split t0 t1
+    name=$(basename "$(git -C "$repo" rev-parse --show-toplevel 2>/dev/null)")
+    gitdir=$(cd "$repo" 2>/dev/null && cd "$(git rev-parse --git-common-dir 2>/dev/null)" && pwd -P) || return 1
+    if commit_graph_is_fresh "$gitdir"; then
+        echo "Commit-graph di $name già aggiornato (con filtri di Bloom)." >&2
+        return 0
+    fi
+    # Con --split gli strati esistenti restano come sono: se uno non ha i filtri (il grafo
+    # scritto da `git gc`) va riscritto tutto, o i filtri coprirebbero solo i commit nuovi.
+    commit_graph_has_bloom "$gitdir" || split=--split=replace
+    echo "Scrittura del commit-graph di $name (con filtri di Bloom dei path modificati)..." >&2
+    t0=$(date +%s.%N)
+    if ! git -C "$repo" commit-graph write --reachable --changed-paths "$split" 2>/dev/null; then
+        echo "Avviso: scrittura del commit-graph di $name fallita (i filtri di Bloom richiedono git >= 2.27)." >&2
+        return 1
+    fi
+    t1=$(date +%s.%N)
+    awk -v n="$name" -v t0="$t0" -v t1="$t1" \
+        'BEGIN { printf "Commit-graph di %s scritto in %.1fs.\n", n, t1 - t0 > "/dev/stderr" }'
+    return 0
+}
+
+# Durata in secondi di "$@" (output scartato).
+elapsed_seconds() {
+    local s e
+    s=$(date +%s.%N)
+    "$@" > /dev/null 2>&1
+    e=$(date +%s.%N)
+    awk -v s="$s" -v e="$e" 'BEGIN { printf "%.3f", e - s }'
+}
+
+# Operazioni tipiche dei collector con il commit-graph disattivato ($1 = false) o attivo
+# ($1 = true). Usano $CG_REPO, $CG_SINCE e $CG_SAMPLE (file campione, uno per riga).
+cg_walk() {
+    git -c core.commitGraph="$1" -C "$CG_REPO" rev-list --no-merges ${CG_SINCE:+--since="$CG_SINCE"} HEAD
+}
+cg_path_log() {
+    local p
+    while IFS= read -r p; do
+        git -c core.commitGraph="$1" -C "$CG_REPO" log --format=%H -- "$p"
+    done <<< "$CG_SAMPLE"
+}
+cg_blame() {
+    local p
+    head -n "$COMMIT_GRAPH_BLAME_SAMPLE" <<< "$CG_SAMPLE" | while IFS= read -r p; do
+        git -c core.commitGraph="$1" -C "$CG_REPO" blame --porcelain HEAD -- "$p"
+    done
+}
+
+COMMIT_GRAPH_PATH_SAMPLE=10
+COMMIT_GRAPH_BLAME_SAMPLE=3
+
+# Misura su stderr il guadagno del commit-graph del repository $1: le stesse operazioni
+# senza e con grafo, una dopo l'altra (cache del filesystem già calda per entrambe). Il
+# campione di file è preso a intervalli regolari nell'albero di HEAD. $2 = --since
+# del percorso della storia (vuoto = tutta la storia).
+report_commit_graph_speedup() {
+    local CG_REPO="$1" CG_SINCE="$2" CG_SAMPLE name
+    name=$(basename "$(git -C "$CG_REPO" rev-parse --show-toplevel 2>/dev/null)")
+    CG_SAMPLE=$(git -C "$CG_REPO" ls-tree -r --name-only HEAD 2>/dev/null | awk -v k="$COMMIT_GRAPH_PATH_SAMPLE" '
+        { p[NR] = $0 }
+        END {
+            step = int(NR / k); if (step < 1) step = 1
+            for (i = step; i <= NR && n < k; i += step) { print p[i]; n++ }
+        }')
+    [[ -n "$CG_SAMPLE" ]] || return 0
+    local nfiles nblame
+    nfiles=$(wc -l <<< "$CG_SAMPLE")
+    nblame=$(( nfiles < COMMIT_GRAPH_BLAME_SAMPLE ? nfiles : COMMIT_GRAPH_BLAME_SAMPLE ))
+    echo "Confronto senza/con commit-graph ($name):" >&2
+    local what fn off on
+    for what in "walk:cg_walk:git rev-list${CG_SINCE:+ --since=$CG_SINCE} (percorso della storia)" \
+                "path:cg_path_log:git log -- <path> ($nfiles file)" \
+                "blame:cg_blame:git blame ($nblame file)"; do
+        fn="${what#*:}"; fn="${fn%%:*}"
+        off=$(elapsed_seconds "$fn" false)
+        on=$(elapsed_seconds "$fn" true)
+        awk -v label="${what#*:*:}" -v off="$off" -v on="$on" 'BEGIN {
+            printf "  %-56s %8.3fs -> %8.3fs", label, off, on
+            if (on > 0) printf "  (%.1fx)", off / on
+            printf "\n"
+        }' >&2
+    done
+}
+
 # -----------------------------------------------
 # Alias autori
 # -----------------------------------------------
@@ -405,25 +836,289 @@ except Exception:
 # DAILY_CHURN_CAP nei plotter resta quindi l'UNICA protezione contro un outlier estremo
 # (es. un node_modules committato per errore): più importante di prima, non meno.
 
+# -----------------------------------------------
+# Cache per-commit (--no-cache per disattivare)
+# -----------------------------------------------
+# Il `git log --numstat` sotto è la parte costosa della raccolta: su repository grandi il
+# diff di ogni commit (con rilevamento rename) domina il tempo totale, e i report notturni
+# a 30/90/365 giorni rileggono ogni volta quasi gli stessi commit. La cache salva, per
+# ogni commit già visto, il suo blocco di `git log` (intestazione + righe --numstat)
+# così com'è: alla run successiva git elenca solo gli SHA della finestra (`git rev-list`,
+# nessun diff) e calcola il diff SOLO dei commit mancanti.
+#
+# Perché è sicura senza invalidazioni esplicite:
+#   - La chiave è lo SHA del commit, che fissa albero e genitori: il diff con il primo
+#     genitore (ciò che --numstat riporta) non può cambiare per lo stesso SHA.
+#   - Storia riscritta (rebase, force-push): i vecchi SHA escono da `git rev-list` e non
+#     vengono più letti; sono eliminati dalla cache quando l'oggetto sparisce dal
+#     repository (gc). I nuovi SHA sono semplicemente commit mai visti.
+#   - Alias: la cache contiene il nome autore GREZZO (%an). Gli alias sono applicati
+#     dopo, in awk, come senza cache — modificare il file alias non rende obsoleta nessuna
+#     riga. Stessa cosa per il filtro sul periodo (author-date), applicato a valle.
+#   - Formato: il nome del file include una versione (COMMIT_CACHE_FORMAT); cambiare il
+#     --pretty o il formato data sotto richiede di incrementarla.
+# Un file per repository (chiave: percorso assoluto della git-dir comune, quindi worktree
+# dello stesso repository condividono la cache), sotto $GIT_ACTIVITY_CACHE_DIR (default:
+# ${XDG_CACHE_HOME:-~/.cache}/git-activity-reports). Scritture atomiche (file temporaneo +
+# mv): due run concorrenti al più perdono un aggiornamento, mai corrompono il file.
+
+COMMIT_CACHE_FORMAT="v1"
+LOG_PRETTY='%x01%H%x09%an%x09%ad'
+LOG_DATE='format:%Y-%m-%d %H'
+
+# Stampa la chiave di cache del repository corrente, "<nome>-<hash del percorso della
+# git-dir comune>" (vuota se non determinabile). Condivisa da tutte le cache persistenti.
+repo_cache_key() {
+    local common key
+    common=$(cd "$(git rev-parse --git-common-dir 2>/dev/null)" 2>/dev/null && pwd -P) || return 0
+    [[ -n "$common" ]] || return 0
+    key=$(printf '%s' "$common" | git hash-object --stdin 2>/dev/null)
+    [[ -n "$key" ]] || return 0
+    echo "$(basename "${common%/.git}")-${key:0:16}"
+}
+
+# Stampa il percorso del file di cache per il repository corrente (vuoto se non determinabile).
+commit_cache_file() {
+    local key
+    key=$(repo_cache_key)
+    [[ -n "$key" ]] || return 0
+    echo "$CACHE_DIR/commits/$key.$COMMIT_CACHE_FORMAT.log"
+}
+
+# Emette su stdout lo stesso flusso di `git log --no-merges --since=... --numstat` (un
+# blocco per commit, ordine non garantito: l'aggregazione a valle non dipende dall'ordine),
+# leggendo dalla cache i commit già noti e aggiornandola con quelli nuovi.
+cached_log_stream() {
+    local since="$1" cache="$2" tmpdir="$3"
+    local window="$tmpdir/cache_window.lst" missing="$tmpdir/cache_missing.lst"
+    local fresh="$tmpdir/cache_fresh.log"
+
+    git rev-list --no-merges --since="$since" HEAD > "$window" 2>/dev/null
+    [[ -f "$cache" ]] || : > "$cache"
+
+    # Blocchi in cache che appartengono alla finestra -> stdout; SHA della finestra non
+    # trovati in cache -> $missing. Un blocco duplicato (scritture concorrenti) si legge
+    # una volta sola.
+    awk -v windowfile="$window" -v missing="$missing" '
+        BEGIN { while ((getline s < windowfile) > 0) want[s] = 1; close(windowfile) }
+        substr($0, 1, 1) == "\001" {
+            sha = substr($1, 2)
+            keep = (sha in want) && !(sha in done)
+            if (keep) done[sha] = 1
+        }
+        keep { print }
+        END {
+            for (s in want) if (!(s in done)) print s > missing
+            close(missing)
+        }' FS='\t' "$cache"
+    [[ -f "$missing" ]] || : > "$missing"
+
+    local nwin nmiss
+    nwin=$(wc -l < "$window"); nmiss=$(wc -l < "$missing")
+    echo "Cache commit: $((nwin - nmiss)) letti dalla cache, $nmiss da calcolare con git log." >&2
+    # Con --stdin vuoto `git log` ripiegherebbe su HEAD: va saltato esplicitamente.
+    [[ "$nmiss" -gt 0 ]] || return 0
+
+    git log --no-walk=unsorted --no-merges --stdin \
+        --pretty=format:"$LOG_PRETTY" --date="$LOG_DATE" --numstat < "$missing" > "$fresh" 2>/dev/null
+    printf '\n' >> "$fresh"
+    cat "$fresh"
+
+    # Aggiornamento: cache esistente meno i commit il cui oggetto non esiste più (storia
+    # riscritta e già ripulita da gc), più i blocchi appena calcolati.
+    local gone="$tmpdir/cache_gone.lst" next="$cache.tmp.$$"
+    awk -F'\t' 'substr($0, 1, 1) == "\001" { print substr($1, 2) }' "$cache" \
+        | git cat-file --batch-check='%(objectname) %(objecttype)' 2>/dev/null \
+        | awk '$2 == "missing" { print $1 }' > "$gone"
+    awk -v gonefile="$gone" '
+        BEGIN { while ((getline s < gonefile) > 0) gone[s] = 1; close(gonefile); keep = 1 }
+        substr($0, 1, 1) == "\001" { keep = !(substr($1, 2) in gone) }
+        keep { print }' FS='\t' "$cache" > "$next" \
+        && cat "$fresh" >> "$next" \
+        && mv -f "$next" "$cache" \
+        || rm -f "$next"
+}
+
 # -----------------------------------------------
 # Raccolta dati: UN SOLO git log, aggregazione in awk
 # -----------------------------------------------
+# Emette su stdout il flusso `git log --numstat` dei commit da aggregare, dalla cache
+# per-commit se attiva. Comune ai due motori (--engine): il filtro sul periodo, gli alias
+# e l'aggregazione avvengono a valle.
+commit_log_stream() {
+    local tmpdir="$1"
+    # Con --timings il flusso è già stato raccolto (e cronometrato) nella fase "log": vedi main
+    if [[ -n "$TIMED_LOG" ]]; then
+        cat "$TIMED_LOG"
+        return
+    fi
+    # --since esteso indietro: filtriamo per author-date a valle, e la committer-date
+    # di un commit rebasato è successiva alla sua author-date. Nessun --until, per non
+    # perdere lavoro autorato nel periodo ma committato (rebasato) dopo la fine.
+    local since_margin
+    since_margin=$(date -d "$START_DATE -31 days" +%Y-%m-%d 2>/dev/null || echo "$START_DATE")
+
+    local cache=""
+    if [[ "$CACHE_ENABLED" == true ]]; then
+        cache=$(commit_cache_file)
+        if [[ -n "$cache" ]] && ! mkdir -p "$(dirname "$cache")" 2>/dev/null; then
+            echo "Avviso: cartella di cache non scrivibile ($(dirname "$cache")), cache disattivata." >&2
+            cache=""
+        fi
+    fi
+
+    if [[ -n "$cache" ]]; then
+        cached_log_stream "$since_margin" "$cache" "$tmpdir"
+    else
+        git log --no-merges --since="$since_margin" \
+            --pretty=format:"$LOG_PRETTY" --date="$LOG_DATE" --numstat 2>/dev/null
+    fi
+}
+
+# Hotspot (--hotspots K): i K file con più righe modificate e i K file toccati da più commit
+# nel periodo, dallo stesso flusso numstat. Memoria limitata anche con milioni di percorsi
+# nella storia: niente tabella completa per percorso, ma due tabelle Space-Saving (Metwally
+# et al.) da al più 2 × capacità voci. Quando una tabella è piena si tengono le `capacità`
+# voci più alte e si scartano le altre; la soglia di scarto diventa il valore di partenza
+# (ed errore massimo) di ogni percorso nuovo. Costo ammortizzato costante per riga: una
+# potatura lineare ogni `capacità` percorsi nuovi. Per ogni voce il valore vero sta fra
+# valore - errore e valore, e ogni file il cui valore vero supera la soglia finale è
+# sicuramente in tabella: con capacità = HOTSPOT_CAPACITY_FACTOR × K (almeno
+# HOTSPOT_MIN_CAPACITY) i primi K sono esatti salvo distribuzioni molto piatte, e l'errore
+# riportato nel JSON lo dice (0 = esatto). Per un rename conta la destinazione. Stesso
+# algoritmo (stessi risultati) in git_stats_engine.py (HotspotCounter).
+HOTSPOT_CAPACITY_FACTOR=50
+HOTSPOT_MIN_CAPACITY=1000
+hotspot_capacity() {
+    local cap=$(( ${HOTSPOTS:-0} * HOTSPOT_CAPACITY_FACTOR ))
+    (( cap < HOTSPOT_MIN_CAPACITY )) && cap=$HOTSPOT_MIN_CAPACITY
+    echo "$cap"
+}
+
+# File distinti approssimati (--approx-files): l'insieme esatto seenfile[autore, data, ora,
+# percorso] cresce con autori × giorni × percorsi, e un commit vendorizzato da centinaia di
+# migliaia di file lo porta da solo a gigabyte. In questa modalità ogni gruppo ha invece uno
+# sketch HyperLogLog sparso da FILE_SKETCH_REGISTERS registri: memorizza solo i registri
+# toccati (al più 4096 voci per gruppo, quanti che siano i file) e stima i distinti con
+# errore relativo tipico 1.04 / sqrt(4096) = 1,6% (entro ~3,3% nel 95% dei casi); sotto
+# qualche centinaio di file per gruppo, il caso normale, la stima (linear counting) è
+# quasi sempre esatta. L'hash è aritmetico (due polinomi sui byte modulo un primo, elevati
+# al cubo): awk non ha operatori sui bit. Sketch mergeable: l'unione di due gruppi è il
+# massimo registro per registro. Stesso hash e stessa stima in git_stats_engine.py
+# (FileSketch), quindi i due motori restano identici anche in questa modalità.
+FILE_SKETCH_REGISTERS=4096
+file_sketch_registers() {
+    [[ "$APPROX_FILES" == true ]] && echo "$FILE_SKETCH_REGISTERS" || echo 0
+}
+
 # Emette TSV: autore \t data \t ora \t commits \t added \t deleted \t files_distinti
 # "ora" (0-23) è l'ora locale registrata nel commit (fuso dell'autore, quello che git log
 # mostra di default) — nessuna conversione a un fuso comune, per restare semplice e
 # coerente con l'author-date già usata ovunque. Serve per il punch card giorno×ora nel
 # report; il giorno della settimana si deriva da "data" più a valle (python), non qui.
+# Con --by-directory ($3 = file) lo stesso awk scrive in $3 anche le righe per cartella:
+# autore \t data \t cartella \t commits \t added \t deleted \t files_distinti (non ordinate).
+# Con --hotspots ($4 = file) scrive in $4 le tabelle top-K dei file (vedi "Hotspot" sotto).
 collect_daily_tsv() {
-    local alias_tsv="$1"
-    # --since esteso indietro: filtriamo per author-date in awk, e la committer-date
-    # di un commit rebasato è successiva alla sua author-date. Nessun --until, per non
-    # perdere lavoro autorato nel periodo ma committato (rebasato) dopo la fine.
-    local since_margin
-    since_margin=$(date -d "$START_DATE -31 days" +%Y-%m-%d 2>/dev/null || echo "$START_DATE")
-
-    git log --no-merges --since="$since_margin" \
-        --pretty=format:'%x01%H%x09%an%x09%ad' --date=format:'%Y-%m-%d %H' --numstat 2>/dev/null \
-    | awk -v start="$START_DATE" -v end="$END_DATE" -v aliasfile="$alias_tsv" '
+    local alias_tsv="$1" tmpdir="$2" dir_tsv="$3" hot_tsv="$4"
+    commit_log_stream "$tmpdir" \
+    | awk -v start="$START_DATE" -v end="$END_DATE" -v aliasfile="$alias_tsv" \
+          -v dirfile="$dir_tsv" -v depth="${BY_DIRECTORY:-0}" \
+          -v hotfile="$hot_tsv" -v hscap="$(hotspot_capacity)" -v hsauthor="$HOTSPOT_AUTHOR" \
+          -v hllm="$(file_sketch_registers)" '
+        # Percorso di una riga numstat; per un rename ("src/{a => b}/f.py", "x.py => lib/x.py")
+        # la destinazione. Stessa regola di destination_path in git_stats_engine.py.
+        function dest_path(p,   i, j, mid) {
+            if (index(p, " => ") == 0) return p
+            i = index(p, "{"); j = index(p, "}")
+            if (i > 0 && j > i) {
+                mid = substr(p, i + 1, j - i - 1)
+                sub(/^.* => /, "", mid)
+                p = substr(p, 1, i - 1) mid substr(p, j + 1)
+                gsub(/\/\/+/, "/", p)
+                sub(/^\//, "", p)
+            } else {
+                sub(/^.* => /, "", p)
+            }
+            return p
+        }
+        # Cartella di una riga numstat, troncata a depth segmenti ("." in radice).
+        # Stessa regola di directory_of in git_stats_engine.py.
+        function dir_of(p,   n, seg, d, k) {
+            n = split(dest_path(p), seg, "/")
+            if (n <= 1) return "."
+            d = seg[1]
+            for (k = 2; k < n && k <= depth; k++) d = d "/" seg[k]
+            return d
+        }
+        # Hotspot: Space-Saving con potatura a blocchi (vedi il commento sopra hotspot_capacity).
+        # cnt/err/st sono i contatori, gli errori e lo stato (voci, soglia) di una tabella.
+        function hs_add(cnt, err, st, key, w) {
+            if (!(key in cnt)) {
+                if (st["n"] >= 2 * hscap) hs_prune(cnt, err, st)
+                cnt[key] = st["floor"] + 0; err[key] = st["floor"] + 0; st["n"]++
+            }
+            cnt[key] += w
+        }
+        function hs_prune(cnt, err, st,   v, n, k, thr) {
+            n = 0
+            for (k in cnt) v[++n] = cnt[k]
+            thr = kth_largest(v, n, hscap + 1)
+            for (k in cnt) if (cnt[k] <= thr) { delete cnt[k]; delete err[k]; st["n"]-- }
+            if (thr > st["floor"]) st["floor"] = thr
+        }
+        # k-esimo valore più grande di v[1..n] (quickselect, riordina v)
+        function kth_largest(v, n, k,   lo, hi, i, j, p, t) {
+            lo = 1; hi = n
+            while (lo < hi) {
+                p = v[int((lo + hi) / 2)]; i = lo; j = hi
+                while (i <= j) {
+                    while (v[i] > p) i++
+                    while (v[j] < p) j--
+                    if (i <= j) { t = v[i]; v[i] = v[j]; v[j] = t; i++; j-- }
+                }
+                if (k <= j) hi = j
+                else if (k >= i) lo = i
+                else break
+            }
+            return v[k]
+        }
+        # --approx-files: registro (hj) e rango (hr) HyperLogLog di un percorso (vedi il
+        # commento sopra file_sketch_registers). Prodotti modulo il primo a 16 bit per volta:
+        # restano interi esatti in doppia precisione.
+        function hll_hash(p,   i, n, c, h1, h2, t) {
+            h1 = 0; h2 = 0; n = length(p)
+            for (i = 1; i <= n; i++) {
+                c = ord[substr(p, i, 1)] + 1
+                h1 = (h1 * 1000003 + c) % 4294967291
+                h2 = (h2 * 999983 + c) % 4294967291
+            }
+            h1 = mulmod(mulmod(h1, h1), h1); h2 = mulmod(mulmod(h2, h2), h2)
+            hj = h1 % hllm
+            hr = 1; t = 4294967291 / 2
+            while (h2 < t && hr < 33) { hr++; t /= 2 }
+        }
+        function mulmod(a, b) {
+            return ((a * int(b / 65536)) % 4294967291 * 65536 + a * (b % 65536)) % 4294967291
+        }
+        # Registri per gruppo in reg[gruppo, registro]; nset e sum per gruppo (registri non
+        # vuoti e somma intera di 2^(33 - rango)) tengono la stima a costo costante.
+        function hll_add(reg, nset, sum, key,   k, old) {
+            k = key SUBSEP hj
+            old = (k in reg) ? reg[k] : 0
+            if (hr <= old) return
+            reg[k] = hr
+            if (old == 0) nset[key]++
+            else sum[key] -= 2 ^ (33 - old)
+            sum[key] += 2 ^ (33 - hr)
+        }
+        function hll_count(nset, sum, key,   v, e) {
+            if (!(key in nset)) return 0
+            v = hllm - nset[key]
+            e = 0.7213 / (1 + 1.079 / hllm) * hllm * hllm * 8589934592 / (sum[key] + v * 8589934592)
+            if (e <= 2.5 * hllm && v > 0) e = hllm * log(hllm / v)
+            return int(e + 0.5)
+        }
         BEGIN {
             FS = "\t"; OFS = "\t"
             if (aliasfile != "") {
@@ -433,6 +1128,7 @@ collect_daily_tsv() {
                 }
                 close(aliasfile)
             }
+            if (hllm) for (i = 1; i < 256; i++) ord[sprintf("%c", i)] = i
             active = 0
         }
         # Riga di intestazione commit: \x01<hash>\t<autore>\t<author-date> <ora>
@@ -447,6 +1143,9 @@ collect_daily_tsv() {
                 commits[cur]++
                 authors[a] = 1
                 active = 1
+                dbase = a SUBSEP d
+                split("", touched)
+                hot = (hotfile != "" && (hsauthor == "" || a == hsauthor))
             } else {
                 active = 0
             }
@@ -460,19 +1159,74 @@ collect_daily_tsv() {
                 deleted[cur] += $2
             }
             # I file binari ("-") contano come file toccati, con 0 righe
-            fkey = cur SUBSEP $3
-            if (!(fkey in seenfile)) { seenfile[fkey] = 1; files[cur]++ }
+            if (hllm) {
+                hll_hash($3)
+                hll_add(freg, fset, fsum, cur)
+            } else {
+                fkey = cur SUBSEP $3
+                if (!(fkey in seenfile)) { seenfile[fkey] = 1; files[cur]++ }
+            }
+            if (dirfile != "") {
+                dd = dir_of($3)
+                dk = dbase SUBSEP dd
+                if (!(dd in touched)) { touched[dd] = 1; dcommits[dk]++ }
+                if ($1 ~ /^[0-9]+$/) { dadded[dk] += $1; ddeleted[dk] += $2 }
+                if (hllm) hll_add(dreg, dset, dsum, dk)
+                else if (!((dk SUBSEP $3) in dseenfile)) { dseenfile[dk SUBSEP $3] = 1; dfiles[dk]++ }
+            }
+            if (hot) {
+                hp = dest_path($3)
+                hs_add(hcnt, herr, hst, hp, ($1 ~ /^[0-9]+$/) ? $1 + $2 : 0)
+                hs_add(tcnt, terr, tst, hp, 1)
+            }
             next
         }
         END {
             for (k in commits) {
                 split(k, kk, SUBSEP)
+                if (hllm) files[k] = hll_count(fset, fsum, k)
                 print kk[1], kk[2], kk[3], commits[k], added[k] + 0, deleted[k] + 0, files[k] + 0
             }
+            if (dirfile != "") {
+                for (k in dcommits) {
+                    if (hllm) dfiles[k] = hll_count(dset, dsum, k)
+                    split(k, kk, SUBSEP)
+                    print kk[1], kk[2], kk[3], dcommits[k], dadded[k] + 0, ddeleted[k] + 0, dfiles[k] + 0 > dirfile
+                }
+                close(dirfile)
+            }
+            if (hotfile != "") {
+                for (k in hcnt) print "churn", k, hcnt[k], herr[k] > hotfile
+                for (k in tcnt) print "touches", k, tcnt[k], terr[k] > hotfile
+                close(hotfile)
+            }
         }' \
     | sort -t$'\t' -k1,1 -k2,2 -k3,3n
 }
 
+# -----------------------------------------------
+# Motore python (--engine python)
+# -----------------------------------------------
+# Stampa il percorso di git_stats_engine.py accanto a questo script (risolvendo eventuali
+# symlink, come per il file alias); vuoto se assente.
+find_engine_module() {
+    local self engine
+    self=$(readlink -f "${BASH_SOURCE[0]}" 2>/dev/null || echo "${BASH_SOURCE[0]}")
+    engine="$(dirname "$self")/git_stats_engine.py"
+    [[ -f "$engine" ]] && echo "$engine"
+}
+
+# Stesso TSV di collect_daily_tsv (righe non ordinate per il formato testuale: emit_text
+# ordina da sé), calcolato da git_stats_engine.py; $3 e $4 come per collect_daily_tsv.
+collect_daily_tsv_python() {
+    local alias_tsv="$1" tmpdir="$2" dir_tsv="$3" hot_tsv="$4"
+    commit_log_stream "$tmpdir" \
+    | python3 "$ENGINE_MODULE" tsv --start "$START_DATE" --end "$END_DATE" --aliases "$alias_tsv" \
+        ${dir_tsv:+--by-directory "$BY_DIRECTORY" --directory-tsv "$dir_tsv"} \
+        ${hot_tsv:+--hotspots "$HOTSPOTS" --hotspots-tsv "$hot_tsv" --hotspots-author "$HOTSPOT_AUTHOR"} \
+        $([[ "$APPROX_FILES" == true ]] && echo --approx-files)
+}
+
 # -----------------------------------------------
 # Ownership del codice (git blame) — SOLO per formato json, disattivabile con --no-ownership
 # -----------------------------------------------
@@ -494,7 +1248,10 @@ collect_daily_tsv() {
 #   3. Un `git blame` per file è INEVITABILE: git non offre un comando che restituisca
 #      l'ownership per riga su tutto l'albero in una sola invocazione. Misurato su un
 #      repository reale da 3133 file: ~98s in sequenza, ~15-17s parallelizzando con
-#      `xargs -P` (fino a `nproc` processi) sullo stesso repository.
+#      `xargs -P` (fino a `nproc` processi) sullo stesso repository. I file sono passati
+#      al pool dal PIÙ GRANDE al più piccolo: `xargs` li avvia nell'ordine ricevuto, e un
+#      file enorme partito per ultimo terrebbe occupato un solo processo mentre gli altri
+#      restano fermi; partito per primo, gli altri si spartiscono i piccoli nel frattempo.
 #      ATTENZIONE se si modifica questa funzione: l'aggregazione per-autore deve avvenire
 #      DENTRO ogni processo figlio, che emette sul flusso condiviso solo poche righe corte
 #      (autore\tconteggio) — scritture brevi restano atomiche a livello di pipe (< PIPE_BUF).
@@ -507,34 +1264,461 @@ resolve_ownership_ref() {
     git rev-list -1 --before="$END_DATE 23:59:59" HEAD 2>/dev/null
 }
 
-# Emette TSV: autore \t righe_possedute, al commit di riferimento $1.
+# -----------------------------------------------
+# Cache dell'ownership (per blob, rispetto a un commit di riferimento già calcolato)
+# -----------------------------------------------
+# Fra due report consecutivi la quasi totalità dei file non cambia, ma senza cache ogni
+# run rifà `git blame` su TUTTI i blob. La cache salva, per ogni file blamato, le righe
+# per autore (nome GREZZO: alias applicati dopo, come per la cache dei commit) insieme a
+# blob SHA e path, in uno snapshot per commit di riferimento:
+#   $CACHE_DIR/ownership/<repo>/<ref>.<formato>.tsv
+# Riusare per un nuovo riferimento REF il risultato di un file calcolato a un riferimento
+# BASE è corretto solo se il blame di quel path non può essere cambiato fra i due.
+# Condizioni, tutte necessarie:
+#   - BASE è antenato di REF (altrimenti la storia fra i due non è un intervallo: nessun
+#     riuso, tutto ricalcolato);
+#   - stesso blob SHA allo stesso path in BASE e in REF;
+#   - NESSUN commit in BASE..REF ha toccato quel path (`git log --name-only --no-renames`,
+#     lati di merge inclusi). Il solo confronto dei blob non basta: un file modificato e
+#     poi ripristinato ha lo stesso blob, ma `git blame` attribuirebbe le righe
+#     ripristinate al commit di ripristino.
+# Con queste condizioni la storia che `git blame` percorre per quel path è la stessa, e il
+# risultato è identico a un calcolo a freddo. Si conservano gli ultimi
+# OWNERSHIP_CACHE_KEEP snapshot (report con DATA_FINE diverse sullo stesso repository).
+
+OWNERSHIP_CACHE_FORMAT="v2"
+OWNERSHIP_CACHE_KEEP=8
+
+# Stampa lo snapshot da usare come base per il riferimento $1: quello esatto, altrimenti il
+# più recente il cui riferimento è antenato di $1. Niente se non ce n'è uno utilizzabile.
+select_ownership_snapshot() {
+    local rev="$1" dir="$2"
+    [[ -d "$dir" ]] || return 0
+    if [[ -f "$dir/$rev.$OWNERSHIP_CACHE_FORMAT.tsv" ]]; then
+        echo "$dir/$rev.$OWNERSHIP_CACHE_FORMAT.tsv"
+        return 0
+    fi
+    local snap base
+    while IFS= read -r snap; do
+        base="${snap%%.*}"
+        if git merge-base --is-ancestor "$base" "$rev" 2>/dev/null; then
+            echo "$dir/$snap"
+            return 0
+        fi
+    done < <(ls -t "$dir" 2>/dev/null | grep "\.$OWNERSHIP_CACHE_FORMAT\.tsv$")
+}
+
+# -----------------------------------------------
+# Tetto globale dei git blame (--blame-jobs)
+# -----------------------------------------------
+# Un pool `xargs -P "$(nproc)"` è dimensionato come se questo fosse l'unico processo in
+# corsa: due collector lanciati in parallelo, o il multi-progetto con --ownership su N
+# repository, avvierebbero N × nproc git blame a contendersi gli stessi core e lo stesso
+# disco. Il tetto è quindi un semaforo di MACCHINA: <n> file di slot in
+# $CACHE_DIR/blame-slots, e ogni git blame parte solo dopo aver preso con `flock` il lock
+# di uno di essi, tenuto fino alla fine del suo processo. Il kernel rilascia il lock anche
+# se il processo viene ucciso: un collector interrotto non lascia slot occupati. Il pool
+# locale di xargs resta al più nproc; i processi in attesa di uno slot non usano CPU. Con
+# tetti diversi fra processi concorrenti vale il più alto (gli slot 0..n-1 sono condivisi).
+# Senza flock (util-linux) o senza cartella scrivibile il tetto vale solo per il processo,
+# con un avviso.
+
+BLAME_SLOTS_DIR="$CACHE_DIR/blame-slots"
+
+# Tetto effettivo: --blame-jobs, poi $GIT_ACTIVITY_BLAME_JOBS, poi nproc.
+blame_jobs() {
+    local n="${BLAME_JOBS:-$GIT_ACTIVITY_BLAME_JOBS}"
+    [[ "$n" =~ ^[1-9][0-9]*$ ]] || n=$(nproc 2>/dev/null)
+    echo "${n:-4}"
+}
+
+# Stampa la cartella degli slot (creata se manca); niente se il tetto globale non è disponibile.
+blame_slots_dir() {
+    if ! command -v flock >/dev/null 2>&1; then
+        echo "Avviso: flock non disponibile, tetto dei git blame valido solo per questo processo." >&2
+        return 0
+    fi
+    if ! mkdir -p "$BLAME_SLOTS_DIR" 2>/dev/null || [[ ! -w "$BLAME_SLOTS_DIR" ]]; then
+        echo "Avviso: cartella $BLAME_SLOTS_DIR non scrivibile, tetto dei git blame valido solo per questo processo." >&2
+        return 0
+    fi
+    echo "$BLAME_SLOTS_DIR"
+}
+
+# -----------------------------------------------
+# Ownership stimata su un campione (--ownership-sample)
+# -----------------------------------------------
+# Su alberi enormi anche il blame parallelo di ogni file è troppo lento per un report
+# interattivo. Con --ownership-sample <n|p%> si blama un campione di file e si stima la
+# quota di ogni autore con un intervallo di confidenza, invece di un numero esatto:
+#   - popolazione: i file entro --blame-max-size; i binari sono noti solo dopo l'estrazione
+#     (vedi sotto) e nel campione contano come file con zero righe;
+#   - strati: OWNERSHIP_SAMPLE_STRATA fasce di dimensione crescente con gli stessi byte
+#     ciascuna (pochi file grandi in alto, moltissimi piccoli in basso); il campione è
+#     ripartito fra gli strati in proporzione ai byte, cioè circa alle righe, con almeno 2
+#     file per strato e tutto lo strato se il campione lo copre. Dentro lo strato,
+#     estrazione casuale semplice senza ripetizione, con seme ricavato dal commit di
+#     riferimento: lo stesso report rieseguito dà la stessa stima;
+#   - stima: righe dell'autore a e totali estrapolate strato per strato (peso N_h/n_h), quota
+#     = rapporto fra le due. Intervallo al 95% dalla varianza del rapporto linearizzata
+#     (z = righe_a - quota × righe del file), con correzione per popolazione finita.
+# Gli alias si applicano per file, prima della stima: la varianza è quella della persona, non
+# delle sue identità. Se tutti i file da calcolare sono in cache o il campione copre la
+# popolazione, niente campione: il risultato è esatto come senza l'opzione.
+
+OWNERSHIP_SAMPLE_STRATA=10
+
+# Emette TSV: autore \t righe_possedute, al commit di riferimento $1. Con un campione la
+# prima riga è "# \t estimate \t campionati \t popolazione \t strati" e ogni autore ha una
+# terza colonna: mezza ampiezza dell'intervallo al 95% della sua quota, in punti percentuali.
 # Alias applicati qui (stesso file usato per le statistiche giornaliere): senza questo,
 # identità multiple della stessa persona spezzerebbero l'ownership fra più righe.
 collect_ownership_tsv() {
     local rev="$1" alias_tsv="$2" tmpdir="$3"
-    local jobs
+    local jobs cap slots
+    cap=$(blame_jobs)
     jobs=$(nproc 2>/dev/null); jobs="${jobs:-4}"
+    (( jobs > cap )) && jobs=$cap
+    slots=$(blame_slots_dir)
 
-    local filelist="$tmpdir/ownership_files.lst"
-    # -z: percorsi separati da NUL, necessario perché possono contenere spazi (verificato:
-    # non è un'ipotesi teorica, capita in repository reali) o altri caratteri "scomodi".
-    git ls-tree -r -z "$rev" 2>/dev/null | while IFS= read -r -d '' entry; do
-        meta="${entry%%$'\t'*}"
-        path="${entry#*$'\t'}"
-        type=$(awk '{print $2}' <<< "$meta")
-        # Solo blob: esclude strutturalmente i gitlink dei submodule (type "commit"),
-        # non è una scelta editoriale di esclusione come quelle rimosse dal churn.
-        [[ "$type" == "blob" ]] && printf '%s\0' "$path"
-    done > "$filelist"
-
+    # Elenco dei blob, in un solo `git ls-tree -l`: N \t blob \t path \t byte, con N =
+    # numero d'ordine della voce nell'albero e path nella forma quotata da git (una riga per
+    # voce anche con caratteri speciali, confrontabile con `git log --name-only`): è la
+    # chiave della cache. Solo blob: esclude strutturalmente i gitlink dei submodule (type
+    # "commit"), non è una scelta editoriale di esclusione come quelle rimosse dal churn.
+    local tree="$tmpdir/ownership_tree.tsv"
+    git ls-tree -r -l "$rev" 2>/dev/null \
+        | awk -F'\t' '{ split($1, m, " "); if (m[2] == "blob") print NR "\t" m[3] "\t" $2 "\t" m[4] }' > "$tree"
     local nfiles
-    nfiles=$(git ls-tree -r "$rev" 2>/dev/null | awk -F'\t' '{split($1,a," "); if(a[2]=="blob") c++} END{print c+0}')
-    echo "Calcolo ownership: git blame su $nfiles file al commit ${rev:0:8} ($jobs processi in parallelo)..." >&2
+    nfiles=$(wc -l < "$tree")
+
+    local snapdir="" base_snap="" base_ref=""
+    if [[ "$CACHE_ENABLED" == true ]]; then
+        local key
+        key=$(repo_cache_key)
+        [[ -n "$key" ]] && snapdir="$CACHE_DIR/ownership/$key"
+        if [[ -n "$snapdir" ]] && ! mkdir -p "$snapdir" 2>/dev/null; then
+            echo "Avviso: cartella di cache non scrivibile ($snapdir), cache ownership disattivata." >&2
+            snapdir=""
+        fi
+        [[ -n "$snapdir" ]] && base_snap=$(select_ownership_snapshot "$rev" "$snapdir")
+    fi
+
+    # Risultati riusabili dallo snapshot base -> $cached (N \t autore \t righe), numeri
+    # d'ordine corrispondenti -> $hits.
+    local cached="$tmpdir/ownership_cached.tsv" hits="$tmpdir/ownership_hits.lst"
+    : > "$cached"; : > "$hits"
+    if [[ -n "$base_snap" ]]; then
+        base_ref=$(basename "$base_snap"); base_ref="${base_ref%%.*}"
+        local touched="$tmpdir/ownership_touched.lst"
+        : > "$touched"
+        if [[ "$base_ref" != "$rev" ]]; then
+            git log --format= --name-only --no-renames "$base_ref..$rev" 2>/dev/null | sort -u > "$touched"
+        fi
+        # Un file oltre --blame-max-size non è riusato: va saltato anche se era in cache.
+        awk -F'\t' -v touchedfile="$touched" -v snapfile="$base_snap" -v hitsfile="$hits" \
+            -v maxbytes="$((BLAME_MAX_KB * 1024))" '
+            BEGIN {
+                while ((getline t < touchedfile) > 0) touched[t] = 1
+                close(touchedfile)
+                while ((getline line < snapfile) > 0) {
+                    if (substr(line, 1, 1) == "#") continue
+                    split(line, p, "\t")
+                    k = p[1] SUBSEP p[2]
+                    known[k] = 1
+                    if (p[3] != "") rows[k] = rows[k] p[3] "\t" p[4] "\n"
+                }
+                close(snapfile)
+            }
+            ((($2 SUBSEP $3) in known) && !($3 in touched) && !(maxbytes > 0 && $4 + 0 > maxbytes)) {
+                print $1 > hitsfile
+                r = rows[$2 SUBSEP $3]
+                if (r == "") print $1 "\t\t0"   # senza autori (vuoto o binario): resta nello snapshot
+                while ((i = index(r, "\n")) > 0) {
+                    print $1 "\t" substr(r, 1, i - 1)
+                    r = substr(r, i + 1)
+                }
+            }
+            END { close(hitsfile) }' "$tree" > "$cached"
+    fi
+    local nhits nmiss
+    nhits=$(wc -l < "$hits")
+    nmiss=$((nfiles - nhits))
+
+    # --ownership-sample (vedi sopra OWNERSHIP_SAMPLE_STRATA): $sample "N \t strato" per i file
+    # estratti, $strata "strato \t file \t estratti". Estrazione sequenziale (selection
+    # sampling): ogni file entra con probabilità estratti mancanti / file rimasti nello strato.
+    local sample="" strata=""
+    if [[ -n "$OWNERSHIP_SAMPLE" ]] && (( nmiss > 0 )); then
+        sample="$tmpdir/ownership_sample.lst" strata="$tmpdir/ownership_strata.tsv"
+        sort -t$'\t' -k4,4n -k1,1n "$tree" \
+        | awk -F'\t' -v maxbytes="$((BLAME_MAX_KB * 1024))" \
+            -v want="$OWNERSHIP_SAMPLE" -v k="$OWNERSHIP_SAMPLE_STRATA" -v seed="$((16#${rev:0:7}))" \
+            -v stratafile="$strata" '
+            maxbytes > 0 && $4 + 0 > maxbytes { next }
+            { n++; id[n] = $1; size[n] = $4; bytes += $4 }
+            END {
+                target = (want ~ /%$/) ? int(n * substr(want, 1, length(want) - 1) / 100 + 0.999999) : want + 0
+                if (target >= n) exit
+                for (i = 1; i <= n; i++) {
+                    h = (bytes > 0) ? int(k * cum / bytes) : int(k * (i - 1) / n)
+                    if (h >= k) h = k - 1
+                    cum += size[i]; st[i] = h; N[h]++; B[h] += size[i]
+                    active[h] = 1
+                }
+                # Proporzionale ai byte; uno strato che ne riceverebbe più dei suoi file è preso
+                # per intero e il resto si ridistribuisce sugli altri.
+                left = target
+                do {
+                    ba = na = capped = 0
+                    for (h in active) { ba += B[h]; na += N[h] }
+                    for (h in active) {
+                        share = (ba > 0) ? left * B[h] / ba : left * N[h] / na
+                        if (share >= N[h]) { alloc[h] = N[h]; full[h] = 1; capped = 1 }
+                    }
+                    for (h in full) if (h in active) { left -= N[h]; delete active[h] }
+                } while (capped && left > 0)
+                for (h in active) {
+                    share = (ba > 0) ? left * B[h] / ba : left * N[h] / na
+                    alloc[h] = int(share + 0.5)
+                    if (alloc[h] < 2) alloc[h] = 2
+                    if (alloc[h] > N[h]) alloc[h] = N[h]
+                }
+                srand(seed)
+                for (h in N) { need[h] = alloc[h]; rest[h] = N[h] }
+                for (i = 1; i <= n; i++) {
+                    h = st[i]
+                    if (rand() * rest[h] < need[h]) { print id[i] "\t" h; need[h]-- }
+                    rest[h]--
+                }
+                for (h in N) print h "\t" N[h] "\t" alloc[h] > stratafile
+            }' > "$sample"
+        [[ -s "$sample" ]] || sample=""
+    fi
+
+    # File binari fra quelli da blamare (non in cache, entro --blame-max-size, estratti se
+    # c'è il campione): stesso criterio di `git diff --numstat` (righe "-"), dall'albero
+    # vuoto. Le "righe" di un binario non sono codice: il file resta nello snapshot senza
+    # autori (l'essere binario è una proprietà del blob, quindi il riuso resta corretto); nel
+    # campione conta come un file estratto con zero righe. Se da controllare c'è solo una
+    # parte dell'albero, i suoi blob vanno in un indice temporaneo e il diff è sull'indice:
+    # un pathspec per file costerebbe un confronto per ogni voce dell'albero e per ognuno.
+    local binaries="$tmpdir/ownership_binary.lst" check="$tmpdir/ownership_check.lst"
+    : > "$binaries"
+    awk -F'\t' -v hitsfile="$hits" -v maxbytes="$((BLAME_MAX_KB * 1024))" -v samplefile="$sample" '
+        BEGIN {
+            while ((getline h < hitsfile) > 0) hit[h] = 1
+            close(hitsfile)
+            if (samplefile != "") {
+                while ((getline line < samplefile) > 0) { split(line, q, "\t"); insample[q[1]] = 1 }
+                close(samplefile)
+            }
+        }
+        $1 in hit || (maxbytes > 0 && $4 + 0 > maxbytes) { next }
+        samplefile != "" && !($1 in insample) { next }
+        { print "100644 " $2 "\t" $3 }' "$tree" > "$check"
+    local ncheck empty
+    ncheck=$(wc -l < "$check")
+    empty=$(git hash-object -t tree /dev/null)
+    if (( ncheck == 0 )); then
+        :
+    elif (( ncheck * 5 < nfiles )) \
+        && GIT_INDEX_FILE="$tmpdir/ownership_check.idx" git update-index --index-info < "$check" 2>/dev/null; then
+        GIT_INDEX_FILE="$tmpdir/ownership_check.idx" git diff-index --cached --numstat --no-renames "$empty" 2>/dev/null \
+            | awk -F'\t' '$1 == "-" && $2 == "-" { print $3 }' > "$binaries"
+    else
+        git diff --numstat --no-renames "$empty" "$rev" 2>/dev/null \
+            | awk -F'\t' '$1 == "-" && $2 == "-" { print $3 }' > "$binaries"
+    fi
+
+    # Voci da blamare, dalla più grande (vedi il punto 3 sopra), separate da NUL (i percorsi
+    # possono contenere spazi, capita in repository reali): "N \t path" con il path esatto
+    # (git lo quota se contiene caratteri speciali: qui lo si riporta ai byte originali, come
+    # serve a git blame). N è la chiave verso $tree. I file saltati vanno in $skipped:
+    # "N \t binary" (righe "N \t \t 0" per lo snapshot in $skipped.tsv) o
+    # "N \t size \t byte \t path" oltre --blame-max-size, che invece non entra nello snapshot
+    # (la soglia può cambiare al prossimo report).
+    local filelist="$tmpdir/ownership_files.lst" skipped="$tmpdir/ownership_skipped.lst"
+    : > "$skipped"; : > "$skipped.tsv"
+    sort -t$'\t' -k4,4nr -k1,1n "$tree" \
+    | LC_ALL=C awk -F'\t' -v hitsfile="$hits" -v binfile="$binaries" -v skipfile="$skipped" \
+        -v maxbytes="$((BLAME_MAX_KB * 1024))" -v samplefile="$sample" '
+        function unquote(p,    out, i, c) {
+            if (substr(p, 1, 1) != "\"") return p
+            p = substr(p, 2, length(p) - 2)
+            out = ""
+            for (i = 1; i <= length(p); i++) {
+                c = substr(p, i, 1)
+                if (c == "\\") {
+                    c = substr(p, ++i, 1)
+                    if (c ~ /[0-7]/) {
+                        c = sprintf("%c", c * 64 + substr(p, i + 1, 1) * 8 + substr(p, i + 2, 1))
+                        i += 2
+                    } else if (c in esc) c = esc[c]
+                }
+                out = out c
+            }
+            return out
+        }
+        BEGIN {
+            esc["a"] = "\a"; esc["b"] = "\b"; esc["f"] = "\f"; esc["n"] = "\n"
+            esc["r"] = "\r"; esc["t"] = "\t"; esc["v"] = "\v"
+            while ((getline h < hitsfile) > 0) hit[h] = 1
+            close(hitsfile)
+            while ((getline b < binfile) > 0) bin[b] = 1
+            close(binfile)
+            if (samplefile != "") {
+                while ((getline line < samplefile) > 0) { split(line, q, "\t"); insample[q[1]] = 1 }
+                close(samplefile)
+            }
+        }
+        $1 in hit { next }
+        $3 in bin {
+            print $1 "\tbinary" > skipfile
+            print $1 "\t\t0" > (skipfile ".tsv")
+            next
+        }
+        maxbytes > 0 && $4 + 0 > maxbytes { print $1 "\tsize\t" $4 "\t" $3 > skipfile; next }
+        samplefile != "" && !($1 in insample) { next }
+        { printf "%s\t%s%c", $1, unquote($3), 0 }' > "$filelist"
+    local nblame nbinary nlarge
+    nblame=$(tr -cd '\0' < "$filelist" | wc -c)
+    nbinary=$(grep -c $'\tbinary$' "$skipped")
+    nlarge=$(grep -c $'\tsize\t' "$skipped")
 
+    local parallel="$jobs processi in parallelo"
+    [[ -n "$slots" ]] && parallel="$parallel, al più $cap git blame sulla macchina"
+    [[ -n "$sample" ]] && parallel="campione di $(wc -l < "$sample") su $(awk -F'\t' '{ n += $2 } END { print n }' "$strata") file in $(wc -l < "$strata") strati, $parallel"
+    if [[ -n "$base_snap" ]]; then
+        echo "Calcolo ownership: git blame su $nblame file al commit ${rev:0:8} ($nhits dalla cache, $parallel)..." >&2
+    else
+        echo "Calcolo ownership: git blame su $nblame file al commit ${rev:0:8} ($parallel)..." >&2
+    fi
+    if (( nbinary + nlarge > 0 )); then
+        awk -F'\t' -v nb="$nbinary" -v nl="$nlarge" -v kb="$BLAME_MAX_KB" '
+            $2 == "size" && shown < 5 { list = list (shown++ ? ", " : "") $4 " (" int($3 / 1024) " KB)" }
+            END {
+                msg = (nb > 0) ? nb " file binari" : ""
+                if (nl > 0) msg = msg (nb > 0 ? " e " : "") nl " file oltre " kb " KB: " list (nl > shown ? ", ..." : "")
+                print "Ownership: saltati " msg > "/dev/stderr"
+            }' "$skipped"
+    fi
+
+    # Ogni figlio emette "N \t autore \t righe" per il SUO file: l'aggregazione per autore
+    # resta nel figlio (vedi sopra), N serve solo a salvare il risultato nello snapshot.
+    # `git blame --incremental` e non --line-porcelain: quest'ultimo ripete l'intestazione
+    # del commit (autore, committer, summary...) per OGNI riga del file, mentre
+    # --incremental emette un gruppo di righe consecutive dello stesso commit come
+    # "<sha> <riga orig> <riga finale> <n. righe>", con l'intestazione solo la prima volta
+    # che il commit compare, e chiude ogni gruppo con "filename". L'autore si risolve per
+    # commit e si sommano le righe dei gruppi: stesso risultato, output 10-30 volte più piccolo.
+    # Un file senza righe emette "N \t \t 0", così anche lui entra nello snapshot.
+    # Con il tetto globale ($2 = cartella degli slot, $3 = numero di slot) il figlio prende
+    # prima uno slot libero, partendo da uno a caso; se sono tutti occupati attende il primo
+    # provato. Il lock (fd 9) resta aperto fino all'uscita del figlio, git blame compreso.
+    local blamed="$tmpdir/ownership_blamed.tsv" t0 t1
+    t0=$(date +%s.%N)
     xargs -0 -P "$jobs" -I{} bash -c '
-        git blame --line-porcelain "$1" -- "$2" 2>/dev/null \
-        | awk "/^author /{ sub(/^author /, \"\"); c[\$0]++ } END{ for (a in c) printf \"%s\t%d\n\", a, c[a] }"
-    ' _ "$rev" {} < "$filelist" \
+        n="${4%%[[:blank:]]*}"; path="${4#*[[:blank:]]}"
+        if [[ -n "$2" ]]; then
+            s0=$((RANDOM % $3))
+            for ((k = 0; k < $3; k++)); do
+                exec 9> "$2/slot.$(((s0 + k) % $3))" && flock -n 9 && break
+                exec 9>&-
+            done
+            if ((k == $3)); then exec 9> "$2/slot.$s0"; flock 9; fi
+        fi
+        git blame --incremental "$1" -- "$path" 2>/dev/null \
+        | awk -v n="$n" "
+            \$1 == \"filename\" { c[who[sha]] += len; k += len; next }
+            \$1 == \"author\" { a = \$0; sub(/^author /, \"\", a); who[sha] = a; next }
+            NF == 4 && length(\$1) >= 40 { sha = \$1; len = \$4 }
+            END { for (a in c) printf \"%s\t%s\t%d\n\", n, a, c[a]; if (!k) printf \"%s\t\t0\n\", n }"
+    ' _ "$rev" "$slots" "$cap" {} < "$filelist" > "$blamed"
+    t1=$(date +%s.%N)
+    cat "$skipped.tsv" >> "$blamed"
+
+    if [[ -n "$snapdir" ]]; then
+        # Nuovo snapshot per $rev (blob \t path \t autore \t righe), poi pulizia dei più vecchi.
+        local snap="$snapdir/$rev.$OWNERSHIP_CACHE_FORMAT.tsv"
+        {
+            printf '#\tref\t%s\n' "$rev"
+            awk -F'\t' '
+                FNR == NR { blob[$1] = $2; path[$1] = $3; next }
+                { print blob[$1] "\t" path[$1] "\t" $2 "\t" $3 }' "$tree" "$cached" "$blamed"
+        } > "$snap.tmp.$$" && mv -f "$snap.tmp.$$" "$snap"
+        ls -t "$snapdir" 2>/dev/null | grep "\.$OWNERSHIP_CACHE_FORMAT\.tsv$" \
+            | tail -n +$((OWNERSHIP_CACHE_KEEP + 1)) \
+            | (cd "$snapdir" && xargs -r rm -f --)
+    fi
+
+    if [[ "$OWNERSHIP_CACHE_STATS" == true ]]; then
+        # Tempo risparmiato stimato con il costo medio per file dei blame eseguiti in QUESTA
+        # run (stessa macchina, stesso parallelismo): senza miss non c'è una misura, e lo
+        # si dice invece di inventare un numero.
+        awk -v hits="$nhits" -v miss="$nmiss" -v t0="$t0" -v t1="$t1" -v base="${base_ref:0:8}" 'BEGIN {
+            el = t1 - t0
+            msg = sprintf("Cache ownership: %d hit, %d miss, blame %.1fs", hits, miss, el)
+            if (miss > 0 && hits > 0) msg = msg sprintf(", ~%.1fs risparmiati", hits * el / miss)
+            else if (hits > 0) msg = msg ", tempo risparmiato non stimabile (nessun blame eseguito)"
+            msg = msg ((base != "") ? " (base " base ")" : " (nessuno snapshot utilizzabile)")
+            print msg > "/dev/stderr"
+        }'
+    fi
+
+    if [[ -n "$sample" ]]; then
+        # Stima per rapporto stratificato (vedi sopra OWNERSHIP_SAMPLE_STRATA). Per strato h:
+        # sy/sy2 somme di righe del file e dei loro quadrati, sa/sa2/say le stesse per le righe
+        # dell'autore e il loro prodotto con quelle del file: bastano per la varianza di
+        # z = righe_a - quota × righe senza ripassare i file.
+        cat "$cached" "$blamed" \
+        | awk -v aliasfile="$alias_tsv" -v samplefile="$sample" -v stratafile="$strata" -F'\t' '
+            BEGIN {
+                if (aliasfile != "") {
+                    while ((getline line < aliasfile) > 0) {
+                        n = split(line, p, "\t")
+                        if (n >= 2 && p[1] != "") alias[p[1]] = p[2]
+                    }
+                    close(aliasfile)
+                }
+                while ((getline line < samplefile) > 0) { split(line, p, "\t"); st[p[1]] = p[2]; ns++ }
+                while ((getline line < stratafile) > 0) {
+                    split(line, p, "\t"); NH[p[1]] = p[2]; nh[p[1]] = p[3]; pop += p[2]; k++
+                }
+            }
+            ($1 in st) && $2 != "" {
+                a = $2
+                if (a in alias) a = alias[a]
+                y[$1, a] += $3; tot[$1] += $3; authors[a] = 1
+            }
+            END {
+                printf "#\testimate\t%d\t%d\t%d\n", ns, pop, k
+                for (f in st) { h = st[f]; sy[h] += tot[f]; sy2[h] += tot[f] * tot[f] }
+                for (key in y) {
+                    split(key, p, SUBSEP); h = st[p[1]]; v = y[key]
+                    sa[h, p[2]] += v; sa2[h, p[2]] += v * v; say[h, p[2]] += v * tot[p[1]]
+                }
+                for (h in NH) T += NH[h] / nh[h] * sy[h]
+                if (T <= 0) exit
+                for (a in authors) {
+                    Ta = V = 0
+                    for (h in NH) Ta += NH[h] / nh[h] * sa[h, a]
+                    if (Ta < 0.5) continue
+                    R = Ta / T
+                    for (h in NH) {
+                        if (nh[h] < 2 || nh[h] >= NH[h]) continue
+                        d = sa[h, a] - R * sy[h]
+                        d2 = sa2[h, a] - 2 * R * say[h, a] + R * R * sy2[h]
+                        s2 = (d2 - d * d / nh[h]) / (nh[h] - 1)
+                        if (s2 > 0) V += NH[h] * NH[h] * (1 - nh[h] / NH[h]) * s2 / nh[h]
+                    }
+                    printf "%s\t%d\t%.2f\n", a, Ta + 0.5, 196 * sqrt(V) / T
+                }
+            }'
+        return
+    fi
+
+    cat "$cached" "$blamed" \
     | awk -v aliasfile="$alias_tsv" -F'\t' '
         BEGIN {
             if (aliasfile != "") {
@@ -545,10 +1729,10 @@ collect_ownership_tsv() {
                 close(aliasfile)
             }
         }
-        {
-            a = $1
+        $2 != "" {
+            a = $2
             if (a in alias) a = alias[a]
-            c[a] += $2
+            c[a] += $3
         }
         END {
             for (a in c) print a "\t" c[a]
@@ -560,6 +1744,7 @@ collect_ownership_tsv() {
 # -----------------------------------------------
 emit_json() {
     local tsv="$1" project="$2" ownership_tsv="$3" ownership_ref="$4" ownership_ref_date="$5"
+    local dir_tsv="$6" hot_tsv="$7" series_json="$8" author="$9"
     # awk gestisce l'aggregazione, python la serializzazione: quest'ultima deve restare
     # corretta anche con nomi autore contenenti virgolette, backslash o accenti.
     python3 -c '
@@ -570,6 +1755,23 @@ start, end, project = sys.argv[1], sys.argv[2], sys.argv[3]
 ownership_tsv_path = sys.argv[4] if len(sys.argv) > 4 else ""
 ownership_ref = sys.argv[5] if len(sys.argv) > 5 else ""
 ownership_ref_date = sys.argv[6] if len(sys.argv) > 6 else ""
+# Formato colonnare (v3): conversione delegata a git_stats_engine.py, unica
+# implementazione del formato (argv[7] = modulo, vuoto se non richiesto).
+engine_module = sys.argv[7] if len(sys.argv) > 7 else ""
+sidecar = sys.argv[8] if len(sys.argv) > 8 else ""
+# --by-directory: righe per cartella dello stesso awk (argv[9]); la sezione "directories"
+# è costruita da git_stats_engine.build_directories, come per il motore python (argv[11]).
+dir_tsv, dir_depth = (sys.argv[9], int(sys.argv[10] or 0)) if len(sys.argv) > 10 else ("", 0)
+dir_module = sys.argv[11] if len(sys.argv) > 11 else ""
+# --hotspots: tabelle top-K dello stesso awk (argv[12]), K in argv[13]
+hot_tsv, hot_k = (sys.argv[12], int(sys.argv[13] or 0)) if len(sys.argv) > 13 else ("", 0)
+# --approx-files: registri dello sketch dei file distinti (0 = conteggio esatto)
+sketch_registers = int(sys.argv[14] or 0) if len(sys.argv) > 14 else 0
+# --ownership-series: blocco già costruito da git_stats_engine.py (argv[15])
+series_json = sys.argv[15] if len(sys.argv) > 15 else ""
+# Filtro autore (argv[16], nome dopo gli alias): dichiarato in metadata.author, perché chi
+# legge il JSON (es. git_activity_warehouse.py) sappia che gli altri autori mancano
+author_filter = sys.argv[16] if len(sys.argv) > 16 else ""
 # by_author_day: righe per (autore, data), una per ogni ora con attività quel giorno —
 # vanno risommate per ricostruire il totale del giorno (daily_data non conosce le ore).
 by_author_day = defaultdict(list)
@@ -627,6 +1829,7 @@ ownership = None
 if ownership_tsv_path:
     entries = []
     total = 0
+    estimate = None
     try:
         with open(ownership_tsv_path, encoding="utf-8") as fh:
             for line in fh:
@@ -634,10 +1837,14 @@ if ownership_tsv_path:
                 if not line:
                     continue
                 parts = line.split("\t")
+                if parts[0] == "#":
+                    if parts[1:2] == ["estimate"] and len(parts) >= 5:
+                        estimate = [int(x) for x in parts[2:5]]
+                    continue
                 if len(parts) < 2:
                     continue
                 author, lines_n = parts[0], int(parts[1])
-                entries.append((author, lines_n))
+                entries.append((author, lines_n, float(parts[2]) if len(parts) > 2 else None))
                 total += lines_n
     except OSError:
         entries = []
@@ -647,11 +1854,24 @@ if ownership_tsv_path:
             "ref_commit": ownership_ref,
             "ref_date": ownership_ref_date,
             "total_lines": total,
-            "by_author": [
-                {"author": a, "lines": n, "pct": round(n / total * 100, 2)}
-                for a, n in entries
-            ],
         }
+        # --ownership-sample: righe estrapolate dal campione, intervallo al 95% sulla quota
+        if estimate:
+            ownership["estimate"] = {
+                "method": "stratified_sample",
+                "sampled_files": estimate[0],
+                "population_files": estimate[1],
+                "strata": estimate[2],
+                "confidence": 0.95,
+            }
+        by_author = []
+        for a, n, hw in entries:
+            pct = round(n / total * 100, 2)
+            item = {"author": a, "lines": n, "pct": pct}
+            if estimate and hw is not None:
+                item["pct_ci"] = [round(max(pct - hw, 0.0), 2), round(min(pct + hw, 100.0), 2)]
+            by_author.append(item)
+        ownership["by_author"] = by_author
 
 payload = {
     "metadata": {
@@ -662,44 +1882,134 @@ payload = {
     },
     "data": data,
 }
+if author_filter:
+    payload["metadata"]["author"] = author_filter
+if sketch_registers:
+    payload["metadata"]["files_estimate"] = {
+        "method": "hyperloglog",
+        "registers": sketch_registers,
+        "relative_error": round(1.04 / sketch_registers ** 0.5, 4),
+    }
+if dir_tsv or hot_tsv or series_json:
+    import os
+    sys.path.insert(0, os.path.dirname(dir_module))
+    import git_stats_engine
+if dir_tsv:
+    payload["directories"] = git_stats_engine.build_directories(
+        git_stats_engine.read_directory_tsv(dir_tsv), dir_depth)
+if hot_tsv:
+    payload["hotspots"] = git_stats_engine.build_hotspots(
+        git_stats_engine.read_hotspot_tsv(hot_tsv), hot_k)
 if ownership is not None:
     payload["ownership"] = ownership
+if series_json:
+    ownership_series = git_stats_engine.read_ownership_series(series_json)
+    if ownership_series is not None:
+        payload["ownership_series"] = ownership_series
+
+if engine_module:
+    import os
+    sys.path.insert(0, os.path.dirname(engine_module))
+    import git_stats_engine
+    git_stats_engine.dump_payload(git_stats_engine.columnar_single(payload, sidecar), sys.stdout, True)
+    sys.exit(0)
 
 json.dump(payload, sys.stdout, ensure_ascii=False, indent=2)
 sys.stdout.write("\n")
-' "$START_DATE" "$END_DATE" "$project" "$ownership_tsv" "$ownership_ref" "$ownership_ref_date" < "$tsv"
+' "$START_DATE" "$END_DATE" "$project" "$ownership_tsv" "$ownership_ref" "$ownership_ref_date" \
+    "$([[ "$COLUMNAR" == true ]] && echo "$ENGINE_MODULE")" "$SIDECAR_FILE" \
+    "$dir_tsv" "$BY_DIRECTORY" "$ENGINE_MODULE" "$hot_tsv" "$HOTSPOTS" "$(file_sketch_registers)" \
+    "$series_json" "$author" < "$tsv"
 }
 
 # -----------------------------------------------
 # Emissione TEXT
 # -----------------------------------------------
+# Un solo passaggio awk, nessun processo per riga: i nomi dei giorni (abbreviati, nella
+# lingua di `date`, come prima) si chiedono a date una volta sola per i 7 giorni della
+# settimana, e le date si ordinano convertendole in numero di giorno e scorrendo
+# l'intervallo [min, max] — lineare, invece del confronto a coppie. Con --group-by
+# week|month le righe sono raggruppate per settimana ISO (da lunedì) o per mese, nello
+# stesso passaggio; totali e giorni attivi non cambiano.
 emit_text() {
     local tsv="$1" label="$2"
+    local weekday_names="" i
+    for i in 1 2 3 4 5 6 7; do   # 2024-01-01 è un lunedì
+        weekday_names+="$(date -d "2024-01-0$i" +%a)"$'\t'
+    done
+    local first_col="Giorno" second_col="Data"
+    case "$GROUP_BY" in
+        week) first_col="Settimana"; second_col="Dal" ;;
+        month) first_col="Mese"; second_col="Dal" ;;
+    esac
+
     printf "\n## Report: %s\n" "$label"
     echo "----------------------------------------------------------------------------------------------------"
-    printf "%-10s %-12s %8s %12s %12s %12s %8s\n" "Giorno" "Data" "Commit" "Righe Tot." "Aggiunte" "Rimosse" "File"
+    printf "%-10s %-12s %8s %12s %12s %12s %8s\n" "$first_col" "$second_col" "Commit" "Righe Tot." "Aggiunte" "Rimosse" "File"
     echo "----------------------------------------------------------------------------------------------------"
 
-    awk -F'\t' '
+    awk -F'\t' -v names="$weekday_names" -v group="$GROUP_BY" '
+        # Giorni dal 1970-01-01 <-> data civile (algoritmi di H. Hinnant, calendario gregoriano)
+        function day_number(d,    y, m, dd, era, yoe, doy, doe) {
+            y = substr(d, 1, 4) + 0; m = substr(d, 6, 2) + 0; dd = substr(d, 9, 2) + 0
+            if (m <= 2) y--
+            era = int((y >= 0 ? y : y - 399) / 400)
+            yoe = y - era * 400
+            doy = int((153 * (m + (m > 2 ? -3 : 9)) + 2) / 5) + dd - 1
+            doe = yoe * 365 + int(yoe / 4) - int(yoe / 100) + doy
+            return era * 146097 + doe - 719468
+        }
+        function civil(n,    z, era, doe, yoe, y, doy, mp, dd, m) {
+            z = n + 719468
+            era = int((z >= 0 ? z : z - 146096) / 146097)
+            doe = z - era * 146097
+            yoe = int((doe - int(doe / 1460) + int(doe / 36524) - int(doe / 146096)) / 365)
+            y = yoe + era * 400
+            doy = doe - (365 * yoe + int(yoe / 4) - int(yoe / 100))
+            mp = int((5 * doy + 2) / 153)
+            dd = doy - int((153 * mp + 2) / 5) + 1
+            m = mp + (mp < 10 ? 3 : -9)
+            if (m <= 2) y++
+            return sprintf("%04d-%02d-%02d", y, m, dd)
+        }
+        # 0 = lunedì ... 6 = domenica (il 1970-01-01 era un giovedì)
+        function weekday(n) { return (n % 7 + 7 + 3) % 7 }
+        BEGIN { split(names, wname, "\t") }
         {
             # Campo 3 e` la ora del giorno: qui non serve, la somma per data la assorbe
             # (piu` righe per lo stesso giorno, una per ora con attivita, si aggregano su d).
-            d = $2
-            commits[d] += $4; added[d] += $5; deleted[d] += $6; files[d] += $7
-            if (!(d in seen)) { seen[d] = 1; order[++n] = d }
+            n = day_number($2)
+            if (group == "week") {
+                k = n - weekday(n)
+            } else if (group == "month") {
+                k = day_number(substr($2, 1, 8) "01")
+            } else {
+                k = n
+            }
+            commits[k] += $4; added[k] += $5; deleted[k] += $6; files[k] += $7
+            if (!(k in seen)) {
+                seen[k] = 1
+                if (nk == 0 || k < lo) lo = k
+                if (nk == 0 || k > hi) hi = k
+                nk++
+            }
             tc += $4; ta += $5; td += $6; tf += $7
-            if ($4 > 0) activedays[d] = 1
+            if ($4 > 0) activedays[n] = 1
         }
         END {
-            # ordina le date (stringhe YYYY-MM-DD)
-            for (i = 1; i <= n; i++) for (j = i + 1; j <= n; j++)
-                if (order[j] < order[i]) { t = order[i]; order[i] = order[j]; order[j] = t }
-            for (i = 1; i <= n; i++) {
-                d = order[i]
-                cmd = "date -d " d " +%a"
-                cmd | getline dn
-                close(cmd)
-                printf "%-10s %-12s %8d %12d %12d %12d %8d\n", dn, d, commits[d], added[d] + deleted[d], added[d], deleted[d], files[d]
+            for (k = lo; nk > 0 && k <= hi; k++) {
+                if (!(k in seen)) continue
+                d = civil(k)
+                if (group == "week") {
+                    # Settimana ISO: anno e numero sono quelli del giovedì della settimana
+                    t = civil(k + 3)
+                    first = sprintf("%s-W%02d", substr(t, 1, 4), int((k + 3 - day_number(substr(t, 1, 4) "-01-01")) / 7) + 1)
+                } else if (group == "month") {
+                    first = substr(d, 1, 7)
+                } else {
+                    first = wname[weekday(k) + 1]
+                }
+                printf "%-10s %-12s %8d %12d %12d %12d %8d\n", first, d, commits[k], added[k] + deleted[k], added[k], deleted[k], files[k]
             }
             nd = 0
             for (d in activedays) nd++
@@ -710,21 +2020,250 @@ emit_text() {
         }' "$tsv"
 }
 
+# Tabella per cartella in coda al formato text (--by-directory): totali del periodo, per
+# righe modificate decrescenti. "File" somma i file distinti di ogni giorno, come la
+# colonna omonima del report giornaliero.
+emit_directory_text() {
+    local dir_tsv="$1"
+    printf "\n## Per cartella (profondità %s)\n" "$BY_DIRECTORY"
+    echo "----------------------------------------------------------------------------------------------------"
+    printf "%-40s %8s %12s %12s %12s %8s\n" "Cartella" "Commit" "Righe Tot." "Aggiunte" "Rimosse" "File"
+    echo "----------------------------------------------------------------------------------------------------"
+    awk -F'\t' '
+        { c[$3] += $4; a[$3] += $5; d[$3] += $6; f[$3] += $7 }
+        END { for (k in c) printf "%s\t%d\t%d\t%d\t%d\t%d\n", k, c[k], a[k] + d[k], a[k], d[k], f[k] }' "$dir_tsv" \
+    | sort -t$'\t' -k3,3nr -k1,1 \
+    | awk -F'\t' '{ printf "%-40s %8d %12d %12d %12d %8d\n", $1, $2, $3, $4, $5, $6 }'
+}
+
+# Tabelle degli hotspot in coda al formato text (--hotspots): primi K file per righe
+# modificate e per commit. "±" è l'errore massimo del conteggio (vedi hotspot_capacity),
+# assente quando il valore è esatto.
+emit_hotspots_text() {
+    local hot_tsv="$1" kind title unit
+    for kind in churn touches; do
+        if [[ "$kind" == churn ]]; then
+            title="File con più righe modificate"; unit="Righe"
+        else
+            title="File toccati più spesso"; unit="Commit"
+        fi
+        printf "\n## %s (primi %s)\n" "$title" "$HOTSPOTS"
+        echo "----------------------------------------------------------------------------------------------------"
+        printf "%-80s %10s %8s\n" "File" "$unit" "Errore"
+        echo "----------------------------------------------------------------------------------------------------"
+        awk -F'\t' -v kind="$kind" '$1 == kind { print $2 "\t" $3 "\t" $4 }' "$hot_tsv" \
+        | sort -t$'\t' -k2,2nr -k1,1 | head -n "$HOTSPOTS" \
+        | awk -F'\t' '{ printf "%-80s %10d %8s\n", $1, $2, ($3 > 0 ? "±" $3 : "") }'
+    done
+}
+
+# -----------------------------------------------
+# Tempi per fase (--timings)
+# -----------------------------------------------
+# Ogni fase aggiunge a $TIMINGS_FILE righe "fase \t chiave \t valore": wall_s, peak_rss_kb e
+# i contatori da cui si ricava il throughput (commits, numstat_lines, files, rows).
+# report_timings le riassume su stderr e nel blocco metadata.timings del JSON.
+
+# timed_stage <fase> <comando...>: esegue il comando (stdin/stdout del chiamante) e ne
+# registra durata e picco di memoria. Il picco RSS è quello del processo più grande fra
+# quelli lanciati dalla fase: finito il comando la subshell si sostituisce (exec) con
+# python3, che legge getrusage(RUSAGE_CHILDREN) — i figli già attesi, nipoti compresi,
+# restano contabilizzati attraverso exec. Nessuna dipendenza da /usr/bin/time. Il codice
+# di uscita è quello del comando. Senza --timings il comando gira nella shell corrente,
+# esattamente come prima.
+timed_stage() {
+    local stage="$1"
+    shift
+    if [[ "$TIMINGS" != true ]]; then
+        "$@"
+        return
+    fi
+    (
+        t0=$(date +%s.%N)
+        "$@"
+        status=$?
+        t1=$(date +%s.%N)
+        exec python3 -c '
+import resource, sys
+stage, status, t0, t1 = sys.argv[1:5]
+print(f"{stage}\twall_s\t{float(t1) - float(t0):.6f}")
+print(f"{stage}\tpeak_rss_kb\t{resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}")
+sys.exit(int(status))
+' "$stage" "$status" "$t0" "$t1" >> "$TIMINGS_FILE"
+    )
+}
+
+# timing_count <fase> <contatore> <valore>
+timing_count() {
+    printf '%s\t%s\t%s\n' "$1" "$2" "$3" >> "$TIMINGS_FILE"
+}
+
+# Commit e righe --numstat del flusso di git log $1, come contatori della fase $2.
+timing_log_counts() {
+    [[ "$TIMINGS" == true ]] || return 0
+    awk -F'\t' -v stage="$2" '
+        substr($0, 1, 1) == "\001" { c++; next }
+        NF >= 3 { n++ }
+        END { printf "%s\tcommits\t%d\n%s\tnumstat_lines\t%d\n", stage, c, stage, n }' "$1" >> "$TIMINGS_FILE"
+}
+
+# Riepilogo su stderr. Con un file JSON ($1) lo ristampa su stdout con metadata.timings
+# aggiunto, nella stessa serializzazione (indentata, o compatta per il formato v3).
+# $2 = inizio dell'esecuzione (date +%s.%N), per il totale.
+report_timings() {
+    python3 -c '
+import json, sys
+
+timings_path, json_path, t0, t1 = sys.argv[1:5]
+RATES = {"commits": "commit", "numstat_lines": "righe numstat", "files": "file blamati",
+         "rows": "righe TSV"}
+stages = {}
+with open(timings_path, encoding="utf-8") as fh:
+    for line in fh:
+        stage, key, value = line.rstrip("\n").split("\t")
+        stages.setdefault(stage, {})[key] = float(value) if key == "wall_s" else int(value)
+
+records = []
+for stage, values in stages.items():
+    wall = values.get("wall_s", 0.0)
+    name, _, project = stage.partition(":")
+    record = {"stage": name}
+    if project:
+        record["project"] = project
+    record["wall_s"] = round(wall, 3)
+    record["peak_rss_kb"] = values.get("peak_rss_kb", 0)
+    for key in RATES:
+        if key in values:
+            record[key] = values[key]
+            record[key + "_per_s"] = round(values[key] / wall, 1) if wall > 0 else None
+    records.append(record)
+total = round(float(t1) - float(t0), 3)
+
+print("Tempi per fase (--timings):", file=sys.stderr)
+labels = [r["stage"] + (" " + r["project"] if "project" in r else "") for r in records]
+width = max(len(label) for label in labels + ["totale"])
+for label, r in zip(labels, records):
+    wall, rss_mb = r["wall_s"], r["peak_rss_kb"] / 1024
+    rates = []
+    for key, what in RATES.items():
+        if key in r:
+            per_s = r[key + "_per_s"] or 0
+            rates.append(f"{r[key]} {what} ({per_s:.0f}/s)")
+    print(f"  {label:<{width}}  {wall:8.3f}s  RSS max {rss_mb:7.1f} MB"
+          + ("  " + ", ".join(rates) if rates else ""), file=sys.stderr)
+print("  " + "totale".ljust(width) + f"  {total:8.3f}s", file=sys.stderr)
+
+if json_path:
+    with open(json_path, encoding="utf-8", errors="surrogateescape") as fh:
+        payload = json.load(fh)
+    payload["metadata"]["timings"] = {"total_s": total, "stages": records}
+    sys.stdout.reconfigure(errors="surrogateescape")
+    if payload["metadata"].get("format") == 3:
+        json.dump(payload, sys.stdout, ensure_ascii=False, separators=(",", ":"))
+    else:
+        json.dump(payload, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+' "$TIMINGS_FILE" "$1" "$2" "$(date +%s.%N)"
+}
+
+# Fine di --timings in main: ripristina stdout (rediretto sul file del JSON) e stampa il
+# riepilogo. Usa tmpdir e t_main, locali di main.
+finish_timings() {
+    [[ "$TIMINGS" == true ]] || return 0
+    if [[ "$OUTPUT_FORMAT" == "json" ]]; then
+        exec 1>&4 4>&-
+        report_timings "$tmpdir/report.json" "$t_main"
+    else
+        report_timings "" "$t_main"
+    fi
+}
+
 # -----------------------------------------------
 # Main
 # -----------------------------------------------
+# Ownership: solo per json (è l'unico consumatore) e solo se non disattivata.
+# Costo non banale (un git blame per file, vedi collect_ownership_tsv): non ha
+# senso pagarlo per un output testuale che non lo usa. Imposta ownership_tsv,
+# ownership_ref e ownership_ref_date, locali del chiamante (main).
+collect_ownership_for_json() {
+    [[ "$OWNERSHIP_ENABLED" == true ]] || return 0
+    ownership_ref=$(resolve_ownership_ref)
+    if [[ -n "$ownership_ref" ]]; then
+        ownership_ref_date=$(git log -1 --format=%cd --date=short "$ownership_ref" 2>/dev/null)
+        ownership_tsv="$tmpdir/ownership.tsv"
+        timed_stage ownership collect_ownership_tsv "$ownership_ref" "$alias_tsv" "$tmpdir" > "$ownership_tsv"
+        [[ "$TIMINGS" == true ]] && timing_count ownership files "$(tr -cd '\0' < "$tmpdir/ownership_files.lst" | wc -c)"
+    else
+        echo "Avviso: nessun commit trovato prima del $END_DATE, ownership non calcolata." >&2
+    fi
+}
+
+# Serie dell'ownership (--ownership-series): calcolata da git_stats_engine.py, che fa il blame
+# completo solo al primo punto e poi applica i diff (vedi OwnershipSeries), con lo stesso
+# pool e lo stesso tetto globale di collect_ownership_tsv. Imposta ownership_series_json,
+# locale del chiamante (main); file vuoto se non c'è alcun commit <= DATA_FINE.
+collect_ownership_series_for_json() {
+    [[ -n "$OWNERSHIP_SERIES" ]] || return 0
+    local jobs cap
+    cap=$(blame_jobs)
+    jobs=$(nproc 2>/dev/null); jobs="${jobs:-4}"
+    (( jobs > cap )) && jobs=$cap
+    ownership_series_json="$tmpdir/ownership_series.json"
+    timed_stage ownership_series python3 "$ENGINE_MODULE" ownership-series \
+        --start "$START_DATE" --end "$END_DATE" --period "$OWNERSHIP_SERIES" --aliases "$alias_tsv" \
+        --jobs "$jobs" --slots-dir "$(blame_slots_dir)" --slots "$cap" > "$ownership_series_json"
+}
+
+# Sottocomando `ownership`: TSV su stdout, due righe di intestazione e poi autore \t righe.
+# Nomi GREZZI: gli alias li applica il chiamante (il multi-progetto li cerca a partire dalla
+# propria cartella, non da quella del repository). Nessun output, con un avviso, se non
+# c'è alcun commit <= DATA_FINE.
+#   #   ref     <commit>   <data del commit>
+#   #   files   <file nell'albero>   <file blamati, esclusi quelli riusati dalla cache>
+emit_ownership_only() {
+    local tmpdir="$1" rev
+    rev=$(resolve_ownership_ref)
+    if [[ -z "$rev" ]]; then
+        echo "Avviso: nessun commit trovato prima del $END_DATE, ownership non calcolata." >&2
+        return 0
+    fi
+    collect_ownership_tsv "$rev" "" "$tmpdir" > "$tmpdir/ownership.tsv" || return 1
+    printf '#\tref\t%s\t%s\n' "$rev" "$(git log -1 --format=%cd --date=short "$rev" 2>/dev/null)"
+    printf '#\tfiles\t%d\t%d\n' "$(wc -l < "$tmpdir/ownership_tree.tsv")" \
+        "$(tr -cd '\0' < "$tmpdir/ownership_files.lst" | wc -c)"
+    cat "$tmpdir/ownership.tsv"
+}
+
 main() {
     # Validazioni base
-    if [ -z "$START_DATE" ] || [ -z "$END_DATE" ]; then
+    if [[ "$PREPARE_ONLY" == true ]]; then
+        if [[ -n "$START_DATE" && ! "$START_DATE" =~ ^[0-9]{4}-[0-9]{2}-[0-9]{2}$ ]]; then
+            echo "Errore: Date devono essere in formato YYYY-MM-DD" >&2
+            exit 1
+        fi
+    elif [ -z "$START_DATE" ] || [ -z "$END_DATE" ]; then
         echo "Errore: specificare date. Uso: $0 <START> <END> [text|json] [autore]" >&2; exit 1
-    fi
-
-    if ! [[ "$START_DATE" =~ ^[0-9]{4}-[0-9]{2}-[0-9]{2}$ ]] || \
+    elif ! [[ "$START_DATE" =~ ^[0-9]{4}-[0-9]{2}-[0-9]{2}$ ]] || \
        ! [[ "$END_DATE" =~ ^[0-9]{4}-[0-9]{2}-[0-9]{2}$ ]]; then
         echo "Errore: Date devono essere in formato YYYY-MM-DD" >&2
         exit 1
     fi
 
+    if [[ "$COLUMNAR" == true && "$OUTPUT_FORMAT" != "json" ]]; then
+        echo "Errore: --columnar/--sidecar valgono solo con formato json." >&2
+        exit 1
+    fi
+
+    if [[ -n "$OWNERSHIP_SERIES" && "$OUTPUT_FORMAT" != "json" ]]; then
+        echo "Errore: --ownership-series vale solo con formato json." >&2
+        exit 1
+    fi
+
+    if [[ -n "$GROUP_BY" && "$OUTPUT_FORMAT" != "text" ]]; then
+        echo "Errore: --group-by vale solo con formato text (il JSON resta giornaliero)." >&2
+        exit 1
+    fi
+
     # Risoluzione --repo (path locale o URL), se specificato
     if [[ -n "$REPO_ARG" ]]; then
         local resolved_repo
@@ -743,45 +2282,129 @@ main() {
     local project
     project=$(basename "$(git rev-parse --show-toplevel 2>/dev/null)")
 
+    # File temporanei
+    local tmpdir
+    tmpdir=$(mktemp -d)
+    trap 'rm -rf "$tmpdir"' EXIT
+    local alias_tsv="$tmpdir/aliases.tsv"
+    local raw_tsv="$tmpdir/daily.tsv"
+    local use_tsv="$tmpdir/filtered.tsv"
+
+    local t_main=""
+    if [[ "$TIMINGS" == true ]]; then
+        t_main=$(date +%s.%N)
+        TIMINGS_FILE="$tmpdir/timings.tsv"
+        : > "$TIMINGS_FILE"
+    fi
+
     # Aggiorna le informazioni remote per includere tutti i cambiamenti più recenti
-    if [[ "$FETCH_ENABLED" == true ]]; then
+    if [[ "$FETCH_ENABLED" == true ]] && fetch_is_fresh; then
+        echo "Skip aggiornamento: fetch eseguito meno di $FETCH_TTL minuti fa (--fetch-ttl)." >&2
+    elif [[ "$FETCH_ENABLED" == true ]]; then
         echo "Aggiornamento informazioni remote..." >&2
-        if git fetch --quiet 2>/dev/null; then
+        if timed_stage fetch git fetch --quiet 2>/dev/null; then
             echo "Repository aggiornato con successo." >&2
         else
             echo "Avviso: Impossibile aggiornare il repository remoto (problemi di connettività o repository senza remote)." >&2
             echo "Verranno analizzati solo i commit locali disponibili." >&2
         fi
-    else
+    elif [[ "$OWNERSHIP_ONLY" != true && "$PREPARE_ONLY" != true ]]; then
         echo "Skip aggiornamento (usa --fetch per abilitare)." >&2
     fi
 
-    # File temporanei
-    local tmpdir
-    tmpdir=$(mktemp -d)
-    trap 'rm -rf "$tmpdir"' EXIT
-    local alias_tsv="$tmpdir/aliases.tsv"
-    local raw_tsv="$tmpdir/daily.tsv"
-    local use_tsv="$tmpdir/filtered.tsv"
+    if [[ "$PREPARE_ONLY" == true ]]; then
+        prepare_commit_graph . || exit 1
+        [[ "$PREPARE_COMPARE" == true ]] && report_commit_graph_speedup . "$START_DATE"
+        exit 0
+    fi
+    if [[ "$OWNERSHIP_ONLY" == true ]]; then
+        emit_ownership_only "$tmpdir"
+        exit $?
+    fi
+    if [[ "$PREPARE" == true ]]; then
+        timed_stage prepare prepare_commit_graph .
+    fi
 
     dump_aliases_tsv > "$alias_tsv"
     [[ -s "$alias_tsv" ]] || alias_tsv=""
 
-    collect_daily_tsv "$alias_tsv" > "$raw_tsv"
+    if [[ "$ENGINE" == python || "$COLUMNAR" == true || -n "$OWNERSHIP_SERIES" ||
+          ( -n "$BY_DIRECTORY$HOTSPOTS" && "$OUTPUT_FORMAT" == "json" ) ]]; then
+        ENGINE_MODULE=$(find_engine_module)
+        if [[ -z "$ENGINE_MODULE" ]]; then
+            echo "Errore: --engine python, --columnar, --ownership-series, --by-directory e --hotspots (json) richiedono git_stats_engine.py accanto a $0." >&2
+            exit 1
+        fi
+    fi
 
     # Filtro autore (match ESATTO, non più sottostringa).
     # I dati sono già raggruppati sotto il nome-alias, quindi un filtro espresso col nome
     # Git originale va prima risolto attraverso la mappa, altrimenti non troverebbe nulla.
-    if [[ -n "$CLI_AUTHOR_FILTER" ]]; then
-        local want="$CLI_AUTHOR_FILTER"
-        if [[ -n "$alias_tsv" ]]; then
-            local mapped
-            mapped=$(awk -F'\t' -v w="$want" '$1 == w { print $2; exit }' "$alias_tsv")
-            if [[ -n "$mapped" && "$mapped" != "$want" ]]; then
-                echo "Autore \"$want\" risolto in \"$mapped\" tramite gli alias." >&2
-                want="$mapped"
-            fi
+    local want="$CLI_AUTHOR_FILTER"
+    if [[ -n "$want" && -n "$alias_tsv" ]]; then
+        local mapped
+        mapped=$(awk -F'\t' -v w="$want" '$1 == w { print $2; exit }' "$alias_tsv")
+        if [[ -n "$mapped" && "$mapped" != "$want" ]]; then
+            echo "Autore \"$want\" risolto in \"$mapped\" tramite gli alias." >&2
+            want="$mapped"
+        fi
+    fi
+    HOTSPOT_AUTHOR="$want"
+
+    # --timings: git log gira da solo (fase "log") e le fasi successive ne rileggono il
+    # flusso da file (TIMED_LOG, vedi commit_log_stream). Il JSON è scritto su file e
+    # ristampato alla fine con metadata.timings (finish_timings).
+    if [[ "$TIMINGS" == true ]]; then
+        timed_stage log commit_log_stream "$tmpdir" > "$tmpdir/log.txt"
+        TIMED_LOG="$tmpdir/log.txt"
+        timing_log_counts "$TIMED_LOG" log
+        [[ "$OUTPUT_FORMAT" == "json" ]] && exec 4>&1 > "$tmpdir/report.json"
+    fi
+
+    # Motore python + json: raccolta, filtro e serializzazione in un solo processo, dopo
+    # l'ownership (che il motore legge dal suo TSV). Nessun TSV intermedio.
+    if [[ "$ENGINE" == python && "$OUTPUT_FORMAT" == "json" ]]; then
+        local ownership_tsv="" ownership_ref="" ownership_ref_date="" ownership_series_json=""
+        collect_ownership_for_json
+        collect_ownership_series_for_json
+        engine_json() {
+            commit_log_stream "$tmpdir" \
+            | python3 "$ENGINE_MODULE" json --start "$START_DATE" --end "$END_DATE" \
+                --project "$project" --aliases "$alias_tsv" \
+                --author "$want" --author-label "$CLI_AUTHOR_FILTER" \
+                --ownership-tsv "$ownership_tsv" --ownership-ref "$ownership_ref" \
+                --ownership-ref-date "$ownership_ref_date" --ownership-series-json "$ownership_series_json" \
+                $([[ "$COLUMNAR" == true ]] && echo --columnar) ${SIDECAR_FILE:+--sidecar "$SIDECAR_FILE"} \
+                ${BY_DIRECTORY:+--by-directory "$BY_DIRECTORY"} ${HOTSPOTS:+--hotspots "$HOTSPOTS"} \
+                $([[ "$APPROX_FILES" == true ]] && echo --approx-files)
+        }
+        timed_stage aggregate_emit engine_json
+        timing_log_counts "$TIMED_LOG" aggregate_emit
+        finish_timings
+        return
+    fi
+
+    # --by-directory/--hotspots: righe per cartella e top-K dei file dallo stesso passaggio
+    # di aggregazione
+    local dir_tsv="" hot_tsv=""
+    [[ -n "$BY_DIRECTORY" ]] && dir_tsv="$tmpdir/directories.tsv"
+    [[ -n "$HOTSPOTS" ]] && hot_tsv="$tmpdir/hotspots.tsv"
+    if [[ "$ENGINE" == python ]]; then
+        timed_stage aggregate collect_daily_tsv_python "$alias_tsv" "$tmpdir" "$dir_tsv" "$hot_tsv" > "$raw_tsv"
+    else
+        timed_stage aggregate collect_daily_tsv "$alias_tsv" "$tmpdir" "$dir_tsv" "$hot_tsv" > "$raw_tsv"
+    fi
+    [[ -n "$hot_tsv" ]] && touch "$hot_tsv"
+    timing_log_counts "$TIMED_LOG" aggregate
+    if [[ -n "$dir_tsv" ]]; then
+        touch "$dir_tsv"
+        if [[ -n "$CLI_AUTHOR_FILTER" ]]; then
+            awk -F'\t' -v want="$want" '$1 == want' "$dir_tsv" > "$dir_tsv.filtered"
+            mv "$dir_tsv.filtered" "$dir_tsv"
         fi
+    fi
+
+    if [[ -n "$CLI_AUTHOR_FILTER" ]]; then
         awk -F'\t' -v want="$want" '$1 == want' "$raw_tsv" > "$use_tsv"
         if [[ ! -s "$use_tsv" ]]; then
             echo "Avviso: nessun dato per l'autore \"$CLI_AUTHOR_FILTER\" (il match è esatto)." >&2
@@ -793,25 +2416,23 @@ main() {
     fi
 
     if [[ "$OUTPUT_FORMAT" == "json" ]]; then
-        # Ownership: solo per json (è l'unico consumatore) e solo se non disattivata.
-        # Costo non banale (un git blame per file, vedi collect_ownership_tsv): non ha
-        # senso pagarlo per un output testuale che non lo usa.
-        local ownership_tsv="" ownership_ref="" ownership_ref_date=""
-        if [[ "$OWNERSHIP_ENABLED" == true ]]; then
-            ownership_ref=$(resolve_ownership_ref)
-            if [[ -n "$ownership_ref" ]]; then
-                ownership_ref_date=$(git log -1 --format=%cd --date=short "$ownership_ref" 2>/dev/null)
-                ownership_tsv="$tmpdir/ownership.tsv"
-                collect_ownership_tsv "$ownership_ref" "$alias_tsv" "$tmpdir" > "$ownership_tsv"
-            else
-                echo "Avviso: nessun commit trovato prima del $END_DATE, ownership non calcolata." >&2
-            fi
-        fi
-        emit_json "$use_tsv" "$project" "$ownership_tsv" "$ownership_ref" "$ownership_ref_date"
+        local ownership_tsv="" ownership_ref="" ownership_ref_date="" ownership_series_json=""
+        collect_ownership_for_json
+        collect_ownership_series_for_json
+        timed_stage emit emit_json "$use_tsv" "$project" "$ownership_tsv" "$ownership_ref" "$ownership_ref_date" "$dir_tsv" "$hot_tsv" "$ownership_series_json" "$want"
     else
         echo "Generazione report dal $START_DATE al $END_DATE..."
-        emit_text "$use_tsv" "${CLI_AUTHOR_FILTER:-TOTALE}"
+        timed_stage emit emit_text "$use_tsv" "${CLI_AUTHOR_FILTER:-TOTALE}"
+        [[ "$APPROX_FILES" == true ]] && echo "File distinti stimati (--approx-files, HyperLogLog): errore relativo tipico 1,6%"
+        [[ -n "$dir_tsv" ]] && emit_directory_text "$dir_tsv"
+        [[ -n "$hot_tsv" ]] && emit_hotspots_text "$hot_tsv"
     fi
+    [[ "$TIMINGS" == true ]] && timing_count emit rows "$(wc -l < "$use_tsv")"
+    finish_timings
 }
 
-main
+# Solo se eseguito come script: benchmark/bench.py lo include con `source` per cronometrare
+# le singole fasi (collect_daily_tsv, collect_ownership_tsv, emit_json, emit_text).
+if [[ "${BASH_SOURCE[0]}" == "$0" ]]; then
+    main
+fi
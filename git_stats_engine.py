@@ -0,0 +1,1156 @@
+#!/usr/bin/env python3
+"""Motore di aggregazione in Python per git_stats_collector.sh (--engine python).
+
+Alternativa alla catena `git log | awk | sort | python3 -c` del collector: legge da
+stdin lo STESSO flusso di `git log --numstat` (anche quello ricostruito dalla cache
+per-commit, vedi cached_log_stream nel collector), lo scorre come generatore un commit
+alla volta e aggrega in un solo processo, senza il sort intermedio e senza un secondo
+interprete per la serializzazione. Il JSON prodotto è identico byte per byte a quello
+del motore awk (default): stesse regole di raccolta, stessa costruzione del payload.
+
+Regole di raccolta (le stesse dell'awk, vedi il commento in testa al collector):
+  - il giorno è quello della AUTHOR-DATE, filtrato esattamente su [start, end];
+  - gli alias autore sono applicati sul nome grezzo PRIMA di aggregare;
+  - `files` conta i file DISTINTI per (autore, giorno, ora); i file binari ("-")
+    contano come file toccati ma non aggiungono righe.
+
+Uso (normalmente invocato dal collector, non a mano):
+
+  git log ... | git_stats_engine.py json --start S --end E --project P [opzioni]
+  git log ... | git_stats_engine.py tsv  --start S --end E [--aliases FILE]
+  git_stats_engine.py ownership-series --start S --end E --period month|week [--aliases FILE]
+
+`tsv` emette le righe "autore, data, ora, commits, added, deleted, files" che il
+collector usa per il formato testuale; `json` emette il payload completo (filtro autore
+e ownership inclusi). Con --by-directory DEPTH lo stesso passaggio attribuisce ogni riga
+numstat alla cartella del file troncata a DEPTH segmenti (vedi directory_of): `json`
+aggiunge la sezione "directories" (build_directories), `tsv` scrive le righe per
+cartella nel file --directory-tsv. Con --hotspots K, allo stesso modo, i K file con più
+righe modificate e più commit (HotspotCounter, memoria limitata): sezione "hotspots" in
+`json`, tabelle grezze nel file --hotspots-tsv in `tsv`. Con --approx-files i file
+distinti sono stimati con uno sketch HyperLogLog per gruppo invece che contati su un
+insieme esatto (FileSketch, memoria limitata), e `json` lo dichiara in
+metadata.files_estimate. `ownership-series` non legge stdin: calcola dal repository della
+cartella corrente il blocco `ownership_series` (OwnershipSeries), che `json` riceve con
+--ownership-series-json. Il modulo è importabile: iter_commits/aggregate/build_payload
+sono il punto unico da profilare od ottimizzare.
+
+FORMATO COLONNARE (v3, --columnar / --sidecar)
+----------------------------------------------
+columnar_single/columnar_multi convertono il payload classico (un oggetto per
+autore-giorno, chiavi ripetute) in tabelle per colonna: nomi autore/progetto codificati
+una volta sola in un dizionario e referenziati per indice, date come offset in giorni da
+metadata.start_date, JSON compatto senza indentazione. Con un sidecar, la tabella
+giornaliera (la parte voluminosa) va in un file .npy che i plotter aprono in memory-map;
+il JSON ne riporta solo il percorso. Usate anche da git_stats_collector.sh (motore awk)
+e da git_multiproject_stats_collector.sh, così il formato ha un'unica implementazione.
+"""
+
+import argparse
+import array
+import concurrent.futures
+import contextlib
+import datetime
+import fcntl
+import heapq
+import json
+import math
+import os
+import random
+import re
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+COLUMNAR_FORMAT = 3
+# Capacità delle tabelle hotspot = fattore × K, con un minimo (come hotspot_capacity nel collector)
+HOTSPOT_CAPACITY_FACTOR = 50
+HOTSPOT_MIN_CAPACITY = 1000
+
+
+# Sketch dei file distinti con --approx-files (come FILE_SKETCH_REGISTERS nei collector)
+FILE_SKETCH_REGISTERS = 4096
+FILE_HASH_PRIME = 4294967291
+
+
+def hotspot_capacity(k):
+    return max(k * HOTSPOT_CAPACITY_FACTOR, HOTSPOT_MIN_CAPACITY)
+
+
+def files_estimate_metadata():
+    """Blocco metadata.files_estimate: metodo e errore relativo tipico (1.04 / sqrt(m))."""
+    return {
+        "method": "hyperloglog",
+        "registers": FILE_SKETCH_REGISTERS,
+        "relative_error": round(1.04 / math.sqrt(FILE_SKETCH_REGISTERS), 4),
+    }
+
+
+def load_aliases_tsv(path):
+    """Legge il TSV "nome-git<TAB>nome-visualizzato" prodotto da dump_aliases_tsv."""
+    aliases = {}
+    if not path:
+        return aliases
+    with open(path, encoding="utf-8", errors="surrogateescape") as fh:
+        for line in fh:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) >= 2 and parts[0]:
+                aliases[parts[0]] = parts[1]
+    return aliases
+
+
+def iter_commits(lines):
+    """Generatore di commit da un flusso `git log --pretty=%x01%H%x09%an%x09%ad --numstat`.
+
+    Produce tuple (autore, data, ora, numstat) dove numstat è la lista di tuple
+    (added, deleted, path) — added/deleted sono None per i file binari. L'ordine dei
+    blocchi nel flusso non conta (la cache li restituisce in ordine qualsiasi).
+    """
+    current = None
+    for line in lines:
+        line = line.rstrip("\n")
+        if line.startswith("\x01"):
+            if current is not None:
+                yield current
+            parts = line.split("\t")
+            author = parts[1] if len(parts) > 1 else ""
+            stamp = (parts[2] if len(parts) > 2 else "").split(" ")
+            hour = stamp[1] if len(stamp) > 1 else ""
+            current = (author, stamp[0], int(hour) if hour.isdigit() else 0, [])
+            continue
+        if current is None:
+            continue
+        parts = line.split("\t")
+        if len(parts) < 3:
+            continue
+        if parts[0].isdigit() and parts[0].isascii():
+            current[3].append((int(parts[0]), int(parts[1]), parts[2]))
+        else:
+            current[3].append((None, None, parts[2]))
+    if current is not None:
+        yield current
+
+
+def destination_path(path):
+    """Percorso di una riga numstat; per un rename la destinazione: "src/{a => b}/f.py" ->
+    "src/b/f.py", "x.py => lib/x.py" -> "lib/x.py". Stessa regola dell'awk (dest_path)."""
+    if " => " not in path:
+        return path
+    i, j = path.find("{"), path.find("}")
+    if 0 <= i < j:
+        mid = path[i + 1:j].split(" => ", 1)[-1]
+        return "/".join(p for p in (path[:i] + mid + path[j + 1:]).split("/") if p)
+    return path.split(" => ", 1)[-1]
+
+
+def directory_of(path, depth):
+    """Cartella di una riga numstat troncata a `depth` segmenti ("." per i file in radice),
+    per un rename quella della destinazione. Stessa regola dell'awk del collector (dir_of).
+    """
+    parts = destination_path(path).split("/")
+    if len(parts) <= 1:
+        return "."
+    return "/".join(parts[:min(depth, len(parts) - 1)])
+
+
+class HotspotCounter:
+    """Top-K in streaming a memoria limitata (Space-Saving con potatura a blocchi).
+
+    Al più 2 × capacity voci: quando la tabella è piena si tengono le `capacity` più alte e
+    la soglia di scarto diventa valore iniziale ed errore dei percorsi nuovi. Il valore vero
+    di ogni voce sta in [valore - errore, valore]. Stesso algoritmo, passo per passo, di
+    hs_add/hs_prune nell'awk del collector: stesso flusso, stesse tabelle.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.floor = 0
+
+    def add(self, key, weight):
+        if key not in self.counts:
+            if len(self.counts) >= 2 * self.capacity:
+                self._prune()
+            self.counts[key] = self.errors[key] = self.floor
+        self.counts[key] += weight
+
+    def _prune(self):
+        threshold = heapq.nlargest(self.capacity + 1, self.counts.values())[-1]
+        for key in [k for k, v in self.counts.items() if v <= threshold]:
+            del self.counts[key]
+            del self.errors[key]
+        self.floor = max(self.floor, threshold)
+
+    def rows(self, kind):
+        return ((kind, key, n, self.errors[key]) for key, n in self.counts.items())
+
+
+def file_hash(path):
+    """(registro, rango) HyperLogLog di un percorso: due hash polinomiali sui byte modulo un
+    primo, elevati al cubo (senza, nomi in sequenza come pkg001..pkg999 sbilanciano la
+    stima). Stessa aritmetica, stessi valori, di hll_hash negli awk dei collector."""
+    h1 = h2 = 0
+    for c in path.encode("utf-8", "surrogateescape"):
+        h1 = (h1 * 1000003 + c + 1) % FILE_HASH_PRIME
+        h2 = (h2 * 999983 + c + 1) % FILE_HASH_PRIME
+    h1 = pow(h1, 3, FILE_HASH_PRIME)
+    h2 = pow(h2, 3, FILE_HASH_PRIME)
+    rank, threshold = 1, FILE_HASH_PRIME / 2
+    while h2 < threshold and rank < 33:
+        rank += 1
+        threshold /= 2
+    return h1 % FILE_SKETCH_REGISTERS, rank
+
+
+class FileSketch:
+    """Conteggio approssimato dei file distinti di un gruppo (HyperLogLog sparso).
+
+    Solo i registri toccati sono memorizzati: al più FILE_SKETCH_REGISTERS voci per gruppo,
+    quanti che siano i file. `total` è la somma di 2^(33 - rango) sui registri non vuoti,
+    intera ed esatta, così la stima è la stessa di hll_count nell'awk.
+    """
+
+    __slots__ = ("registers", "total")
+
+    def __init__(self):
+        self.registers = {}
+        self.total = 0
+
+    def add(self, path):
+        j, rank = file_hash(path)
+        old = self.registers.get(j, 0)
+        if rank > old:
+            self.registers[j] = rank
+            self.total += 2 ** (33 - rank) - (2 ** (33 - old) if old else 0)
+
+    def count(self):
+        m = FILE_SKETCH_REGISTERS
+        if not self.registers:
+            return 0
+        empty = m - len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m * 8589934592 / (self.total + empty * 8589934592)
+        # Linear counting per gli insiemi piccoli (il caso normale: pochi file per gruppo)
+        if estimate <= 2.5 * m and empty > 0:
+            estimate = m * math.log(m / empty)
+        return int(estimate + 0.5)
+
+
+def aggregate(commits, start, end, aliases, depth=0, dir_buckets=None, hotspots=None,
+              hotspot_author="", approx_files=False):
+    """Aggrega i commit per (autore, data, ora) — l'equivalente dell'awk del collector.
+
+    Restituisce un dict {(autore, data, ora): [commits, added, deleted, files]}. Con
+    `dir_buckets` (e depth > 0) lo riempie, nello stesso passaggio, con
+    {(autore, data, cartella): [commits, added, deleted, files]}: un commit conta una volta
+    per ogni cartella che tocca, `files` sono i file distinti per (autore, data, cartella).
+    `hotspots` = (HotspotCounter righe, HotspotCounter commit), aggiornati per ogni riga
+    numstat (dei soli commit di `hotspot_author`, se indicato). Con `approx_files` i file
+    distinti di ogni gruppo sono stimati con un FileSketch invece che contati esattamente.
+    """
+    buckets = {}
+    seen_files = set()
+    by_dir = dir_buckets is not None and depth > 0
+    dir_seen_files = set()
+    sketches = defaultdict(FileSketch) if approx_files else None
+    dir_sketches = defaultdict(FileSketch) if approx_files else None
+    for author, day, hour, numstat in commits:
+        # Confronto lessicografico su YYYY-MM-DD, come in awk
+        if not (start <= day <= end):
+            continue
+        author = aliases.get(author, author)
+        key = (author, day, hour)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [0, 0, 0, 0]
+        bucket[0] += 1
+        for added, deleted, path in numstat:
+            if added is not None:
+                bucket[1] += added
+                bucket[2] += deleted
+            fkey = (key, path)
+            if approx_files:
+                sketches[key].add(path)
+            elif fkey not in seen_files:
+                seen_files.add(fkey)
+                bucket[3] += 1
+        if hotspots is not None and (not hotspot_author or author == hotspot_author):
+            by_lines, by_commits = hotspots
+            for added, deleted, path in numstat:
+                path = destination_path(path)
+                by_lines.add(path, added + deleted if added is not None else 0)
+                by_commits.add(path, 1)
+        if by_dir:
+            touched = set()
+            for added, deleted, path in numstat:
+                directory = directory_of(path, depth)
+                dkey = (author, day, directory)
+                dbucket = dir_buckets.get(dkey)
+                if dbucket is None:
+                    dbucket = dir_buckets[dkey] = [0, 0, 0, 0]
+                if directory not in touched:
+                    touched.add(directory)
+                    dbucket[0] += 1
+                if added is not None:
+                    dbucket[1] += added
+                    dbucket[2] += deleted
+                if approx_files:
+                    dir_sketches[dkey].add(path)
+                elif (dkey, path) not in dir_seen_files:
+                    dir_seen_files.add((dkey, path))
+                    dbucket[3] += 1
+    if approx_files:
+        for key, sketch in sketches.items():
+            buckets[key][3] = sketch.count()
+        for key, sketch in dir_sketches.items():
+            dir_buckets[key][3] = sketch.count()
+    return buckets
+
+
+def build_directories(rows, depth):
+    """Sezione "directories" del payload dalle righe (autore, data, cartella, commits,
+    added, deleted, files) — dall'awk del collector o da aggregate(dir_buckets=...).
+
+    Una voce per cartella, per righe modificate decrescenti: totali, serie giornaliera
+    (sommata sugli autori) e ripartizione per autore.
+    """
+    totals = {}
+    daily = defaultdict(lambda: defaultdict(lambda: [0, 0, 0, 0]))
+    authors = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+    for author, date_s, directory, commits, added, deleted, files in rows:
+        total = totals.setdefault(directory, [0, 0, 0, 0])
+        day = daily[directory][date_s]
+        for acc in (total, day):
+            acc[0] += commits
+            acc[1] += added
+            acc[2] += deleted
+            acc[3] += files
+        who = authors[directory][author]
+        who[0] += commits
+        who[1] += added + deleted
+
+    entries = []
+    for directory, (commits, added, deleted, files) in totals.items():
+        entries.append({
+            "directory": directory,
+            "commits": commits,
+            "lines": added + deleted,
+            "added": added,
+            "deleted": deleted,
+            "files": files,
+            "daily_data": [
+                {"date": d, "commits": c, "lines": a + r, "added": a, "deleted": r, "files": f}
+                for d, (c, a, r, f) in sorted(daily[directory].items())
+            ],
+            "by_author": [
+                {"author": a, "commits": c, "lines": n}
+                for a, (c, n) in sorted(authors[directory].items(), key=lambda e: (-e[1][1], e[0]))
+            ],
+        })
+    entries.sort(key=lambda e: (-e["lines"], e["directory"]))
+    return {"depth": depth, "by_directory": entries}
+
+
+def build_hotspots(rows, k):
+    """Sezione "hotspots" del payload dalle righe (tipo, percorso, valore, errore) delle due
+    tabelle top-K — dall'awk del collector o da HotspotCounter.rows(). Primi k per valore
+    decrescente; `error` 0 = conteggio esatto."""
+    tables = {"churn": [], "touches": []}
+    for kind, path, n, err in rows:
+        tables[kind].append((path, n, err))
+    top = {kind: sorted(entries, key=lambda e: (-e[1], e[0]))[:k] for kind, entries in tables.items()}
+    return {
+        "k": k,
+        "capacity": hotspot_capacity(k),
+        "by_churn": [{"path": p, "lines": n, "error": e} for p, n, e in top["churn"]],
+        "by_touches": [{"path": p, "commits": n, "error": e} for p, n, e in top["touches"]],
+    }
+
+
+def read_hotspot_tsv(path):
+    """Righe delle tabelle hotspot (tipo, percorso, valore, errore) scritte dall'awk."""
+    with open(path, encoding="utf-8", errors="surrogateescape") as fh:
+        for line in fh:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 4:
+                continue
+            yield (parts[0], parts[1], int(parts[2]), int(parts[3]))
+
+
+def read_directory_tsv(path):
+    """Righe del TSV per cartella (autore, data, cartella, commits, added, deleted, files)."""
+    with open(path, encoding="utf-8", errors="surrogateescape") as fh:
+        for line in fh:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 7:
+                continue
+            yield (parts[0], parts[1], parts[2], *map(int, parts[3:7]))
+
+
+def build_payload(buckets, start, end, project, ownership_tsv="", ownership_ref="",
+                  ownership_ref_date="", directories=None, hotspots=None, files_estimate=None,
+                  ownership_series=None, author_filter=""):
+    """Costruisce il payload JSON — stessa logica (e stesso ordine delle chiavi) di emit_json."""
+    # by_author_day: righe per (autore, data), una per ogni ora con attività quel giorno —
+    # vanno risommate per ricostruire il totale del giorno (daily_data non conosce le ore).
+    by_author_day = defaultdict(list)
+    # punch: conteggio commit per (autore, weekday 0=lunedì..6=domenica, ora 0-23).
+    punch = defaultdict(int)
+    for (author, date_s, hour), (commits, added, deleted, files) in buckets.items():
+        by_author_day[(author, date_s)].append({
+            "commits": commits, "added": added, "deleted": deleted, "files": files,
+        })
+        weekday = datetime.date.fromisoformat(date_s).weekday()
+        punch[(author, weekday, hour)] += commits
+
+    daily_by_author = defaultdict(list)
+    for (author, date_s), rows in by_author_day.items():
+        daily_by_author[author].append({
+            "day": datetime.date.fromisoformat(date_s).strftime("%A"),
+            "date": date_s,
+            "commits": sum(r["commits"] for r in rows),
+            "lines": sum(r["added"] + r["deleted"] for r in rows),
+            "added": sum(r["added"] for r in rows),
+            "deleted": sum(r["deleted"] for r in rows),
+            "files": sum(r["files"] for r in rows),
+        })
+
+    punch_by_author = defaultdict(list)
+    for (author, weekday, hour), commits in punch.items():
+        if commits > 0:
+            punch_by_author[author].append({"weekday": weekday, "hour": hour, "commits": commits})
+
+    data = []
+    for author in sorted(daily_by_author):
+        days = sorted(daily_by_author[author], key=lambda r: r["date"])
+        punch_cells = sorted(punch_by_author.get(author, []), key=lambda c: (c["weekday"], c["hour"]))
+        data.append({
+            "author": author,
+            "total_commits": sum(r["commits"] for r in days),
+            "daily_data": days,
+            "punch_card": punch_cells,
+        })
+
+    payload = {
+        "metadata": {
+            "start_date": start,
+            "end_date": end,
+            "project": project,
+            "date_basis": "author",
+        },
+        "data": data,
+    }
+    if author_filter:
+        payload["metadata"]["author"] = author_filter
+    if files_estimate is not None:
+        payload["metadata"]["files_estimate"] = files_estimate
+    if directories is not None:
+        payload["directories"] = directories
+    if hotspots is not None:
+        payload["hotspots"] = hotspots
+    ownership = read_ownership(ownership_tsv, ownership_ref, ownership_ref_date)
+    if ownership is not None:
+        payload["ownership"] = ownership
+    if ownership_series is not None:
+        payload["ownership_series"] = ownership_series
+    return payload
+
+
+def read_ownership(path, ref, ref_date):
+    """Legge il TSV "autore<TAB>righe" di collect_ownership_tsv (None se assente o vuoto).
+
+    Con --ownership-sample il TSV apre con "#<TAB>estimate<TAB>campionati<TAB>popolazione<TAB>
+    strati" e ogni autore ha la mezza ampiezza dell'intervallo al 95% della sua quota: il
+    blocco riceve `estimate` e ogni autore `pct_ci`.
+    """
+    if not path:
+        return None
+    entries = []
+    total = 0
+    estimate = None
+    try:
+        with open(path, encoding="utf-8", errors="surrogateescape") as fh:
+            for line in fh:
+                line = line.rstrip("\n")
+                if not line:
+                    continue
+                parts = line.split("\t")
+                if parts[0] == "#":
+                    if parts[1:2] == ["estimate"] and len(parts) >= 5:
+                        estimate = [int(x) for x in parts[2:5]]
+                    continue
+                if len(parts) < 2:
+                    continue
+                author, lines_n = parts[0], int(parts[1])
+                entries.append((author, lines_n, float(parts[2]) if len(parts) > 2 else None))
+                total += lines_n
+    except OSError:
+        entries = []
+    if total <= 0:
+        return None
+    entries.sort(key=lambda e: e[1], reverse=True)
+    ownership = {"ref_commit": ref, "ref_date": ref_date, "total_lines": total}
+    if estimate:
+        ownership["estimate"] = {
+            "method": "stratified_sample",
+            "sampled_files": estimate[0],
+            "population_files": estimate[1],
+            "strata": estimate[2],
+            "confidence": 0.95,
+        }
+    by_author = []
+    for a, n, hw in entries:
+        pct = round(n / total * 100, 2)
+        item = {"author": a, "lines": n, "pct": pct}
+        if estimate and hw is not None:
+            item["pct_ci"] = [round(max(pct - hw, 0.0), 2), round(min(pct + hw, 100.0), 2)]
+        by_author.append(item)
+    ownership["by_author"] = by_author
+    return ownership
+
+
+# -----------------------------------------------------------------------------
+# Serie temporale dell'ownership (sottocomando ownership-series, --ownership-series)
+# -----------------------------------------------------------------------------
+# Rifare il blame di tutto l'albero a ogni punto costa punti × file. Qui il blame completo
+# si fa UNA volta, al primo punto, conservando per ogni file l'autore di ogni riga (un
+# array di id); al punto successivo si applicano i diff dei commit dell'intervallo, hunk
+# per hunk: le righe rimosse escono dall'array, quelle aggiunte entrano con l'autore del
+# commit. Il costo cresce con le righe cambiate, non con la dimensione dell'albero.
+#
+# Il risultato è quello di `git blame` a ogni punto, non un'approssimazione: per un commit
+# non di merge git blame attribuisce al commit le righe che il suo diff aggiunge e passa le
+# altre al genitore attraverso lo stesso diff (stesso algoritmo, stesso rilevamento dei
+# rename senza copie) — esattamente quello che fa l'applicazione degli hunk. Dove non è
+# così il file è marcato "sporco" e ri-blamato per intero al punto successivo:
+#   - file toccati da un merge (il blame lì si distribuisce fra i genitori);
+#   - diff binari, hunk fuori dall'array, file di cui non si conosce lo stato.
+# Per questo i riferimenti dei punti stanno tutti sulla catena FIRST-PARENT del riferimento
+# finale (lo stesso dell'ownership a fotografia): l'ultimo commit della catena <= data di
+# ogni punto. Con rev-list --before senza --first-parent due punti consecutivi potrebbero
+# cadere su rami diversi, e fra i due non ci sarebbe una sequenza di diff da applicare.
+
+OWNERSHIP_SERIES_PERIODS = ("month", "week")
+HUNK_RE = re.compile(rb"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+C_ESCAPES = {ord("a"): 7, ord("b"): 8, ord("f"): 12, ord("n"): 10, ord("r"): 13,
+             ord("t"): 9, ord("v"): 11}
+
+
+def _git(*args):
+    return subprocess.run(["git", *args], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+
+
+def series_dates(start, end, period):
+    """Date dei punti: fine di ogni mese (o domenica) in [start, end], più end."""
+    first = datetime.date.fromisoformat(start)
+    last = datetime.date.fromisoformat(end)
+    dates = []
+    if period == "month":
+        day = (first.replace(day=28) + datetime.timedelta(days=4)).replace(day=1) - datetime.timedelta(days=1)
+        while day < last:
+            dates.append(day)
+            day = (day + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+    else:
+        day = first + datetime.timedelta(days=6 - first.weekday())
+        while day < last:
+            dates.append(day)
+            day += datetime.timedelta(days=7)
+    dates.append(last)
+    return [d.isoformat() for d in dates]
+
+
+def series_refs(end, dates):
+    """(data, commit, data del commit) per ogni punto, sulla catena first-parent
+    dell'ultimo commit <= end; i punti senza alcun commit sono omessi."""
+    tip = _git("rev-list", "-1", f"--before={end} 23:59:59", "HEAD").decode().strip()
+    if not tip:
+        return []
+    chain = []
+    for line in _git("log", "--first-parent", "--format=%H %ct %cd", "--date=short", tip).decode().splitlines():
+        sha, ct, cd = line.split(" ")
+        chain.append((sha, int(ct), cd))
+    points = []
+    for d in dates:
+        limit = time.mktime(time.strptime(f"{d} 23:59:59", "%Y-%m-%d %H:%M:%S"))
+        ref = next((c for c in chain if c[1] <= limit), None)
+        if ref is not None:
+            points.append((d, ref[0], ref[2]))
+    return points
+
+
+def unquote_path(raw):
+    """Percorso quotato da git ("a\\tb", ottali per i byte non ASCII) -> byte originali."""
+    if not raw.startswith(b'"'):
+        return raw
+    out = bytearray()
+    i, n = 1, len(raw) - 1
+    while i < n:
+        c = raw[i]
+        if c == 0x5C:   # backslash
+            i += 1
+            c = raw[i]
+            if 0x30 <= c <= 0x37:
+                out.append(int(raw[i:i + 3], 8))
+                i += 3
+                continue
+            out.append(C_ESCAPES.get(c, c))
+        else:
+            out.append(c)
+        i += 1
+    return bytes(out)
+
+
+def diff_header_paths(rest):
+    """Percorsi (vecchio, nuovo) da una riga "diff --git a/X b/Y" senza il prefisso.
+    Ambigua solo per i rename con spazi senza quotatura: lì decidono rename from/to."""
+    if rest.startswith(b'"') or rest.endswith(b'"'):
+        tokens = []
+        while rest and len(tokens) < 2:
+            if rest.startswith(b'"'):
+                j = 1
+                while rest[j] != 0x22:
+                    j += 2 if rest[j] == 0x5C else 1
+                tokens.append(unquote_path(rest[:j + 1]))
+                rest = rest[j + 2:]
+            else:
+                j = rest.find(b" ")
+                tokens.append(rest if j < 0 else rest[:j])
+                rest = b"" if j < 0 else rest[j + 1:]
+        if len(tokens) == 2:
+            return os.fsdecode(tokens[0][2:]), os.fsdecode(tokens[1][2:])
+        return None, None
+    n = (len(rest) - 5) // 2
+    path = rest[2:2 + n]
+    if rest[2 + n:] == b" b/" + path:
+        return os.fsdecode(path), os.fsdecode(path)
+    return None, None
+
+
+@contextlib.contextmanager
+def blame_slot(slots_dir, nslots):
+    """Uno degli slot del tetto globale dei git blame (blame_slots_dir nel collector): stessi
+    file, stesso lock flock, stesso ordine di tentativi del figlio di xargs."""
+    if not slots_dir:
+        yield
+        return
+    first = random.randrange(nslots)
+    fh = None
+    for k in range(nslots):
+        fh = open(os.path.join(slots_dir, f"slot.{(first + k) % nslots}"), "w")
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except OSError:
+            fh.close()
+            fh = None
+    if fh is None:
+        fh = open(os.path.join(slots_dir, f"slot.{first}"), "w")
+        fcntl.flock(fh, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fh.close()
+
+
+class OwnershipSeries:
+    """Autore di ogni riga di ogni file di testo, a un commit, aggiornato un diff alla volta.
+
+    `files` ha per ogni percorso un array di id autore (indice in `names`), `counts` le
+    righe per id. I percorsi in `dirty` non hanno array: vanno ri-blamati (resync).
+    """
+
+    def __init__(self, jobs=1, slots_dir="", nslots=1):
+        self.jobs, self.slots_dir, self.nslots = jobs, slots_dir, nslots
+        self.names, self.ids, self.counts = [], {}, []
+        self.files = {}
+        self.dirty = set()
+        self.blamed = self.commits = 0
+
+    def author_id(self, name):
+        aid = self.ids.get(name)
+        if aid is None:
+            aid = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.counts.append(0)
+        return aid
+
+    def _count(self, owners, sign):
+        for aid, n in Counter(owners).items():
+            self.counts[aid] += sign * n
+
+    def drop(self, path):
+        owners = self.files.pop(path, None)
+        if owners is not None:
+            self._count(owners, -1)
+        return owners
+
+    def mark_dirty(self, path):
+        self.drop(path)
+        self.dirty.add(path)
+
+    def _blame(self, rev, path):
+        with blame_slot(self.slots_dir, self.nslots):
+            out = _git("blame", "--incremental", rev, "--", os.fsencode(path))
+        who, groups, sha, length = {}, [], "", 0
+        for line in out.split(b"\n"):
+            if line.startswith(b"filename "):
+                groups.append((length[0], length[1], who[sha]))
+            elif line.startswith(b"author "):
+                who[sha] = line[7:].decode("utf-8", "surrogateescape")
+            else:
+                parts = line.split(b" ")
+                if len(parts) == 4 and len(parts[0]) >= 40:
+                    sha, length = parts[0], (int(parts[2]) - 1, int(parts[3]))
+        return path, groups
+
+    def blame(self, rev, paths=None):
+        """git blame al commit `rev` di tutti i file di testo (o dei soli `paths`), in
+        parallelo fino a `jobs` e dal più grande, come collect_ownership_tsv."""
+        wanted = None if paths is None else {os.fsencode(p) for p in paths}
+        blobs, total = [], 0
+        for entry in _git("ls-tree", "-r", "-z", "-l", rev).split(b"\0"):
+            meta, _, path = entry.partition(b"\t")
+            meta = meta.split()
+            if len(meta) == 4 and meta[1] == b"blob":
+                total += 1
+                if wanted is None or path in wanted:
+                    blobs.append((int(meta[3]), meta[2], path))
+        binary = self._binary(rev, blobs, total)
+        todo = [(-size, os.fsdecode(path)) for size, _, path in blobs if path not in binary]
+        todo.sort()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for path, groups in pool.map(lambda t: self._blame(rev, t[1]), todo):
+                owners = array.array("I", bytes(4 * sum(n for _, n, _ in groups)))
+                for first, n, author in groups:
+                    owners[first:first + n] = array.array("I", [self.author_id(author)]) * n
+                self.files[path] = owners
+                self._count(owners, 1)
+        self.blamed += len(todo)
+        return len(todo)
+
+    def _binary(self, rev, blobs, total):
+        """Path binari fra `blobs` (righe "-" di `git diff --numstat` dall'albero vuoto), come
+        collect_ownership_tsv: se i blob sono una piccola parte dell'albero, diff su un indice
+        temporaneo che contiene solo loro invece di un pathspec per file."""
+        if not blobs:
+            return set()
+        empty = _git("hash-object", "-t", "tree", "/dev/null").decode().strip()
+        if len(blobs) * 5 < total:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ, GIT_INDEX_FILE=os.path.join(tmp, "index"))
+                info = b"".join(b"100644 %s\t%s\0" % (blob, path) for _, blob, path in blobs)
+                if subprocess.run(["git", "update-index", "-z", "--index-info"], input=info, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+                    out = subprocess.run(["git", "diff-index", "--cached", "--numstat", "-z", "--no-renames",
+                                          empty], env=env, stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL).stdout
+                    return {entry.split(b"\t", 2)[2] for entry in out.split(b"\0")
+                            if entry.startswith(b"-\t-\t")}
+        out = _git("diff", "--numstat", "-z", "--no-renames", empty, rev)
+        return {entry.split(b"\t", 2)[2] for entry in out.split(b"\0") if entry.startswith(b"-\t-\t")}
+
+    def advance(self, old, new):
+        """Porta lo stato da `old` a `new` (discendente first-parent): file toccati dai merge
+        sporchi, diff degli altri commit applicati, file sporchi ri-blamati a `new`."""
+        for path in _git("log", "--first-parent", "--merges", "-m", "--name-only", "--no-renames",
+                         "-z", "--format=", f"{old}..{new}").split(b"\0"):
+            if path.strip(b"\n"):
+                self.mark_dirty(os.fsdecode(path.strip(b"\n")))
+        proc = subprocess.Popen(
+            ["git", "log", "--first-parent", "--no-merges", "--reverse", "-p", "-U0", "-M",
+             "--no-color", "--no-ext-diff", "--src-prefix=a/", "--dst-prefix=b/",
+             "--format=%x00%aN", f"{old}..{new}"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.apply_patches(proc.stdout)
+        proc.wait()
+        dirty = sorted(self.dirty)
+        self.dirty.clear()
+        return self.blame(new, dirty) if dirty else 0
+
+    def apply_patches(self, stream):
+        author = 0
+        entry = None      # [vecchio, nuovo, nuovo file, cancellato, ignora, pronto]
+        pending = 0       # righe di contenuto ancora da saltare nell'hunk corrente
+        for line in stream:
+            if pending:
+                if not line.startswith(b"\\"):
+                    pending -= 1
+                continue
+            if line.startswith(b"@@"):
+                m = HUNK_RE.match(line)
+                b = 1 if m.group(2) is None else int(m.group(2))
+                d = 1 if m.group(4) is None else int(m.group(4))
+                pending = b + d
+                if entry is None:
+                    continue
+                owners = self._prepare(entry)
+                if owners is None:
+                    continue
+                at = int(m.group(3)) - 1 if d else int(m.group(3))
+                if at + b > len(owners):
+                    self.mark_dirty(entry[1])
+                    continue
+                self._count(owners[at:at + b], -1)
+                owners[at:at + b] = array.array("I", [author]) * d
+                self.counts[author] += d
+            elif line.startswith(b"diff --git "):
+                self._finish(entry)
+                entry = [*diff_header_paths(line[11:].rstrip(b"\n")), False, False, False, False]
+            elif line.startswith(b"\0"):
+                self._finish(entry)
+                entry = None
+                author = self.author_id(line[1:].rstrip(b"\n").decode("utf-8", "surrogateescape"))
+                self.commits += 1
+            elif entry is None:
+                continue
+            elif line.startswith(b"rename from "):
+                entry[0] = os.fsdecode(unquote_path(line[12:].rstrip(b"\n")))
+            elif line.startswith(b"rename to "):
+                entry[1] = os.fsdecode(unquote_path(line[10:].rstrip(b"\n")))
+            elif line.startswith(b"new file mode "):
+                entry[2] = True
+                entry[4] = entry[4] or line.startswith(b"new file mode 160000")
+            elif line.startswith(b"deleted file mode "):
+                entry[3] = True
+                entry[4] = entry[4] or line.startswith(b"deleted file mode 160000")
+            elif line.startswith(b"index ") and line.rstrip(b"\n").endswith(b" 160000"):
+                entry[4] = True     # submodule: non è un file dell'albero
+            elif line.startswith(b"Binary files "):
+                for path in {entry[0], entry[1]} - {None}:
+                    self.mark_dirty(path)
+                entry[4] = True
+        self._finish(entry)
+
+    def _prepare(self, entry):
+        """Array del file su cui applicare gli hunk della voce (None = da ignorare), dopo
+        rename e creazione; eseguita una volta sola per voce."""
+        old, new, created, _, skip, ready = entry
+        if skip or new is None:
+            return None
+        if not ready:
+            entry[5] = True
+            if created:
+                if new not in self.dirty:
+                    self.drop(new)
+                    self.files[new] = array.array("I")
+            elif old != new:
+                owners = self.files.pop(old, None)
+                self.drop(new)
+                if owners is None or new in self.dirty:
+                    if owners is not None:
+                        self._count(owners, -1)
+                    self.mark_dirty(new)
+                else:
+                    self.files[new] = owners
+            elif new not in self.files:
+                self.mark_dirty(new)
+        return self.files.get(new)
+
+    def _finish(self, entry):
+        if entry is None:
+            return
+        if entry[0] is None and entry[1] is None:
+            return
+        if entry[3] and not entry[4]:
+            self.drop(entry[0])
+        else:
+            self._prepare(entry)
+
+    def snapshot(self, aliases):
+        lines = {}
+        for name, n in zip(self.names, self.counts):
+            if n:
+                name = aliases.get(name, name)
+                lines[name] = lines.get(name, 0) + n
+        return lines
+
+
+def ownership_series(start, end, period, aliases, jobs=1, slots_dir="", nslots=1):
+    """Blocco `ownership_series`: righe per autore (alias applicati) a ogni punto."""
+    points = series_refs(end, series_dates(start, end, period))
+    if not points:
+        print(f"Avviso: nessun commit trovato prima del {end}, serie dell'ownership non calcolata.",
+              file=sys.stderr)
+        return None
+    state = OwnershipSeries(jobs, slots_dir, nslots)
+    print(f"Serie ownership: {len(points)} punti ({period}), git blame completo al commit "
+          f"{points[0][1][:8]}, poi solo i diff fra un punto e il successivo...", file=sys.stderr)
+    state.blame(points[0][1])
+    initial = state.blamed
+    snapshots = []
+    previous = points[0][1]
+    for d, ref, ref_date in points:
+        if ref != previous:
+            state.advance(previous, ref)
+            previous = ref
+        snapshots.append((d, ref, ref_date, state.snapshot(aliases)))
+    print(f"Serie ownership: {initial} file blamati al primo punto, {state.commits} commit "
+          f"propagati, {state.blamed - initial} file ri-blamati.", file=sys.stderr)
+    final = snapshots[-1][3]
+    authors = sorted({a for s in snapshots for a in s[3]}, key=lambda a: (-final.get(a, 0), a))
+    return {
+        "period": period,
+        "authors": authors,
+        "points": [
+            {"date": d, "ref_commit": ref, "ref_date": ref_date,
+             "total_lines": sum(lines.values()),
+             "lines": [lines.get(a, 0) for a in authors]}
+            for d, ref, ref_date, lines in snapshots
+        ],
+    }
+
+
+def read_ownership_series(path):
+    """Blocco `ownership_series` scritto da ownership-series (None se assente o vuoto)."""
+    if not path:
+        return None
+    try:
+        with open(path, encoding="utf-8") as fh:
+            text = fh.read()
+    except OSError:
+        return None
+    return json.loads(text) if text.strip() else None
+
+
+def write_npy(path, columns):
+    """Scrive le colonne (liste di interi, stessa lunghezza) come matrice int64 .npy v1.0.
+
+    Una riga della matrice per colonna della tabella, così ogni colonna è contigua e si
+    scrive con un solo tofile. Niente NumPy: i collector richiedono solo python3. Scrittura
+    atomica (file temporaneo + rename), come le cache dei collector.
+    """
+    length = len(columns[0]) if columns else 0
+    header = "{'descr': '<i8', 'fortran_order': False, 'shape': (%d, %d), }" % (len(columns), length)
+    # Magic (6) + versione (2) + lunghezza header (2) + header + "\n" multiplo di 64
+    header += " " * ((64 - (10 + len(header) + 1) % 64) % 64) + "\n"
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as fh:
+        fh.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin-1"))
+        for col in columns:
+            values = array.array("q", col)
+            if sys.byteorder != "little":
+                values.byteswap()
+            values.tofile(fh)
+    os.replace(tmp, path)
+
+
+def _daily_table(columns, sidecar):
+    """Tabella giornaliera v3: inline nel JSON, oppure nel sidecar .npy se richiesto."""
+    if not sidecar:
+        return columns
+    names = list(columns)
+    write_npy(sidecar, [columns[n] for n in names])
+    return {
+        "sidecar": os.path.abspath(sidecar),
+        "columns": names,
+        "length": len(columns[names[0]]) if names else 0,
+    }
+
+
+def _day_offset(date_s, base):
+    return datetime.date.fromisoformat(date_s).toordinal() - base
+
+
+def columnar_single(payload, sidecar=""):
+    """Payload di git_stats_collector.sh -> formato colonnare v3.
+
+    `daily` e `punch` sono tabelle per colonna; la colonna `author` è l'indice in
+    `authors`, `day` l'offset in giorni da metadata.start_date. `directories`, `hotspots`,
+    `ownership` e `ownership_series` restano invariate (poche righe, nessun guadagno).
+    """
+    meta = dict(payload["metadata"], format=COLUMNAR_FORMAT)
+    base = datetime.date.fromisoformat(meta["start_date"]).toordinal()
+    authors = []
+    daily = {k: [] for k in ("author", "day", "commits", "added", "deleted", "files")}
+    punch = {k: [] for k in ("author", "weekday", "hour", "commits")}
+    for i, entry in enumerate(payload["data"]):
+        authors.append(entry["author"])
+        for d in entry["daily_data"]:
+            daily["author"].append(i)
+            daily["day"].append(_day_offset(d["date"], base))
+            daily["commits"].append(d["commits"])
+            daily["added"].append(d["added"])
+            daily["deleted"].append(d["deleted"])
+            daily["files"].append(d["files"])
+        for c in entry.get("punch_card", []):
+            punch["author"].append(i)
+            punch["weekday"].append(c["weekday"])
+            punch["hour"].append(c["hour"])
+            punch["commits"].append(c["commits"])
+    out = {
+        "metadata": meta,
+        "authors": authors,
+        "daily": _daily_table(daily, sidecar),
+        "punch": punch,
+    }
+    for key in ("directories", "hotspots"):
+        if key in payload:
+            out[key] = payload[key]
+    for key in ("ownership", "ownership_series"):
+        if key in payload:
+            out[key] = payload[key]
+    return out
+
+
+def columnar_multi(payload, sidecar=""):
+    """Payload di git_multiproject_stats_collector.sh -> formato colonnare v3.
+
+    `rows` ha una riga per (progetto, autore) con i totali di periodo; `daily` il
+    dettaglio giornaliero, la cui colonna `row` è l'indice della riga in `rows`.
+    `ownership` (per progetto, con --ownership) resta invariata.
+    """
+    meta = dict(payload["metadata"], format=COLUMNAR_FORMAT)
+    base = datetime.date.fromisoformat(meta["start_date"]).toordinal()
+    entries = payload["data"]
+    projects = sorted({e["project"] for e in entries})
+    authors = sorted({e["author"] for e in entries})
+    project_idx = {p: i for i, p in enumerate(projects)}
+    author_idx = {a: i for i, a in enumerate(authors)}
+    rows = {k: [] for k in ("project", "author", "commits", "added", "deleted", "files", "active_days")}
+    daily = {k: [] for k in ("row", "day", "commits", "added", "deleted", "files")}
+    for i, entry in enumerate(entries):
+        rows["project"].append(project_idx[entry["project"]])
+        rows["author"].append(author_idx[entry["author"]])
+        for k in ("commits", "added", "deleted", "files", "active_days"):
+            rows[k].append(entry[k])
+        for d in entry["daily_data"]:
+            daily["row"].append(i)
+            daily["day"].append(_day_offset(d["date"], base))
+            daily["commits"].append(d["commits"])
+            daily["added"].append(d["added"])
+            daily["deleted"].append(d["deleted"])
+            daily["files"].append(d["files"])
+    out = {
+        "metadata": meta,
+        "projects": projects,
+        "authors": authors,
+        "rows": rows,
+        "daily": _daily_table(daily, sidecar),
+    }
+    if "ownership" in payload:
+        out["ownership"] = payload["ownership"]
+    return out
+
+
+def dump_payload(payload, out, columnar=False):
+    """Serializza: indentato (formato classico) o compatto (v3, dove conta la dimensione)."""
+    if columnar:
+        json.dump(payload, out, ensure_ascii=False, separators=(",", ":"))
+    else:
+        json.dump(payload, out, ensure_ascii=False, indent=2)
+    out.write("\n")
+
+
+def filter_author(buckets, want, label):
+    """Filtro autore a match ESATTO, con gli stessi avvisi del collector (anche per le
+    chiavi per cartella, che hanno l'autore in prima posizione: label vuota = nessun avviso)."""
+    kept = {k: v for k, v in buckets.items() if k[0] == want}
+    if not kept and label:
+        print(f"Avviso: nessun dato per l'autore \"{label}\" (il match è esatto).", file=sys.stderr)
+        print("Autori disponibili nel periodo:", file=sys.stderr)
+        for author in sorted({k[0] for k in buckets}):
+            print(f"  - {author}", file=sys.stderr)
+    return kept
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=("json", "tsv", "ownership-series"))
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", required=True)
+    parser.add_argument("--project", default="")
+    parser.add_argument("--aliases", default="")
+    parser.add_argument("--author", default="")
+    parser.add_argument("--author-label", default="")
+    parser.add_argument("--ownership-tsv", default="")
+    parser.add_argument("--ownership-ref", default="")
+    parser.add_argument("--ownership-ref-date", default="")
+    parser.add_argument("--columnar", action="store_true")
+    parser.add_argument("--sidecar", default="")
+    parser.add_argument("--by-directory", type=int, default=0, metavar="DEPTH")
+    parser.add_argument("--directory-tsv", default="",
+                        help="tsv: file dove scrivere le righe per cartella")
+    parser.add_argument("--hotspots", type=int, default=0, metavar="K")
+    parser.add_argument("--hotspots-tsv", default="",
+                        help="tsv: file dove scrivere le tabelle hotspot")
+    parser.add_argument("--hotspots-author", default="",
+                        help="tsv: hotspot dei soli commit di questo autore (json usa --author)")
+    parser.add_argument("--approx-files", action="store_true",
+                        help="file distinti stimati con HyperLogLog (memoria limitata)")
+    parser.add_argument("--ownership-series-json", default="",
+                        help="json: blocco ownership_series prodotto da ownership-series")
+    parser.add_argument("--period", choices=OWNERSHIP_SERIES_PERIODS, default="month",
+                        help="ownership-series: un punto a fine mese o a fine settimana")
+    parser.add_argument("--jobs", type=int, default=1, help="ownership-series: git blame in parallelo")
+    parser.add_argument("--slots-dir", default="",
+                        help="ownership-series: cartella degli slot del tetto globale dei git blame")
+    parser.add_argument("--slots", type=int, default=1, help="ownership-series: numero di slot")
+    args = parser.parse_args(argv)
+
+    # ownership-series: legge la storia dal repository della cartella corrente, non da stdin
+    if args.mode == "ownership-series":
+        series = ownership_series(args.start, args.end, args.period, load_aliases_tsv(args.aliases),
+                                  max(1, args.jobs), args.slots_dir, max(1, args.slots))
+        if series is not None:
+            dump_payload(series, sys.stdout, True)
+        return 0
+
+    # surrogateescape: nomi autore/percorsi non UTF-8 attraversano il motore invariati,
+    # come i byte attraversano awk.
+    stdin = open(sys.stdin.fileno(), encoding="utf-8", errors="surrogateescape", closefd=False)
+    sys.stdout.reconfigure(errors="surrogateescape")
+
+    dir_buckets = {} if args.by_directory > 0 else None
+    hotspots = None
+    if args.hotspots > 0:
+        capacity = hotspot_capacity(args.hotspots)
+        hotspots = (HotspotCounter(capacity), HotspotCounter(capacity))
+    buckets = aggregate(iter_commits(stdin), args.start, args.end, load_aliases_tsv(args.aliases),
+                        args.by_directory, dir_buckets, hotspots,
+                        args.author if args.mode == "json" else args.hotspots_author,
+                        args.approx_files)
+    if args.author:
+        buckets = filter_author(buckets, args.author, args.author_label or args.author)
+        if dir_buckets is not None:
+            dir_buckets = filter_author(dir_buckets, args.author, "")
+
+    if args.mode == "tsv":
+        out = sys.stdout
+        for (author, day, hour), (commits, added, deleted, files) in sorted(buckets.items()):
+            out.write(f"{author}\t{day}\t{hour}\t{commits}\t{added}\t{deleted}\t{files}\n")
+        if dir_buckets is not None and args.directory_tsv:
+            with open(args.directory_tsv, "w", encoding="utf-8", errors="surrogateescape") as fh:
+                for (author, day, directory), (commits, added, deleted, files) in sorted(dir_buckets.items()):
+                    fh.write(f"{author}\t{day}\t{directory}\t{commits}\t{added}\t{deleted}\t{files}\n")
+        if hotspots is not None and args.hotspots_tsv:
+            with open(args.hotspots_tsv, "w", encoding="utf-8", errors="surrogateescape") as fh:
+                for counter, kind in zip(hotspots, ("churn", "touches")):
+                    for row in counter.rows(kind):
+                        fh.write("\t".join(map(str, row)) + "\n")
+        return 0
+
+    directories = None
+    if dir_buckets is not None:
+        directories = build_directories(((*k, *v) for k, v in dir_buckets.items()), args.by_directory)
+    hotspot_section = None
+    if hotspots is not None:
+        hotspot_section = build_hotspots(
+            (row for counter, kind in zip(hotspots, ("churn", "touches")) for row in counter.rows(kind)),
+            args.hotspots)
+    payload = build_payload(buckets, args.start, args.end, args.project,
+                            args.ownership_tsv, args.ownership_ref, args.ownership_ref_date,
+                            directories, hotspot_section,
+                            files_estimate_metadata() if args.approx_files else None,
+                            read_ownership_series(args.ownership_series_json), args.author)
+    columnar = args.columnar or bool(args.sidecar)
+    if columnar:
+        payload = columnar_single(payload, args.sidecar)
+    dump_payload(payload, sys.stdout, columnar)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
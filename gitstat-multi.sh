@@ -9,13 +9,18 @@
 #   di più repository contemporaneamente.
 #
 # UTILIZZO:
-#   gitstats-multi <DATA_INIZIO> <DATA_FINE> [percorso1] [percorso2] ...
+#   gitstats-multi [--preview] [--output <file.png>] <DATA_INIZIO> <DATA_FINE> [percorso1] [percorso2] ...
 #
 # PARAMETRI:
 #   DATA_INIZIO    Data inizio periodo (YYYY-MM-DD) - OBBLIGATORIO
 #   DATA_FINE      Data fine periodo (YYYY-MM-DD) - OBBLIGATORIO
 #   percorsoN      Percorsi ai repository Git (opzionali, default: corrente)
 #
+# OPZIONI:
+#   --preview      Salva prima un'anteprima a bassa risoluzione del grafico (passata a plot_multiproject.py)
+#   --output <file> Percorso del PNG invece del nome con le date (passata a plot_multiproject.py)
+#   Tutte le altre opzioni sono passate a git_multiproject_stats_collector.sh
+#
 # ESEMPI:
 #   # Analizza repository corrente
 #   gitstats-multi 2025-12-01 2025-12-31
@@ -35,6 +40,31 @@
 # DATA: Gennaio 2026
 # ===============================================
 
+# --preview e --output sono del plotter, tutto il resto va al collector
+PLOT_ARGS=()
+COLLECTOR_ARGS=()
+while [[ $# -gt 0 ]]; do
+    case $1 in
+        --preview)
+            PLOT_ARGS+=(--preview)
+            shift
+            ;;
+        --output)
+            if [[ -z "$2" || "$2" =~ ^- ]]; then
+                echo "Errore: --output richiede il percorso del file PNG." >&2
+                exit 1
+            fi
+            PLOT_ARGS+=(--output "$2")
+            shift 2
+            ;;
+        *)
+            COLLECTOR_ARGS+=("$1")
+            shift
+            ;;
+    esac
+done
+set -- "${COLLECTOR_ARGS[@]}"
+
 if [[ $# -lt 2 ]]; then
     echo "Uso: $0 <DATA_INIZIO> <DATA_FINE> [opzioni] [percorsi...]"
     echo "Esempio: $0 2025-12-01 2025-12-31"
@@ -55,4 +85,4 @@ if ! command -v plot_multiproject.py >/dev/null 2>&1; then
 fi
 
 # Esegui il comando
-git_multiproject_stats_collector.sh "$@" | plot_multiproject.py
+git_multiproject_stats_collector.sh "$@" | plot_multiproject.py "${PLOT_ARGS[@]}"
@@ -9,7 +9,8 @@
 #   di un singolo repository con dettaglio giornaliero.
 #
 # UTILIZZO:
-#   gitstats [--fetch] [--repo <path|url>] <DATA_INIZIO> <DATA_FINE> [autore]
+#   gitstats ingest [--db <file>] <DATA_INIZIO> <DATA_FINE> [opzioni multi-progetto] [percorsi...]
+#   gitstats [--fetch] [--fetch-ttl <m>] [--repo <path|url>] [--timings] [--prepare] [--approx-files] [--blame-jobs <n>] [--ownership-sample <n|p%>] [--ownership-series <month|week>] [--preview] [--output <file.png>] <DATA_INIZIO> <DATA_FINE> [autore]
 #
 # PARAMETRI:
 #   DATA_INIZIO    Data inizio periodo (YYYY-MM-DD) - OBBLIGATORIO
@@ -18,7 +19,22 @@
 #
 # OPZIONI:
 #   --fetch            Abilita l'aggiornamento del repository con git fetch (passata a git_stats_collector.sh)
+#   --fetch-ttl <m>    Come --fetch, ma salta il fetch se già eseguito negli ultimi <m> minuti
 #   --repo <path|url>  Analizza questo repository (path locale o URL) invece della cartella corrente
+#   --timings          Tempi per fase su stderr e come piè di pagina del grafico (passata a git_stats_collector.sh)
+#   --prepare          Commit-graph con filtri di Bloom prima dell'analisi (passata a git_stats_collector.sh)
+#   --approx-files     File distinti stimati a memoria limitata (passata a git_stats_collector.sh)
+#   --blame-jobs <n>   Tetto di git blame contemporanei sulla macchina (passata a git_stats_collector.sh)
+#   --ownership-sample <n|p%>  Ownership stimata da un campione di file, con barre d'errore (passata a git_stats_collector.sh)
+#   --ownership-series <month|week>  Pannello dell'ownership nel tempo (passata a git_stats_collector.sh)
+#   --preview          Salva prima un'anteprima a bassa risoluzione del grafico (passata a plot_git.py)
+#   --output <file>    Percorso del PNG invece di git_stats.png (passata a plot_git.py)
+#
+# INGEST:
+#   `gitstats ingest` non disegna nulla: raccoglie con git_multiproject_stats_collector.sh
+#   (stessi argomenti e opzioni di gitstats-multi; con le sole date, la cartella corrente) e carica le
+#   righe giornaliere nel database SQLite di git_activity_warehouse.py (--db, default
+#   activity.db nella cartella cache). I plotter lo rileggono con --from-db.
 #
 # ESEMPI:
 #   # Report per tutti gli autori
@@ -30,6 +46,10 @@
 #   # Repository remoto
 #   gitstats --repo https://github.com/org/repo.git 2025-12-01 2025-12-31
 #
+#   # Carica un trimestre di due repository nel database, poi grafico dal database
+#   gitstats ingest 2025-01-01 2025-03-31 ~/repo1 ~/repo2
+#   plot_multiproject.py --from-db ~/.cache/git-activity-reports/activity.db --start 2025-01-01 --end 2025-03-31
+#
 # REQUISITI:
 #   - git_stats_collector.sh e plot_git.py devono essere disponibili globalmente
 #   - Python3 con pandas e matplotlib installati
@@ -40,8 +60,55 @@
 # DATA: Gennaio 2026
 # ===============================================
 
+if [[ "$1" == "ingest" ]]; then
+    shift
+    DB_ARGS=()
+    INGEST_ARGS=()
+    while [[ $# -gt 0 ]]; do
+        case $1 in
+            --db)
+                if [[ -z "$2" || "$2" =~ ^- ]]; then
+                    echo "Errore: --db richiede il percorso del database." >&2
+                    exit 1
+                fi
+                DB_ARGS=(--db "$2")
+                shift 2
+                ;;
+            *)
+                INGEST_ARGS+=("$1")
+                shift
+                ;;
+        esac
+    done
+    if [[ ${#INGEST_ARGS[@]} -lt 2 ]]; then
+        echo "Uso: $0 ingest [--db <file>] <DATA_INIZIO> <DATA_FINE> [opzioni] [percorsi...]"
+        echo "Esempio: $0 ingest 2025-01-01 2025-03-31 ~/repo1 ~/repo2"
+        exit 1
+    fi
+    # Solo le date: il repository è la cartella corrente, come per gitstats
+    [[ ${#INGEST_ARGS[@]} -eq 2 ]] && INGEST_ARGS+=("$PWD")
+    for tool in git_multiproject_stats_collector.sh git_activity_warehouse.py; do
+        if ! command -v "$tool" >/dev/null 2>&1; then
+            echo "Errore: $tool non trovato globalmente"
+            exit 1
+        fi
+    done
+    # Un collector fallito non deve passare per un periodo senza attività
+    set -o pipefail
+    git_multiproject_stats_collector.sh "${INGEST_ARGS[@]}" | git_activity_warehouse.py ingest "${DB_ARGS[@]}"
+    exit $?
+fi
+
 FETCH_ARG=""
+FETCH_TTL_ARG=""
 REPO_ARG=""
+TIMINGS_ARG=""
+PREPARE_ARG=""
+APPROX_FILES_ARG=""
+BLAME_JOBS_ARG=""
+OWNERSHIP_SAMPLE_ARG=""
+OWNERSHIP_SERIES_ARG=""
+PLOT_ARGS=()
 TEMP_ARGS=()
 while [[ $# -gt 0 ]]; do
     case $1 in
@@ -49,6 +116,62 @@ while [[ $# -gt 0 ]]; do
             FETCH_ARG="--fetch"
             shift
             ;;
+        --fetch-ttl)
+            if [[ -z "$2" || "$2" =~ ^- ]]; then
+                echo "Errore: --fetch-ttl richiede un numero di minuti." >&2
+                exit 1
+            fi
+            FETCH_TTL_ARG="$2"
+            shift 2
+            ;;
+        --timings)
+            TIMINGS_ARG="--timings"
+            shift
+            ;;
+        --prepare)
+            PREPARE_ARG="--prepare"
+            shift
+            ;;
+        --approx-files)
+            APPROX_FILES_ARG="--approx-files"
+            shift
+            ;;
+        --blame-jobs)
+            if ! [[ "$2" =~ ^[1-9][0-9]*$ ]]; then
+                echo "Errore: --blame-jobs richiede un numero intero positivo." >&2
+                exit 1
+            fi
+            BLAME_JOBS_ARG="$2"
+            shift 2
+            ;;
+        --ownership-sample)
+            if ! [[ "$2" =~ ^[1-9][0-9]*%?$ ]]; then
+                echo "Errore: --ownership-sample richiede un numero di file o una percentuale (es. 2000 o 5%)." >&2
+                exit 1
+            fi
+            OWNERSHIP_SAMPLE_ARG="$2"
+            shift 2
+            ;;
+        --ownership-series)
+            if [[ "$2" != "month" && "$2" != "week" ]]; then
+                echo "Errore: --ownership-series accetta 'month' o 'week'." >&2
+                exit 1
+            fi
+            OWNERSHIP_SERIES_ARG="$2"
+            shift 2
+            ;;
+        --preview)
+            PLOT_ARGS+=(--preview)
+            shift
+            ;;
+        --output)
+            if [[ -z "$2" || "$2" =~ ^- ]]; then
+                echo "Errore: --output richiede il percorso del file PNG." >&2
+                exit 1
+            fi
+            PLOT_ARGS+=(--output "$2")
+            shift 2
+            ;;
         --repo)
             if [[ -z "$2" || "$2" =~ ^- ]]; then
                 echo "Errore: --repo richiede un argomento (path locale o URL)." >&2
@@ -66,7 +189,7 @@ done
 set -- "${TEMP_ARGS[@]}"
 
 if [[ $# -lt 2 ]]; then
-    echo "Uso: $0 [--fetch] [--repo <path|url>] <DATA_INIZIO> <DATA_FINE> [autore]"
+    echo "Uso: $0 [--fetch] [--repo <path|url>] [--preview] <DATA_INIZIO> <DATA_FINE> [autore]"
     echo "Esempio: $0 2025-12-01 2025-12-31"
     echo "Esempio con autore: $0 2025-12-01 2025-12-31 'Mario Rossi'"
     echo "Esempio con repository remoto: $0 --repo https://github.com/org/repo.git 2025-12-01 2025-12-31"
@@ -97,8 +220,15 @@ fi
 # Costruisce gli argomenti per git_stats_collector.sh
 COLLECTOR_ARGS=()
 [[ -n "$FETCH_ARG" ]] && COLLECTOR_ARGS+=("$FETCH_ARG")
+[[ -n "$FETCH_TTL_ARG" ]] && COLLECTOR_ARGS+=(--fetch-ttl "$FETCH_TTL_ARG")
 [[ -n "$REPO_ARG" ]] && COLLECTOR_ARGS+=(--repo "$REPO_ARG")
+[[ -n "$TIMINGS_ARG" ]] && COLLECTOR_ARGS+=("$TIMINGS_ARG")
+[[ -n "$PREPARE_ARG" ]] && COLLECTOR_ARGS+=("$PREPARE_ARG")
+[[ -n "$APPROX_FILES_ARG" ]] && COLLECTOR_ARGS+=("$APPROX_FILES_ARG")
+[[ -n "$BLAME_JOBS_ARG" ]] && COLLECTOR_ARGS+=(--blame-jobs "$BLAME_JOBS_ARG")
+[[ -n "$OWNERSHIP_SAMPLE_ARG" ]] && COLLECTOR_ARGS+=(--ownership-sample "$OWNERSHIP_SAMPLE_ARG")
+[[ -n "$OWNERSHIP_SERIES_ARG" ]] && COLLECTOR_ARGS+=(--ownership-series "$OWNERSHIP_SERIES_ARG")
 COLLECTOR_ARGS+=("$START_DATE" "$END_DATE" json)
 [[ -n "$AUTHOR_FILTER" ]] && COLLECTOR_ARGS+=("$AUTHOR_FILTER")
 
-git_stats_collector.sh "${COLLECTOR_ARGS[@]}" | plot_git.py
+git_stats_collector.sh "${COLLECTOR_ARGS[@]}" | plot_git.py "${PLOT_ARGS[@]}"
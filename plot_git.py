@@ -59,22 +59,56 @@ Nessuna esclusione di file generati/vendorizzati (stessa scelta fatta per il chu
 git_stats_collector.sh). Presente solo se il JSON in input contiene la chiave
 `ownership` (assente nei JSON prodotti con --no-ownership o da versioni precedenti dello
 script; in quel caso il pannello viene saltato, non lasciato vuoto).
+
+Con `git_stats_collector.sh --ownership-series month|week` (chiave `ownership_series`) una
+riga in più mostra la stessa grandezza NEL TEMPO: area impilata delle righe possedute per
+autore a fine di ogni mese o settimana. Presente solo con almeno due punti.
+
+CARTELLE (pannello opzionale)
+----------------------------------------
+Con un JSON prodotto da `git_stats_collector.sh --by-directory <profondità>` (sezione
+`directories`) una riga di piccoli multipli mostra il churn nel tempo delle cartelle più
+attive, una mini-serie per cartella, sugli stessi intervalli dei pannelli per autore e con
+la STESSA scala verticale per tutte: il confronto fra cartelle si legge dall'altezza delle
+barre. Un solo colore neutro, diverso dal grigio di "Altro" — le tinte della palette
+identificano gli autori. Le cartelle oltre le prime MAX_DIRECTORY_PANELS sono riassunte
+nella didascalia.
+
+HOTSPOT (pannello opzionale)
+----------------------------------------
+Con `git_stats_collector.sh --hotspots <k>` (sezione `hotspots`) una riga con due classifiche
+di file: i più modificati (righe aggiunte + rimosse) e i più toccati (numero di commit) nel
+periodo. I conteggi vengono da un top-K in streaming: se un valore non è esatto, accanto
+compare l'errore massimo (±).
 """
 
+import argparse
 import json
+import math
 import os
 import subprocess
 import sys
 from datetime import date, timedelta
 
-import matplotlib
+# Librerie pesanti importate solo quando servono (import_numeric / import_plotting): un
+# input vuoto o non valido fallisce subito, e --summary-json/--summary-text non
+# importano mai matplotlib, che da solo è la parte più lenta dell'avvio.
+np = pd = matplotlib = plt = None
+
+
+def import_numeric():
+    global np, pd
+    import numpy as np
+    import pandas as pd
 
-matplotlib.use("Agg")
-import matplotlib.colors
-import matplotlib.ticker
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
+
+def import_plotting():
+    global matplotlib, plt
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.colors
+    import matplotlib.ticker
+    import matplotlib.pyplot as plt
 
 # -----------------------------------------------------------------------------
 # Parametri delle metriche (mantenere allineati con plot_multiproject.py)
@@ -108,7 +142,15 @@ INK_MUTED = "#898781"
 GRIDLINE = "#e1e0d9"
 BASELINE = "#c3c2b7"
 
+MAX_DIRECTORY_PANELS = 8  # piccoli multipli del pannello per cartella (--by-directory)
+
 OUTPUT_FILENAME = "git_stats.png"
+OUTPUT_DPI = 200
+PREVIEW_DPI = 50          # --preview: leggibile a schermo, pronta in una frazione del tempo
+THUMB_WIDTH = 480         # larghezza massima (px) della miniatura (--formats thumb)
+OUTPUT_FORMATS = ("png", "svg", "thumb")
+# Versione del formato colonnare prodotto con --columnar/--sidecar (vedi git_stats_engine.py)
+COLUMNAR_FORMAT = 3
 
 
 # -----------------------------------------------------------------------------
@@ -167,11 +209,15 @@ def churn_of(added, deleted):
 
 
 def daily_index(added, deleted, files):
-    """Indice composito di un singolo giorno (additivo, cap per giorno)."""
-    if files <= 0:
-        return 0.0
-    churn = min(churn_of(added, deleted), DAILY_CHURN_CAP)
-    return W_CHURN * np.log1p(churn) + W_FILES * np.log1p(files)
+    """Indice composito per giorno (additivo, cap per giorno).
+
+    Vettoriale: accetta scalari o array NumPy (un elemento per giorno) e restituisce
+    un valore per elemento — 0 per i giorni senza file toccati.
+    """
+    files = np.asarray(files, dtype=float)
+    churn = np.minimum(churn_of(np.asarray(added), np.asarray(deleted)), DAILY_CHURN_CAP)
+    index = W_CHURN * np.log1p(churn) + W_FILES * np.log1p(np.maximum(files, 0))
+    return np.where(files > 0, index, 0.0)
 
 
 # -----------------------------------------------------------------------------
@@ -196,8 +242,51 @@ def read_payload():
         sys.exit(1)
 
 
+def read_payload_from_db(args):
+    """Payload dal database (--from-db) nel formato di git_stats_collector.sh: i progetti
+    selezionati sono sommati per autore e giorno; punch card, ownership, cartelle e
+    hotspot non sono archiviati e i loro pannelli vengono saltati."""
+    sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+    try:
+        import git_activity_warehouse as warehouse
+    except ImportError:
+        print(f"Errore: --from-db richiede git_activity_warehouse.py accanto a {sys.argv[0]}.")
+        sys.exit(1)
+    try:
+        payload = warehouse.load_payload(args.from_db, args.start, args.end, args.project,
+                                         single=True)
+    except (FileNotFoundError, LookupError, warehouse.sqlite3.Error) as exc:
+        print(f"Errore: {exc}.")
+        sys.exit(1)
+    return payload
+
+
+def is_columnar(payload):
+    """Vero per il formato colonnare v3 (git_stats_collector.sh --columnar/--sidecar)."""
+    return (isinstance(payload, dict)
+            and (payload.get("metadata") or {}).get("format") == COLUMNAR_FORMAT)
+
+
+def daily_columns(table):
+    """Colonne della tabella giornaliera v3, come array NumPy.
+
+    Inline nel JSON, oppure nel sidecar .npy indicato dal JSON: in quel caso il file è
+    aperto in memory-map, senza copiarlo in memoria né passarlo dal parser JSON.
+    """
+    if "sidecar" in table:
+        try:
+            matrix = np.load(table["sidecar"], mmap_mode="r")
+        except (OSError, ValueError) as exc:
+            print(f"Errore: sidecar {table['sidecar']} non leggibile ({exc}).")
+            sys.exit(1)
+        return {name: matrix[i] for i, name in enumerate(table["columns"])}
+    return {name: np.asarray(values, dtype=np.int64) for name, values in table.items()}
+
+
 def flatten(payload, aliases):
     """Restituisce (DataFrame per-giorno-per-autore, metadata)."""
+    if is_columnar(payload):
+        return flatten_frame(*columnar_columns(payload))
     if isinstance(payload, dict) and "data" in payload:
         entries = payload["data"]
         meta = payload.get("metadata", {}) or {}
@@ -210,7 +299,11 @@ def flatten(payload, aliases):
         print("Errore: formato JSON non riconosciuto.")
         sys.exit(1)
 
-    rows = []
+    # Colonne, non una riga-dict per giorno: i valori si raccolgono in liste piatte e
+    # churn, indice e date si calcolano poi in un'unica operazione vettoriale. Su report
+    # di anni con centinaia di autori (centinaia di migliaia di giorni-autore) le chiamate
+    # Python per riga dominavano il tempo prima ancora di disegnare.
+    authors, dates, commits, added, deleted, files = [], [], [], [], [], []
     # Punch card (giorno della settimana × ora): aggregata su TUTTI gli autori del report,
     # non serve per-autore, quindi si accumula qui indipendentemente da fold_tail/alias.
     # Assente nel formato legacy (JSON senza metadata) e in JSON prodotti da versioni
@@ -226,29 +319,74 @@ def flatten(payload, aliases):
             wd, hr, c = cell.get("weekday"), cell.get("hour"), cell.get("commits", 0)
             if wd is not None and hr is not None and 0 <= wd < 7 and 0 <= hr < 24:
                 punch[wd, hr] += int(c or 0)
-        for day in entry.get("daily_data", []) or []:
-            added = int(day.get("added", 0) or 0)
-            deleted = int(day.get("deleted", 0) or 0)
-            files = int(day.get("files", 0) or 0)
-            commits = int(day.get("commits", 0) or 0)
-            if commits == 0 and added == 0 and deleted == 0:
-                continue         # giorno vuoto: lo ricostruiamo dal range
-            rows.append({
-                "date": pd.to_datetime(day["date"]),
-                "author": author,
-                "commits": commits,
-                "added": added,
-                "deleted": deleted,
-                "files": files,
-                "churn": churn_of(added, deleted),
-                "index": daily_index(added, deleted, files),
-            })
-
-    if not rows:
+        days = entry.get("daily_data", []) or []
+        authors.extend([author] * len(days))
+        dates.extend([day["date"] for day in days])
+        commits.extend([int(day.get("commits", 0) or 0) for day in days])
+        added.extend([int(day.get("added", 0) or 0) for day in days])
+        deleted.extend([int(day.get("deleted", 0) or 0) for day in days])
+        files.extend([int(day.get("files", 0) or 0) for day in days])
+
+    columns = {
+        "author": np.asarray(authors, dtype=object),
+        "date": np.asarray(dates, dtype=object),
+        "commits": np.asarray(commits, dtype=np.int64),
+        "added": np.asarray(added, dtype=np.int64),
+        "deleted": np.asarray(deleted, dtype=np.int64),
+        "files": np.asarray(files, dtype=np.int64),
+    }
+    return flatten_frame(columns, meta, punch)
+
+
+def columnar_columns(payload):
+    """Formato v3 -> (colonne, metadata, punch): già per colonna, nessun ciclo per riga.
+
+    Gli autori sono indici nel dizionario `authors`, le date offset in giorni da
+    metadata.start_date; gli alias sono già applicati dal collector.
+    """
+    meta = dict(payload["metadata"])
+    daily = daily_columns(payload["daily"])
+    names = np.asarray(payload["authors"], dtype=object)
+    start = np.datetime64(meta["start_date"], "D")
+    columns = {
+        "author": names[np.asarray(daily["author"], dtype=np.int64)],
+        "date": start + np.asarray(daily["day"], dtype=np.int64).astype("timedelta64[D]"),
+        "commits": np.asarray(daily["commits"], dtype=np.int64),
+        "added": np.asarray(daily["added"], dtype=np.int64),
+        "deleted": np.asarray(daily["deleted"], dtype=np.int64),
+        "files": np.asarray(daily["files"], dtype=np.int64),
+    }
+    punch = np.zeros((7, 24), dtype=int)
+    cells = payload.get("punch") or {}
+    if cells.get("weekday"):
+        wd = np.asarray(cells["weekday"], dtype=np.int64)
+        hr = np.asarray(cells["hour"], dtype=np.int64)
+        c = np.asarray(cells["commits"], dtype=np.int64)
+        ok = (wd >= 0) & (wd < 7) & (hr >= 0) & (hr < 24)
+        np.add.at(punch, (wd[ok], hr[ok]), c[ok])
+    return columns, meta, punch
+
+
+def flatten_frame(columns, meta, punch):
+    """DataFrame per-giorno-per-autore dalle colonne grezze (comune a tutti i formati)."""
+    commits, added, deleted, files = (columns[k] for k in ("commits", "added", "deleted", "files"))
+    # Giorni vuoti esclusi: li ricostruisce il range in main()
+    keep = (commits != 0) | (added != 0) | (deleted != 0)
+    if not keep.any():
         print("Nessun dato di attività trovato nel periodo: niente da rappresentare.")
         sys.exit(0)
 
-    df = pd.DataFrame(rows)
+    added, deleted, files = added[keep], deleted[keep], files[keep]
+    df = pd.DataFrame({
+        "date": pd.to_datetime(columns["date"][keep]).astype("datetime64[ns]"),
+        "author": columns["author"][keep],
+        "commits": commits[keep],
+        "added": added,
+        "deleted": deleted,
+        "files": files,
+        "churn": churn_of(added, deleted),
+        "index": daily_index(added, deleted, files),
+    })
     if not meta.get("start_date"):
         meta["start_date"] = df["date"].min().strftime("%Y-%m-%d")
     if not meta.get("end_date"):
@@ -533,11 +671,20 @@ def panel_ownership(ax, ownership, colors):
     scritto codice ancora presente, nessuno lo ha più toccato) — stesso trattamento
     cromatico di ogni pannello: chi non è tra i primi 8 per attività nel periodo si
     accorpa in "Altro", mai una tinta nuova generata solo per l'ownership.
+
+    Con una stima da campione (`estimate`, --ownership-sample) ogni autore ha la barra
+    d'errore del suo intervallo al 95% (`pct_ci`); "Altro" no: la somma di più stime non ha
+    l'intervallo della somma degli intervalli.
     """
+    estimated = "estimate" in ownership
+    reported_total = ownership.get("total_lines", 0)
     folded = {}
+    ci = {}
     for entry in ownership.get("by_author", []):
         name = entry["author"] if entry["author"] in colors else OTHER_LABEL
         folded[name] = folded.get(name, 0) + entry.get("lines", 0)
+        if estimated and name != OTHER_LABEL and "pct_ci" in entry:
+            ci[name] = entry["pct_ci"]
 
     names = sorted(folded, key=lambda n: folded[n])   # ascendente: barh mette il max in alto
     values = [folded[n] for n in names]
@@ -548,10 +695,17 @@ def panel_ownership(ax, ownership, colors):
         y, values, height=0.6, color=[colors[n] for n in names],
         edgecolor=SURFACE, linewidth=0.6,
     )
+    if ci:
+        ys = [yi for yi, n in zip(y, names) if n in ci]
+        xs = [folded[n] for n in names if n in ci]
+        xerr = [[max(folded[n] - ci[n][0] / 100 * reported_total, 0) for n in names if n in ci],
+                [max(ci[n][1] / 100 * reported_total - folded[n], 0) for n in names if n in ci]]
+        ax.errorbar(xs, ys, xerr=xerr, fmt="none", ecolor=INK_SECONDARY, elinewidth=1, capsize=3)
     ax.set_yticks(y)
     ax.set_yticklabels(names, fontsize=9, color=INK_SECONDARY)
-    ax.set_title("Righe possedute per autore (fotografia a fine periodo)", fontsize=12,
-                 color=INK_PRIMARY, loc="left", pad=10)
+    title = ("Righe possedute per autore (stima da campione, fotografia a fine periodo)"
+             if estimated else "Righe possedute per autore (fotografia a fine periodo)")
+    ax.set_title(title, fontsize=12, color=INK_PRIMARY, loc="left", pad=10)
     ax.set_xlabel("Righe (git blame)", fontsize=9)
     ax.set_axisbelow(True)
     ax.grid(axis="x", color=GRIDLINE, linewidth=0.8, linestyle="-")
@@ -561,9 +715,13 @@ def panel_ownership(ax, ownership, colors):
     ax.spines["bottom"].set_linewidth(0.8)
     ax.tick_params(length=0, labelsize=9)
     thousands(ax, axis="x")
-    for yi, v in zip(y, values):
+    for yi, n, v in zip(y, names, values):
         pct = v / total * 100
         label = f" {int(v):,}".replace(",", ".") + f" ({pct:.0f}%)"
+        if n in ci:
+            # L'etichetta parte dopo la barra d'errore, non sopra
+            label = f"{label[:-1]} ±{(ci[n][1] - ci[n][0]) / 2:.1f})"
+            v = max(v, ci[n][1] / 100 * reported_total)
         ax.text(v, yi, label, va="center", ha="left", fontsize=9, color=INK_SECONDARY)
 
 
@@ -576,21 +734,322 @@ def ownership_caption(ownership):
     ref_date = ownership.get("ref_date") or "?"
     total = int(ownership.get("total_lines", 0))
     total_s = f"{total:,}".replace(",", ".")
+    estimate = ownership.get("estimate")
+    if estimate:
+        return (f"Stima al commit {ref} del {ref_date} · ~{total_s} righe totali, da git blame "
+                f"su {estimate['sampled_files']} file di {estimate['population_files']} "
+                f"({estimate['strata']} strati per dimensione) · barre: intervallo al "
+                f"{estimate.get('confidence', 0.95) * 100:.0f}% · non è una somma sul periodo")
     return (f"Istantanea al commit {ref} del {ref_date} · {total_s} righe totali "
             f"(git blame, nessuna esclusione) · non è una somma sul periodo: può "
             f"includere autori non attivi in questo report")
 
 
+def panel_ownership_series(ax, series, colors):
+    """Righe possedute per autore a ogni punto della serie (area impilata). Stessi colori e
+    stessa coda "Altro" della fotografia; un'area e non barre, perché ogni punto è lo stato
+    dell'albero in quell'istante, non una somma sull'intervallo."""
+    points = series["points"]
+    folded = {}
+    for i, author in enumerate(series.get("authors", [])):
+        name = author if author in colors else OTHER_LABEL
+        row = folded.setdefault(name, np.zeros(len(points)))
+        row += [p["lines"][i] for p in points]
+    names = [n for n in colors if n in folded]
+    x = np.arange(len(points))
+    ax.stackplot(x, [folded[n] for n in names], colors=[colors[n] for n in names],
+                 edgecolor=SURFACE, linewidth=0.6)
+    period = "mese" if series.get("period") == "month" else "settimana"
+    ax.set_title(f"Righe possedute per autore nel tempo (git blame a fine {period})",
+                 fontsize=12, color=INK_PRIMARY, loc="left", pad=10)
+    ax.set_ylabel("Righe (git blame)", fontsize=9)
+    ax.set_xlim(0, len(points) - 1)
+    style_axes(ax)
+    # Larga quanto la figura: etichette orizzontali, che non invadono la didascalia sotto
+    thin_ticks(ax, [p["date"] for p in points], max_labels=12)
+    plt.setp(ax.get_xticklabels(), rotation=0, ha="center")
+    thousands(ax)
+
+
+def ownership_series_caption(series):
+    """Come ownership_caption: ogni punto è un'istantanea al commit indicato."""
+    first, last = series["points"][0], series["points"][-1]
+    total = f"{int(last.get('total_lines', 0)):,}".replace(",", ".")
+    return (f"{len(series['points'])} istantanee dal {first['date']} al {last['date']} · "
+            f"ultima al commit {(last.get('ref_commit') or '')[:8]} ({total} righe) · "
+            f"ogni punto è lo stato dell'albero a quella data, non una somma sull'intervallo")
+
+
+def directory_churn(directories, buckets, freq):
+    """Churn per intervallo di ogni cartella (sezione `directories`), sugli stessi intervalli
+    dei pannelli per autore; colonne per churn totale decrescente. None se non ci sono dati."""
+    rows = [(entry["directory"], day["date"], churn_of(day.get("added", 0), day.get("deleted", 0)))
+            for entry in directories.get("by_directory", [])
+            for day in entry.get("daily_data", [])]
+    if not rows:
+        return None
+    df = pd.DataFrame(rows, columns=["directory", "date", "churn"])
+    df["date"] = pd.to_datetime(df["date"])
+    grid = (df.groupby([pd.Grouper(key="date", freq=freq), "directory"])["churn"].sum()
+              .unstack("directory").reindex(buckets).fillna(0))
+    return grid[grid.sum().sort_values(ascending=False, kind="stable").index]
+
+
+def panel_directories(fig, spec, grid, labels, depth):
+    """Piccoli multipli: churn nel tempo delle prime MAX_DIRECTORY_PANELS cartelle, stessa
+    scala y per tutte (sharey), etichette solo agli estremi dell'asse x. Restituisce il
+    primo asse (per la didascalia)."""
+    shown = list(grid.columns[:MAX_DIRECTORY_PANELS])
+    sub = spec.subgridspec(1, len(shown), wspace=0.08)
+    x = np.arange(len(grid.index))
+    width = bar_width(len(grid.index), plot_px=1500 / len(shown))
+    first = None
+    for i, name in enumerate(shown):
+        ax = fig.add_subplot(sub[0, i], sharey=first)
+        ax.bar(x, grid[name].to_numpy(dtype=float), width=width, color=BASELINE,
+               edgecolor=SURFACE, linewidth=0.4)
+        total = f"{int(round(grid[name].sum())):,}".replace(",", ".")
+        ax.set_title(f"{name}\n{total}", fontsize=9, color=INK_SECONDARY, loc="left", pad=4)
+        style_axes(ax)
+        ax.set_xticks([0, len(x) - 1] if len(x) > 1 else [0])
+        ax.set_xticklabels([labels[0], labels[-1]] if len(x) > 1 else labels[:1], fontsize=7)
+        # Estremi allineati verso l'interno: le etichette di pannelli vicini non si toccano
+        for label, align in zip(ax.get_xticklabels(), ("left", "right")):
+            label.set_horizontalalignment(align)
+        if first is None:
+            first = ax
+            ax.set_ylabel("Churn", fontsize=9)
+            thousands(ax)
+        else:
+            ax.tick_params(labelleft=False)
+    first.text(0, 1.22, f"Churn per cartella (profondità {depth}), stessa scala",
+               transform=first.transAxes, fontsize=12, color=INK_PRIMARY, va="bottom")
+    return first
+
+
+def directories_caption(grid):
+    """Didascalia: quante cartelle sono mostrate e, se non tutte, quanto pesa il resto."""
+    total = float(grid.to_numpy().sum()) or 1.0
+    n = len(grid.columns)
+    shown = min(n, MAX_DIRECTORY_PANELS)
+    if n <= shown:
+        return f"{n} cartelle · churn = aggiunte + {DELETED_WEIGHT} × rimosse, per cartella del file"
+    rest = float(grid[grid.columns[shown:]].to_numpy().sum())
+    return (f"Prime {shown} di {n} cartelle per churn · le altre {n - shown} valgono il "
+            f"{rest / total * 100:.0f}% del churn")
+
+
+def short_path(path, width=48):
+    """Percorso accorciato da sinistra: la parte finale (cartella vicina e nome) è quella che
+    identifica il file."""
+    return path if len(path) <= width else "…" + path[-(width - 1):]
+
+
+def panel_hotspots(ax, entries, field, title, xlabel):
+    """Classifica dei file (sezione `hotspots`): barre orizzontali neutre, la prima in alto,
+    valore ed eventuale errore massimo (±) in etichetta."""
+    entries = list(reversed(entries))   # barh mette l'ultimo in alto
+    y = np.arange(len(entries))
+    values = [e[field] for e in entries]
+    ax.barh(y, values, height=0.6, color=BASELINE, edgecolor=SURFACE, linewidth=0.6)
+    ax.set_yticks(y)
+    ax.set_yticklabels([short_path(e["path"]) for e in entries], fontsize=8, color=INK_SECONDARY)
+    ax.set_title(title, fontsize=12, color=INK_PRIMARY, loc="left", pad=10)
+    ax.set_xlabel(xlabel, fontsize=9)
+    ax.set_axisbelow(True)
+    ax.grid(axis="x", color=GRIDLINE, linewidth=0.8, linestyle="-")
+    for side in ("top", "right", "left"):
+        ax.spines[side].set_visible(False)
+    ax.spines["bottom"].set_color(BASELINE)
+    ax.spines["bottom"].set_linewidth(0.8)
+    ax.tick_params(length=0, labelsize=8)
+    thousands(ax, axis="x")
+    for yi, e in zip(y, entries):
+        label = f" {int(e[field]):,}".replace(",", ".")
+        if e.get("error"):
+            label += f" (±{int(e['error']):,})".replace(",", ".")
+        ax.text(e[field], yi, label, va="center", ha="left", fontsize=8, color=INK_SECONDARY)
+
+
+def timings_caption(timings):
+    """Piè di pagina con i tempi di raccolta (JSON prodotto con --timings dal collector).
+    Le fasi per repository (multi-progetto) sono sommate per nome: girano in parallelo,
+    quindi la somma può superare il totale."""
+    parts, sums, counts = [], {}, {}
+    for stage in timings.get("stages", []):
+        name = stage.get("stage", "?")
+        if name not in sums:
+            parts.append(name)
+        sums[name] = sums.get(name, 0.0) + float(stage.get("wall_s") or 0)
+        counts[name] = counts.get(name, 0) + (1 if stage.get("project") else 0)
+    labels = [f"{name} {sums[name]:.2f}s" + (f" ({counts[name]} repo)" if counts[name] else "")
+              for name in parts]
+    total = timings.get("total_s")
+    if total is not None:
+        labels.append(f"totale {float(total):.2f}s")
+    return "Tempi di raccolta (--timings): " + " · ".join(labels)
+
+
 # -----------------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+# Riepilogo senza grafico (--summary-json / --summary-text)
+# -----------------------------------------------------------------------------
+SUMMARY_COLUMNS = ("churn", "commit", "giorni_attivi", "file", "indice")
+
+
+def author_summary(df):
+    """Tabella riepilogo per autore (le colonne di SUMMARY_COLUMNS), per churn decrescente."""
+    return pd.DataFrame({
+        "churn": df.groupby("author")["churn"].sum(),
+        "commit": df.groupby("author")["commits"].sum(),
+        "giorni_attivi": df[df["commits"] > 0].groupby("author")["date"].nunique(),
+        "file": df.groupby("author")["files"].sum(),
+        "indice": df.groupby("author")["index"].sum(),
+    }).fillna(0).sort_values("churn", ascending=False)
+
+
+def summary_records(summary):
+    """Righe del riepilogo come dict di tipi nativi (churn ha al più un decimale: 0.4 × intero)."""
+    return [{
+        "author": author,
+        "churn": round(float(r["churn"]), 1),
+        "commit": int(r["commit"]),
+        "giorni_attivi": int(r["giorni_attivi"]),
+        "file": int(r["file"]),
+        "indice": round(float(r["indice"]), 3),
+    } for author, r in summary.iterrows()]
+
+
+def print_summary(records, meta, as_json):
+    if as_json:
+        json.dump({"metadata": {k: meta[k] for k in ("start_date", "end_date", "project") if meta.get(k)},
+                   "authors": records}, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+    width = max([len("Autore")] + [len(r["author"]) for r in records])
+    print(f"Riepilogo {meta['start_date']} → {meta['end_date']}")
+    print(f"{'Autore':<{width}}  {'Churn':>10}  {'Commit':>7}  {'Giorni att.':>11}  {'File':>7}  {'Indice':>8}")
+    for r in records:
+        print(f"{r['author']:<{width}}  {r['churn']:>10.1f}  {r['commit']:>7}  "
+              f"{r['giorni_attivi']:>11}  {r['file']:>7}  {r['indice']:>8.1f}")
+
+
+# -----------------------------------------------------------------------------
+# Output: anteprima veloce e più formati da un'unica impaginazione
+# -----------------------------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Legge il JSON del collector da stdin e genera il report grafico.")
+    parser.add_argument(
+        "--preview", action="store_true",
+        help=f"scrive prima un'anteprima a bassa risoluzione ({PREVIEW_DPI} dpi) e ne stampa "
+             "il percorso, poi i file definitivi")
+    parser.add_argument(
+        "--formats", default="png",
+        help="formati da scrivere, separati da virgola: png, svg, thumb (default: png)")
+    parser.add_argument(
+        "--output", default=None,
+        help="percorso del PNG; gli altri formati ne prendono il nome "
+             "(default: git_stats.png nella cartella corrente)")
+    source = parser.add_argument_group(
+        "lettura dal database", "invece di stdin, legge le righe giornaliere caricate con "
+        "git_activity_warehouse.py ingest (gitstats ingest)")
+    source.add_argument("--from-db", metavar="PATH", help="database SQLite dell'attività")
+    source.add_argument("--start", help="inizio periodo (YYYY-MM-DD), con --from-db")
+    source.add_argument("--end", help="fine periodo (YYYY-MM-DD), con --from-db")
+    source.add_argument("--project", action="append",
+                        help="limita al progetto (ripetibile; default: tutti, sommati per autore)")
+    summary = parser.add_mutually_exclusive_group()
+    summary.add_argument(
+        "--summary-json", action="store_true",
+        help="stampa solo il riepilogo per autore in JSON, senza grafico (non importa matplotlib)")
+    summary.add_argument(
+        "--summary-text", action="store_true",
+        help="stampa solo il riepilogo per autore come tabella di testo, senza grafico")
+    args = parser.parse_args()
+    args.formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in args.formats if f not in OUTPUT_FORMATS]
+    if unknown or not args.formats:
+        parser.error(f"--formats: valori ammessi {', '.join(OUTPUT_FORMATS)}")
+    if args.from_db:
+        for name in ("start", "end"):
+            try:
+                date.fromisoformat(getattr(args, name) or "")
+            except ValueError:
+                parser.error(f"--from-db richiede --{name} in formato YYYY-MM-DD")
+    elif args.start or args.end or args.project:
+        parser.error("--start, --end e --project valgono solo con --from-db")
+    return args
+
+
+def save_thumbnail(fig, path):
+    """Miniatura ricavata dai pixel del PNG appena renderizzato (media per blocchi), senza
+    ridisegnare la figura; se quel buffer non è disponibile, render diretto a bassa dpi."""
+    width_px = round(fig.get_figwidth() * OUTPUT_DPI)
+    height_px = round(fig.get_figheight() * OUTPUT_DPI)
+    step = max(1, math.ceil(width_px / THUMB_WIDTH))
+    try:
+        rgba = np.asarray(fig.canvas.buffer_rgba())
+    except AttributeError:
+        rgba = None
+    if rgba is None or rgba.shape[:2] != (height_px, width_px):
+        fig.savefig(path, dpi=OUTPUT_DPI / step)
+        return
+    h, w = (height_px // step) * step, (width_px // step) * step
+    blocks = rgba[:h, :w].reshape(h // step, step, w // step, step, 4)
+    plt.imsave(path, blocks.mean(axis=(1, 3)).round().astype(np.uint8))
+
+
+def save_outputs(fig, png_path, formats, preview):
+    """Scrive tutti i formati richiesti dalla STESSA figura, già impaginata una volta sola.
+
+    L'anteprima (--preview) viene per prima e il suo percorso è stampato subito (flush):
+    chi legge stdout, come l'estensione VS Code, può mostrarla mentre il resto è ancora in
+    scrittura. PNG e SVG sono due render inevitabili (raster e vettoriale); la miniatura
+    riusa i pixel del PNG. Restituisce i percorsi scritti, nell'ordine.
+    """
+    stem = os.path.splitext(png_path)[0]
+    written = []
+    if preview:
+        path = f"{stem}_preview.png"
+        fig.savefig(path, dpi=PREVIEW_DPI)
+        print(f"Anteprima generata: {path}", flush=True)
+        written.append(path)
+    if "png" in formats:
+        fig.savefig(png_path, dpi=OUTPUT_DPI)
+        written.append(png_path)
+    # Subito dopo il PNG: la miniatura ne legge il buffer di pixel ancora in memoria
+    if "thumb" in formats:
+        path = f"{stem}_thumb.png"
+        save_thumbnail(fig, path)
+        print(f"Generato anche: {path}")
+        written.append(path)
+    if "svg" in formats:
+        path = f"{stem}.svg"
+        fig.savefig(path)
+        print(f"Generato anche: {path}")
+        written.append(path)
+    return written
+
+
 def main():
-    payload = read_payload()
+    args = parse_args()
+    payload = read_payload_from_db(args) if args.from_db else read_payload()
+    import_numeric()
     aliases = load_aliases()
-    if aliases and isinstance(payload, list):
+    summary_only = args.summary_json or args.summary_text
+    if aliases and isinstance(payload, list) and not summary_only:
         print(f"Caricati {len(aliases)} alias autore (JSON in formato legacy).")
     df, meta, punch = flatten(payload, aliases)
 
+    if summary_only:
+        # Tutti gli autori, senza raggruppare la coda in "Altro" come fa il grafico
+        print_summary(summary_records(author_summary(df)), meta, args.summary_json)
+        return
+    import_plotting()
+
     start, end = meta["start_date"], meta["end_date"]
     project = meta.get("project") or git_project_name()
 
@@ -603,15 +1062,19 @@ def main():
 
     freq, bucket_name, trend_window = choose_bucket(start, end)
 
-    # Reindicizzazione sul range completo: i periodi senza attività devono comparire
-    # come vuoti, altrimenti il grafico comprime il tempo e il trend mente.
-    full = pd.date_range(start=start, end=end, freq="D")
-    grid = (df.pivot_table(index="date", columns="author",
-                           values=["churn", "commits"], aggfunc="sum")
-              .reindex(full).fillna(0))
-
-    churn_pivot = grid["churn"].resample(freq).sum()
-    commits_pivot = grid["commits"].resample(freq).sum()
+    # Aggregazione per bucket direttamente sulle righe sparse (solo i giorni con
+    # attività), senza materializzare una griglia giornaliera completa per ogni autore.
+    # Reindicizzazione sui bucket del range completo: i periodi senza attività devono
+    # comparire come vuoti, altrimenti il grafico comprime il tempo e il trend mente. I
+    # bucket si ricavano ricampionando i soli due estremi del range, così coincidono con
+    # quelli di un resample sull'intera griglia giornaliera.
+    buckets = pd.Series(0, index=pd.to_datetime([start, end])).resample(freq).sum().index
+    in_range = df[(df["date"] >= start) & (df["date"] <= end)]
+    grid = (in_range.groupby([pd.Grouper(key="date", freq=freq), "author"])[["churn", "commits"]]
+                    .sum().unstack("author").reindex(buckets).fillna(0))
+
+    churn_pivot = grid["churn"]
+    commits_pivot = grid["commits"]
     # Colonne nell'ordine dei colori assegnati
     cols = [a for a in author_order if a in churn_pivot.columns]
     churn_pivot = churn_pivot[cols]
@@ -620,16 +1083,16 @@ def main():
     label_fmt = "%Y-%m-%d" if freq == "D" else ("%Y-%m-%d" if freq == "W-MON" else "%Y-%m")
     labels = [d.strftime(label_fmt) for d in churn_pivot.index]
 
-    summary = pd.DataFrame({
-        "churn": df.groupby("author")["churn"].sum(),
-        "commit": df.groupby("author")["commits"].sum(),
-        "giorni_attivi": df[df["commits"] > 0].groupby("author")["date"].nunique(),
-        "file": df.groupby("author")["files"].sum(),
-        "indice": df.groupby("author")["index"].sum(),
-    }).fillna(0).sort_values("churn", ascending=False)
+    summary = author_summary(df)
 
     ownership = payload.get("ownership") if isinstance(payload, dict) else None
     has_ownership = bool(ownership and ownership.get("total_lines"))
+    ownership_series = payload.get("ownership_series") if isinstance(payload, dict) else None
+    has_series = bool(ownership_series and len(ownership_series.get("points", [])) >= 2)
+    directories = payload.get("directories") if isinstance(payload, dict) else None
+    dir_grid = directory_churn(directories, buckets, freq) if directories else None
+    hotspots = payload.get("hotspots") if isinstance(payload, dict) else None
+    has_hotspots = bool(hotspots and (hotspots.get("by_churn") or hotspots.get("by_touches")))
 
     apply_style()
     # Il punch card e l'ownership sono pannelli AGGIUNTIVI (righe extra sotto la griglia
@@ -641,8 +1104,14 @@ def main():
     extra_rows = []
     if has_punch:
         extra_rows.append(("punch", 0.7))
+    if dir_grid is not None:
+        extra_rows.append(("directories", 0.55))
+    if has_hotspots:
+        extra_rows.append(("hotspots", 0.75))
     if has_ownership:
         extra_rows.append(("ownership", 0.6))
+    if has_series:
+        extra_rows.append(("ownership_series", 0.6))
 
     n_extra = len(extra_rows)
     if n_extra:
@@ -691,6 +1160,20 @@ def main():
                      color=INK_MUTED, va="top")
         row += 1
 
+    if dir_grid is not None:
+        ax7 = panel_directories(fig, gs[row, :], dir_grid, labels, directories.get("depth", "?"))
+        ax7.text(0, -0.3, directories_caption(dir_grid), transform=ax7.transAxes,
+                 fontsize=8, color=INK_MUTED, va="top")
+        row += 1
+
+    if has_hotspots:
+        k = hotspots.get("k", "?")
+        panel_hotspots(fig.add_subplot(gs[row, 0]), hotspots.get("by_churn", []), "lines",
+                       f"File più modificati (primi {k})", "Righe aggiunte + rimosse")
+        panel_hotspots(fig.add_subplot(gs[row, 1]), hotspots.get("by_touches", []), "commits",
+                       f"File toccati più spesso (primi {k})", "Commit")
+        row += 1
+
     if has_ownership:
         ax6 = fig.add_subplot(gs[row, :])
         panel_ownership(ax6, ownership, colors)
@@ -698,6 +1181,13 @@ def main():
                  fontsize=8, color=INK_MUTED, va="top")
         row += 1
 
+    if has_series:
+        ax8 = fig.add_subplot(gs[row, :])
+        panel_ownership_series(ax8, ownership_series, colors)
+        ax8.text(0, -0.28, ownership_series_caption(ownership_series), transform=ax8.transAxes,
+                 fontsize=8, color=INK_MUTED, va="top")
+        row += 1
+
     # Una sola legenda per tutta la figura: l'identità autore è la stessa in ogni pannello.
     # Gli autori vengono prima, il trend per ultimo (non è una serie di dati). Le handle si
     # prendono da ax2 (churn), l'unico pannello con la linea di trend disegnata sopra.
@@ -722,13 +1212,15 @@ def main():
         # minimo che la ospita — right/top/bottom/hspace/wspace restano fissi: valori già
         # verificati sul contenuto di questo report (nessuna etichetta a destra dei valori
         # delle barre o vuoto ingiustificato sopra la prima riga extra).
-        fig.canvas.draw()
+        # Layout senza rasterizzare (matplotlib >= 3.6): serve solo la misura dei testi,
+        # i pixel li produce save_outputs, una volta per formato.
+        getattr(fig, "draw_without_rendering", fig.canvas.draw)()
         renderer = fig.canvas.get_renderer()
         current_left = fig.subplotpars.left
         min_x0 = 1.0
         for ax in fig.axes:
             for label in ax.get_yticklabels():
-                if not label.get_text():
+                if not label.get_text() or not label.get_visible():
                     continue
                 bbox = label.get_window_extent(renderer).transformed(fig.transFigure.inverted())
                 min_x0 = min(min_x0, bbox.x0)
@@ -738,9 +1230,14 @@ def main():
                              hspace=0.5, wspace=0.22)
     else:
         fig.tight_layout(rect=[0, 0.05, 1, 0.955])
-    fig.savefig(OUTPUT_FILENAME, dpi=200)
-    # Messaggio invariato: l'estensione VS Code lo intercetta via regex.
-    print(f"Grafico generato con successo: {OUTPUT_FILENAME}")
+    if meta.get("timings"):
+        fig.text(0.99, 0.004, timings_caption(meta["timings"]), ha="right", va="bottom",
+                 fontsize=7, color=INK_MUTED)
+    output_filename = args.output or OUTPUT_FILENAME
+    save_outputs(fig, output_filename, args.formats, args.preview)
+    if "png" in args.formats:
+        # Messaggio invariato: l'estensione VS Code lo intercetta via regex.
+        print(f"Grafico generato con successo: {output_filename}")
 
 
 if __name__ == "__main__":
@@ -39,17 +39,31 @@ ATTENZIONE: sono indicatori di attività, non misure di produttività o di quali
 Code review, design, mentoring e debugging difficile sono strutturalmente invisibili.
 """
 
+import argparse
 import json
+import math
 import os
 import sys
+from datetime import date
 
-import matplotlib
+# Librerie pesanti importate solo quando servono (import_numeric / import_plotting): un
+# input vuoto o non valido fallisce subito, e --summary-json/--summary-text non
+# importano mai matplotlib, che da solo è la parte più lenta dell'avvio.
+np = pd = matplotlib = plt = None
 
-matplotlib.use("Agg")
-import matplotlib.ticker
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
+
+def import_numeric():
+    global np, pd
+    import numpy as np
+    import pandas as pd
+
+
+def import_plotting():
+    global matplotlib, plt
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.ticker
+    import matplotlib.pyplot as plt
 
 # -----------------------------------------------------------------------------
 # Parametri delle metriche (mantenere allineati con plot_git.py)
@@ -76,6 +90,8 @@ SERIES = [
 MAX_SERIES = len(SERIES)
 OTHER_LABEL = "Altro"
 DONUT_MAX_SLICES = 6      # part-to-whole resta leggibile solo con pochi settori
+# Versione del formato colonnare prodotto con --columnar/--sidecar (vedi git_stats_engine.py)
+COLUMNAR_FORMAT = 3
 MAX_PROJECT_BARS = 12     # oltre, le etichette sull'asse X dei progetti si sovrappongono
 
 SURFACE = "#fcfcfb"
@@ -85,6 +101,11 @@ INK_MUTED = "#898781"
 GRIDLINE = "#e1e0d9"
 BASELINE = "#c3c2b7"
 
+OUTPUT_DPI = 200
+PREVIEW_DPI = 50          # --preview: leggibile a schermo, pronta in una frazione del tempo
+THUMB_WIDTH = 480         # larghezza massima (px) della miniatura (--formats thumb)
+OUTPUT_FORMATS = ("png", "svg", "thumb")
+
 
 # -----------------------------------------------------------------------------
 # Configurazione (alias autori: solo per retrocompatibilità con JSON vecchi)
@@ -130,11 +151,15 @@ def churn_of(added, deleted):
 
 
 def daily_index(added, deleted, files):
-    """Indice composito di un singolo giorno (additivo, cap per giorno)."""
-    if files <= 0:
-        return 0.0
-    churn = min(churn_of(added, deleted), DAILY_CHURN_CAP)
-    return W_CHURN * np.log1p(churn) + W_FILES * np.log1p(files)
+    """Indice composito per giorno (additivo, cap per giorno).
+
+    Vettoriale: accetta scalari o array NumPy (un elemento per giorno) e restituisce
+    un valore per elemento — 0 per i giorni senza file toccati.
+    """
+    files = np.asarray(files, dtype=float)
+    churn = np.minimum(churn_of(np.asarray(added), np.asarray(deleted)), DAILY_CHURN_CAP)
+    index = W_CHURN * np.log1p(churn) + W_FILES * np.log1p(np.maximum(files, 0))
+    return np.where(files > 0, index, 0.0)
 
 
 # -----------------------------------------------------------------------------
@@ -159,8 +184,88 @@ def read_payload():
         sys.exit(1)
 
 
+def read_payload_from_db(args):
+    """Payload dal database (--from-db) nel formato di git_multiproject_stats_collector.sh."""
+    sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+    try:
+        import git_activity_warehouse as warehouse
+    except ImportError:
+        print(f"Errore: --from-db richiede git_activity_warehouse.py accanto a {sys.argv[0]}.")
+        sys.exit(1)
+    try:
+        payload = warehouse.load_payload(args.from_db, args.start, args.end, args.project,
+                                         single=False)
+    except (FileNotFoundError, LookupError, warehouse.sqlite3.Error) as exc:
+        print(f"Errore: {exc}.")
+        sys.exit(1)
+    print("Avviso: dati dal database: i file per autore sono la somma dei file distinti di "
+          "ogni giorno, non i distinti del periodo.", file=sys.stderr)
+    return payload
+
+
+def is_columnar(payload):
+    """Vero per il formato colonnare v3 (git_multiproject_stats_collector.sh --columnar)."""
+    return (isinstance(payload, dict)
+            and (payload.get("metadata") or {}).get("format") == COLUMNAR_FORMAT)
+
+
+def daily_columns(table):
+    """Colonne della tabella giornaliera v3, come array NumPy.
+
+    Inline nel JSON, oppure nel sidecar .npy indicato dal JSON: in quel caso il file è
+    aperto in memory-map, senza copiarlo in memoria né passarlo dal parser JSON.
+    """
+    if "sidecar" in table:
+        try:
+            matrix = np.load(table["sidecar"], mmap_mode="r")
+        except (OSError, ValueError) as exc:
+            print(f"Errore: sidecar {table['sidecar']} non leggibile ({exc}).")
+            sys.exit(1)
+        return {name: matrix[i] for i, name in enumerate(table["columns"])}
+    return {name: np.asarray(values, dtype=np.int64) for name, values in table.items()}
+
+
+def flatten_columnar(payload):
+    """Formato v3 -> DataFrame per progetto/autore, senza cicli per riga.
+
+    `rows` porta già i totali per (progetto, autore) con nomi codificati come indici;
+    l'indice composito si calcola sui giorni di `daily` e si risomma per riga.
+    """
+    meta = dict(payload["metadata"])
+    rows = payload["rows"]
+    n = len(rows["project"])
+    if n == 0:
+        print("Nessun dato di attività trovato nel periodo: niente da rappresentare.")
+        sys.exit(0)
+    daily = daily_columns(payload["daily"])
+    index = np.bincount(
+        np.asarray(daily["row"], dtype=np.int64),
+        weights=daily_index(np.asarray(daily["added"], dtype=np.int64),
+                            np.asarray(daily["deleted"], dtype=np.int64),
+                            np.asarray(daily["files"], dtype=np.int64)),
+        minlength=n,
+    )
+    added = np.asarray(rows["added"], dtype=np.int64)
+    deleted = np.asarray(rows["deleted"], dtype=np.int64)
+    df = pd.DataFrame({
+        "project": np.asarray(payload["projects"], dtype=object)[np.asarray(rows["project"], dtype=np.int64)],
+        "author": np.asarray(payload["authors"], dtype=object)[np.asarray(rows["author"], dtype=np.int64)],
+        "commits": np.asarray(rows["commits"], dtype=np.int64),
+        "added": added,
+        "deleted": deleted,
+        "files": np.asarray(rows["files"], dtype=np.int64),
+        "churn": churn_of(added, deleted),
+        "active_days": np.asarray(rows["active_days"], dtype=np.int64),
+        "index": index,
+    })
+    return df, meta
+
+
 def flatten(payload, aliases):
     """Restituisce (DataFrame per progetto/autore, metadata)."""
+    if is_columnar(payload):
+        df, meta = flatten_columnar(payload)
+        return merge_identities(df), meta
     if isinstance(payload, dict) and "data" in payload:
         entries = payload["data"]
         meta = payload.get("metadata", {}) or {}
@@ -175,6 +280,10 @@ def flatten(payload, aliases):
 
     rows = []
     legacy_aggregate = False
+    # Dettaglio giornaliero in colonne piatte (riga di appartenenza + metriche): l'indice
+    # di ogni giorno si calcola poi in un'unica operazione vettoriale e si risomma per
+    # riga con np.bincount, invece di una chiamata Python per giorno.
+    day_row, day_added, day_deleted, day_files = [], [], [], []
     for entry in entries:
         author = entry.get("author_name") or entry.get("author") or "Sconosciuto"
         if aliases_needed:
@@ -183,12 +292,11 @@ def flatten(payload, aliases):
         days = entry.get("daily_data") or []
 
         if days:
-            index = sum(
-                daily_index(int(d.get("added", 0) or 0),
-                            int(d.get("deleted", 0) or 0),
-                            int(d.get("files", 0) or 0))
-                for d in days
-            )
+            day_row.extend([len(rows)] * len(days))
+            day_added.extend([int(d.get("added", 0) or 0) for d in days])
+            day_deleted.extend([int(d.get("deleted", 0) or 0) for d in days])
+            day_files.extend([int(d.get("files", 0) or 0) for d in days])
+            index = None   # calcolato sotto, per tutte le righe insieme
             active_days = entry.get("active_days")
             if active_days is None:
                 active_days = sum(1 for d in days if int(d.get("commits", 0) or 0) > 0)
@@ -196,9 +304,9 @@ def flatten(payload, aliases):
             # Formato legacy senza dettaglio giornaliero: l'indice va calcolato
             # sull'aggregato, dove il tetto anti-outlier satura. Lo segnaliamo.
             legacy_aggregate = True
-            index = daily_index(int(entry.get("added", 0) or 0),
-                                int(entry.get("deleted", 0) or 0),
-                                int(entry.get("files", 0) or 0))
+            index = float(daily_index(int(entry.get("added", 0) or 0),
+                                      int(entry.get("deleted", 0) or 0),
+                                      int(entry.get("files", 0) or 0)))
             active_days = entry.get("active_days") or 0
 
         added = int(entry.get("added", 0) or 0)
@@ -220,21 +328,37 @@ def flatten(payload, aliases):
         })
 
     if legacy_aggregate:
+        # Su stderr come gli altri "Avviso:": stdout resta pulito per --summary-json
         print("Avviso: JSON senza dettaglio giornaliero (formato precedente). "
               "L'indice composito è calcolato sull'aggregato di periodo e non è "
-              "confrontabile con quello dei report nuovi.")
+              "confrontabile con quello dei report nuovi.", file=sys.stderr)
 
     if not rows:
         print("Nessun dato di attività trovato nel periodo: niente da rappresentare.")
         sys.exit(0)
 
-    df = pd.DataFrame(rows)
-    # Gli alias possono aver unito due identità nello stesso progetto: riaggreghiamo.
-    df = (df.groupby(["project", "author"], as_index=False)
-            .agg({"commits": "sum", "added": "sum", "deleted": "sum",
-                  "files": "sum", "churn": "sum", "active_days": "max",
-                  "index": "sum"}))
-    return df, meta
+    if day_row:
+        per_row = np.bincount(
+            np.asarray(day_row, dtype=np.int64),
+            weights=daily_index(np.asarray(day_added, dtype=np.int64),
+                                np.asarray(day_deleted, dtype=np.int64),
+                                np.asarray(day_files, dtype=np.int64)),
+            minlength=len(rows),
+        )
+        for i, row in enumerate(rows):
+            if row["index"] is None:
+                row["index"] = per_row[i]
+
+    return merge_identities(pd.DataFrame(rows)), meta
+
+
+def merge_identities(df):
+    """Una riga per (progetto, autore), ordinata: gli alias possono aver unito due
+    identità nello stesso progetto, quindi si riaggrega."""
+    return (df.groupby(["project", "author"], as_index=False)
+              .agg({"commits": "sum", "added": "sum", "deleted": "sum",
+                    "files": "sum", "churn": "sum", "active_days": "max",
+                    "index": "sum"}))
 
 
 def assign_colors(authors_by_size):
@@ -513,16 +637,184 @@ def panel_table(ax, df):
             color=INK_MUTED, va="top")
 
 
+def timings_caption(timings):
+    """Piè di pagina con i tempi di raccolta (JSON prodotto con --timings dal collector).
+    Le fasi per repository (multi-progetto) sono sommate per nome: girano in parallelo,
+    quindi la somma può superare il totale."""
+    parts, sums, counts = [], {}, {}
+    for stage in timings.get("stages", []):
+        name = stage.get("stage", "?")
+        if name not in sums:
+            parts.append(name)
+        sums[name] = sums.get(name, 0.0) + float(stage.get("wall_s") or 0)
+        counts[name] = counts.get(name, 0) + (1 if stage.get("project") else 0)
+    labels = [f"{name} {sums[name]:.2f}s" + (f" ({counts[name]} repo)" if counts[name] else "")
+              for name in parts]
+    total = timings.get("total_s")
+    if total is not None:
+        labels.append(f"totale {float(total):.2f}s")
+    return "Tempi di raccolta (--timings): " + " · ".join(labels)
+
+
 # -----------------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------------
+# -----------------------------------------------------------------------------
+# Riepilogo senza grafico (--summary-json / --summary-text)
+# -----------------------------------------------------------------------------
+def author_summary(df):
+    """Riepilogo per autore su tutti i progetti, per churn decrescente. Come nel pannello
+    dei giorni attivi, giorni_attivi è la SOMMA sui progetti (lo stesso giorno su due
+    progetti conta due volte: il JSON multi-progetto non porta le date per autore)."""
+    return (df.groupby("author")
+              .agg(churn=("churn", "sum"), commit=("commits", "sum"),
+                   giorni_attivi=("active_days", "sum"), file=("files", "sum"),
+                   indice=("index", "sum"), progetti=("project", "nunique"))
+              .sort_values("churn", ascending=False))
+
+
+def summary_records(summary):
+    """Righe del riepilogo come dict di tipi nativi (churn ha al più un decimale: 0.4 × intero)."""
+    return [{
+        "author": author,
+        "churn": round(float(r["churn"]), 1),
+        "commit": int(r["commit"]),
+        "giorni_attivi": int(r["giorni_attivi"]),
+        "file": int(r["file"]),
+        "indice": round(float(r["indice"]), 3),
+        "progetti": int(r["progetti"]),
+    } for author, r in summary.iterrows()]
+
+
+def print_summary(records, meta, as_json):
+    if as_json:
+        json.dump({"metadata": {k: meta[k] for k in ("start_date", "end_date") if meta.get(k)},
+                   "authors": records}, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+    width = max([len("Autore")] + [len(r["author"]) for r in records])
+    print(f"Riepilogo {meta.get('start_date', 'N/A')} → {meta.get('end_date', 'N/A')} "
+          "(giorni attivi: somma sui progetti)")
+    print(f"{'Autore':<{width}}  {'Churn':>10}  {'Commit':>7}  {'Giorni att.':>11}  {'File':>7}  "
+          f"{'Indice':>8}  {'Progetti':>8}")
+    for r in records:
+        print(f"{r['author']:<{width}}  {r['churn']:>10.1f}  {r['commit']:>7}  "
+              f"{r['giorni_attivi']:>11}  {r['file']:>7}  {r['indice']:>8.1f}  {r['progetti']:>8}")
+
+
+# -----------------------------------------------------------------------------
+# Output: anteprima veloce e più formati da un'unica impaginazione
+# -----------------------------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Legge il JSON del collector da stdin e genera il report grafico.")
+    parser.add_argument(
+        "--preview", action="store_true",
+        help=f"scrive prima un'anteprima a bassa risoluzione ({PREVIEW_DPI} dpi) e ne stampa "
+             "il percorso, poi i file definitivi")
+    parser.add_argument(
+        "--formats", default="png",
+        help="formati da scrivere, separati da virgola: png, svg, thumb (default: png)")
+    parser.add_argument(
+        "--output", default=None,
+        help="percorso del PNG; gli altri formati ne prendono il nome "
+             "(default: git_activity_multi_project_report_<inizio>_<fine>.png nella cartella corrente)")
+    source = parser.add_argument_group(
+        "lettura dal database", "invece di stdin, legge le righe giornaliere caricate con "
+        "git_activity_warehouse.py ingest (gitstats ingest)")
+    source.add_argument("--from-db", metavar="PATH", help="database SQLite dell'attività")
+    source.add_argument("--start", help="inizio periodo (YYYY-MM-DD), con --from-db")
+    source.add_argument("--end", help="fine periodo (YYYY-MM-DD), con --from-db")
+    source.add_argument("--project", action="append",
+                        help="limita al progetto (ripetibile; default: tutti)")
+    summary = parser.add_mutually_exclusive_group()
+    summary.add_argument(
+        "--summary-json", action="store_true",
+        help="stampa solo il riepilogo per autore in JSON, senza grafico (non importa matplotlib)")
+    summary.add_argument(
+        "--summary-text", action="store_true",
+        help="stampa solo il riepilogo per autore come tabella di testo, senza grafico")
+    args = parser.parse_args()
+    args.formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in args.formats if f not in OUTPUT_FORMATS]
+    if unknown or not args.formats:
+        parser.error(f"--formats: valori ammessi {', '.join(OUTPUT_FORMATS)}")
+    if args.from_db:
+        for name in ("start", "end"):
+            try:
+                date.fromisoformat(getattr(args, name) or "")
+            except ValueError:
+                parser.error(f"--from-db richiede --{name} in formato YYYY-MM-DD")
+    elif args.start or args.end or args.project:
+        parser.error("--start, --end e --project valgono solo con --from-db")
+    return args
+
+
+def save_thumbnail(fig, path):
+    """Miniatura ricavata dai pixel del PNG appena renderizzato (media per blocchi), senza
+    ridisegnare la figura; se quel buffer non è disponibile, render diretto a bassa dpi."""
+    width_px = round(fig.get_figwidth() * OUTPUT_DPI)
+    height_px = round(fig.get_figheight() * OUTPUT_DPI)
+    step = max(1, math.ceil(width_px / THUMB_WIDTH))
+    try:
+        rgba = np.asarray(fig.canvas.buffer_rgba())
+    except AttributeError:
+        rgba = None
+    if rgba is None or rgba.shape[:2] != (height_px, width_px):
+        fig.savefig(path, dpi=OUTPUT_DPI / step)
+        return
+    h, w = (height_px // step) * step, (width_px // step) * step
+    blocks = rgba[:h, :w].reshape(h // step, step, w // step, step, 4)
+    plt.imsave(path, blocks.mean(axis=(1, 3)).round().astype(np.uint8))
+
+
+def save_outputs(fig, png_path, formats, preview):
+    """Scrive tutti i formati richiesti dalla STESSA figura, già impaginata una volta sola.
+
+    L'anteprima (--preview) viene per prima e il suo percorso è stampato subito (flush):
+    chi legge stdout, come l'estensione VS Code, può mostrarla mentre il resto è ancora in
+    scrittura. PNG e SVG sono due render inevitabili (raster e vettoriale); la miniatura
+    riusa i pixel del PNG. Restituisce i percorsi scritti, nell'ordine.
+    """
+    stem = os.path.splitext(png_path)[0]
+    written = []
+    if preview:
+        path = f"{stem}_preview.png"
+        fig.savefig(path, dpi=PREVIEW_DPI)
+        print(f"Anteprima generata: {path}", flush=True)
+        written.append(path)
+    if "png" in formats:
+        fig.savefig(png_path, dpi=OUTPUT_DPI)
+        written.append(png_path)
+    # Subito dopo il PNG: la miniatura ne legge il buffer di pixel ancora in memoria
+    if "thumb" in formats:
+        path = f"{stem}_thumb.png"
+        save_thumbnail(fig, path)
+        print(f"Generato anche: {path}")
+        written.append(path)
+    if "svg" in formats:
+        path = f"{stem}.svg"
+        fig.savefig(path)
+        print(f"Generato anche: {path}")
+        written.append(path)
+    return written
+
+
 def main():
-    payload = read_payload()
+    args = parse_args()
+    payload = read_payload_from_db(args) if args.from_db else read_payload()
+    import_numeric()
     aliases = load_aliases()
-    if aliases and isinstance(payload, list):
+    summary_only = args.summary_json or args.summary_text
+    if aliases and isinstance(payload, list) and not summary_only:
         print(f"Caricati {len(aliases)} alias autore (JSON in formato legacy).")
     df, meta = flatten(payload, aliases)
 
+    if summary_only:
+        print_summary(summary_records(author_summary(df)), meta, args.summary_json)
+        return
+    import_plotting()
+
     start = meta.get("start_date", "N/A")
     end = meta.get("end_date", "N/A")
 
@@ -561,14 +853,19 @@ def main():
                    bbox_to_anchor=(0.5, 0.005))
 
     fig.tight_layout(rect=[0, 0.05, 1, 0.955])
+    if meta.get("timings"):
+        fig.text(0.99, 0.004, timings_caption(meta["timings"]), ha="right", va="bottom",
+                 fontsize=7, color=INK_MUTED)
 
     safe_start = str(start).replace(" ", "_").replace("/", "-")
     safe_end = str(end).replace(" ", "_").replace("/", "-")
-    output_filename = f"git_activity_multi_project_report_{safe_start}_{safe_end}.png"
-    fig.savefig(output_filename, dpi=200)
-    # La forma "Report multi-progetto ... generato con successo: <file>" va mantenuta:
-    # l'estensione VS Code la intercetta via regex (il testo fra i due estremi è libero).
-    print(f"\nReport multi-progetto (indice di attività) generato con successo: {output_filename}")
+    output_filename = (args.output
+                       or f"git_activity_multi_project_report_{safe_start}_{safe_end}.png")
+    save_outputs(fig, output_filename, args.formats, args.preview)
+    if "png" in args.formats:
+        # La forma "Report multi-progetto ... generato con successo: <file>" va mantenuta:
+        # l'estensione VS Code la intercetta via regex (il testo fra i due estremi è libero).
+        print(f"\nReport multi-progetto (indice di attività) generato con successo: {output_filename}")
 
 
 if __name__ == "__main__":
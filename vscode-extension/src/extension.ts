@@ -1,32 +1,16 @@
 import * as vscode from 'vscode';
 import * as cp from 'child_process';
+import * as crypto from 'crypto';
 import * as path from 'path';
 import * as fs from 'fs';
+import * as net from 'net';
+import * as os from 'os';
 
 export function activate(context: vscode.ExtensionContext) {
     console.log('L\'estensione "git-activity-reports" è attiva!');
 
     let disposableProject = vscode.commands.registerCommand('git-activity.analyzeProject', async () => {
-        const workspaceFolders = vscode.workspace.workspaceFolders;
-        if (!workspaceFolders) {
-            vscode.window.showErrorMessage('Nessun workspace aperto.');
-            return;
-        }
-
-        // Tenta di trovare il repo git nella cartella corrente o genitrice
-        const activeEditor = vscode.window.activeTextEditor;
-        let startPath = workspaceFolders[0].uri.fsPath;
-        
-        if (activeEditor) {
-            startPath = path.dirname(activeEditor.document.uri.fsPath);
-        }
-
-        const repoPath = findClosestGitRepo(startPath);
-        if (repoPath) {
-            runAnalysis(context, [repoPath]);
-        } else {
-            vscode.window.showErrorMessage('Non è stato possibile trovare un repository Git nel contesto attuale.');
-        }
+        analyzeCurrentProject(context, false);
     });
 
     let disposableWorkspace = vscode.commands.registerCommand('git-activity.analyzeWorkspace', async () => {
@@ -60,7 +44,40 @@ export function activate(context: vscode.ExtensionContext) {
         });
     });
 
-    context.subscriptions.push(disposableProject, disposableWorkspace);
+    // Rigenera l'ultimo report ignorando la cache dei risultati (o, se non ce n'è uno in
+    // questa sessione, quello del progetto corrente).
+    let disposableRefresh = vscode.commands.registerCommand('git-activity.refreshReport', async () => {
+        if (lastAnalysis) {
+            runAnalysis(context, lastAnalysis, true);
+        } else {
+            analyzeCurrentProject(context, true);
+        }
+    });
+
+    context.subscriptions.push(disposableProject, disposableWorkspace, disposableRefresh);
+}
+
+function analyzeCurrentProject(context: vscode.ExtensionContext, force: boolean) {
+    const workspaceFolders = vscode.workspace.workspaceFolders;
+    if (!workspaceFolders) {
+        vscode.window.showErrorMessage('Nessun workspace aperto.');
+        return;
+    }
+
+    // Tenta di trovare il repo git nella cartella corrente o genitrice
+    const activeEditor = vscode.window.activeTextEditor;
+    let startPath = workspaceFolders[0].uri.fsPath;
+    
+    if (activeEditor) {
+        startPath = path.dirname(activeEditor.document.uri.fsPath);
+    }
+
+    const repoPath = findClosestGitRepo(startPath);
+    if (repoPath) {
+        runAnalysis(context, [repoPath], force);
+    } else {
+        vscode.window.showErrorMessage('Non è stato possibile trovare un repository Git nel contesto attuale.');
+    }
 }
 
 function findClosestGitRepo(startPath: string): string | null {
@@ -104,14 +121,14 @@ function findAllGitRepos(basePath: string, maxDepth: number = 3, currentDepth: n
     return repos;
 }
 
-// Verifica se un comando è risolvibile dal PATH (es. `gitstats`/`gitstats-multi`
-// installati dal pacchetto .deb in /usr/local/bin) senza invocare una shell.
-function commandExistsOnPath(cmd: string): boolean {
+// Risolve un comando dal PATH (es. `gitstats`/`gitstats-multi` installati dal pacchetto
+// .deb in /usr/local/bin) senza invocare una shell: percorso reale, o null se assente.
+function findOnPath(cmd: string): string | null {
     try {
-        cp.execFileSync('which', [cmd], { stdio: 'ignore' });
-        return true;
+        const out = cp.execFileSync('which', [cmd], { stdio: ['ignore', 'pipe', 'ignore'] });
+        return fs.realpathSync(out.toString().trim());
     } catch {
-        return false;
+        return null;
     }
 }
 
@@ -143,23 +160,165 @@ function resolveDate(value: string): string | null {
 //      un'estensione installata da .vsix NON ha gli script bash del repo accanto a sé
 //      (context.extensionPath punta a ~/.vscode/extensions/..., non al checkout): senza
 //      questo fallback l'installazione da .vsix/Marketplace non può funzionare.
+// scriptDir è la cartella degli script (collector e plotter), usata per la chiave della
+// cache dei risultati.
 function resolveRunner(context: vscode.ExtensionContext, isMulti: boolean):
-    { cmd: string; baseArgs: string[] } | null {
+    { cmd: string; baseArgs: string[]; scriptDir: string } | null {
     const devScriptName = isMulti ? 'gitstat-multi.sh' : 'gitstat.sh';
     const devScriptPath = path.join(context.extensionPath, '..', devScriptName);
     if (fs.existsSync(devScriptPath)) {
-        return { cmd: 'bash', baseArgs: [devScriptPath] };
+        return { cmd: 'bash', baseArgs: [devScriptPath], scriptDir: path.dirname(devScriptPath) };
     }
 
     const pathCommand = isMulti ? 'gitstats-multi' : 'gitstats';
-    if (commandExistsOnPath(pathCommand)) {
-        return { cmd: pathCommand, baseArgs: [] };
+    const resolved = findOnPath(pathCommand);
+    if (resolved) {
+        return { cmd: pathCommand, baseArgs: [], scriptDir: path.dirname(resolved) };
     }
 
     return null;
 }
 
-async function runAnalysis(context: vscode.ExtensionContext, paths: string[]) {
+// Cache dei risultati: i PNG già generati, in globalStorage (fuori dai repository), uno per
+// chiave. La chiave cambia se cambia qualunque cosa da cui dipende il grafico:
+//   - la richiesta (repository, date risolte in YYYY-MM-DD — "30 days ago" scorre ogni giorno);
+//   - top-level e SHA di HEAD di ogni repository (i collector analizzano HEAD);
+//   - percorso e data di modifica del file alias in uso (stesso ordine di ricerca dei collector);
+//   - versione dell'estensione e data di modifica degli script (collector/plotter aggiornati).
+// Nessuna invalidazione manuale: una voce obsoleta non viene più cercata ed esce per LRU
+// (data di ultimo accesso = mtime del file, aggiornata a ogni riuso).
+const MAX_CACHED_REPORTS = 50;
+const KEYED_SCRIPTS = [
+    'git_stats_collector.sh', 'git_multiproject_stats_collector.sh', 'git_stats_engine.py',
+    'plot_git.py', 'plot_multiproject.py',
+];
+
+// Ultima analisi lanciata in questa sessione, per il comando "Rigenera".
+let lastAnalysis: string[] | undefined;
+
+function findAliasesFile(cwd: string, scriptDir: string | null): string | null {
+    const xdg = process.env.XDG_CONFIG_HOME || path.join(os.homedir(), '.config');
+    const candidates = [
+        path.join(cwd, 'git-activity-aliases.json'),
+        path.join(xdg, 'git-activity-reports', 'git-activity-aliases.json'),
+        path.join(xdg, 'git-activity-git-activity-aliases.json'),
+        ...(scriptDir ? [path.join(scriptDir, 'git-activity-aliases.json')] : []),
+        '/etc/git-activity-reports/git-activity-aliases.json',
+    ];
+    return candidates.find(candidate => fs.existsSync(candidate)) || null;
+}
+
+// null se la chiave non è calcolabile (es. repository senza commit): niente cache.
+function reportCacheKey(context: vscode.ExtensionContext, request: { paths: string[] },
+                        scriptDir: string | null): string | null {
+    const hash = crypto.createHash('sha1');
+    hash.update(JSON.stringify(request));
+    try {
+        for (const repo of request.paths) {
+            hash.update(cp.execFileSync('git', ['-C', repo, 'rev-parse', '--show-toplevel', 'HEAD'],
+                                        { stdio: ['ignore', 'pipe', 'ignore'] }));
+        }
+    } catch {
+        return null;
+    }
+    const aliases = findAliasesFile(request.paths[0], scriptDir);
+    if (aliases) {
+        hash.update(`${aliases}\0${fs.statSync(aliases).mtimeMs}`);
+    }
+    hash.update(String(context.extension.packageJSON.version));
+    if (scriptDir) {
+        for (const name of KEYED_SCRIPTS) {
+            const script = path.join(scriptDir, name);
+            if (fs.existsSync(script)) {
+                hash.update(`${name}\0${fs.statSync(script).mtimeMs}`);
+            }
+        }
+    }
+    return hash.digest('hex');
+}
+
+function reportCacheDir(context: vscode.ExtensionContext): string {
+    const dir = path.join(context.globalStorageUri.fsPath, 'reports');
+    fs.mkdirSync(dir, { recursive: true });
+    return dir;
+}
+
+function evictReportCache(dir: string) {
+    const entries = fs.readdirSync(dir)
+        .filter(name => name.endsWith('.png'))
+        .map(name => ({ file: path.join(dir, name), mtime: fs.statSync(path.join(dir, name)).mtimeMs }))
+        .sort((a, b) => b.mtime - a.mtime);
+    for (const entry of entries.slice(MAX_CACHED_REPORTS)) {
+        fs.rmSync(entry.file, { force: true });
+    }
+}
+
+// Server residente (git_activity_server.py): se è in ascolto, il report è prodotto da un
+// processo che ha già pandas/matplotlib importati e il JSON del collector in memoria,
+// quindi una richiesta ripetuta costa solo il rendering. Stesso percorso del socket
+// calcolato dal server: $GIT_ACTIVITY_SOCKET, $XDG_RUNTIME_DIR, poi la cartella cache.
+interface ServerReply {
+    ok: boolean;
+    error?: string;
+    png?: string | null;
+    warnings?: string[];
+}
+
+function serverSocketPath(): string {
+    if (process.env.GIT_ACTIVITY_SOCKET) {
+        return process.env.GIT_ACTIVITY_SOCKET;
+    }
+    if (process.env.XDG_RUNTIME_DIR) {
+        return path.join(process.env.XDG_RUNTIME_DIR, 'git-activity-reports.sock');
+    }
+    const cacheDir = process.env.GIT_ACTIVITY_CACHE_DIR ||
+        path.join(process.env.XDG_CACHE_HOME || path.join(os.homedir(), '.cache'), 'git-activity-reports');
+    return path.join(cacheDir, 'server.sock');
+}
+
+// Una richiesta al server: null se non è raggiungibile (non avviato, socket orfano,
+// risposta illeggibile) — in quel caso si ripiega sul lancio degli script.
+function requestFromServer(request: object): Promise<ServerReply | null> {
+    return new Promise<ServerReply | null>((resolve) => {
+        const socketPath = serverSocketPath();
+        if (!fs.existsSync(socketPath)) {
+            resolve(null);
+            return;
+        }
+        let data = '';
+        const socket = net.createConnection(socketPath, () => {
+            socket.write(JSON.stringify(request) + '\n');
+        });
+        socket.on('data', (chunk) => { data += chunk.toString(); });
+        socket.on('end', () => {
+            try {
+                resolve(JSON.parse(data));
+            } catch {
+                resolve(null);
+            }
+        });
+        socket.on('error', () => resolve(null));
+    });
+}
+
+// Anche in caso di successo, stderr può contenere avvisi utili (es. "nessun
+// commit trovato prima di...", ownership non calcolata, autore non trovato).
+// stderr non è mai vuoto su una run normale (skip fetch, alias caricati, i
+// warning di libreria di Python) — mostrare tutto ad ogni run sarebbe rumore
+// che nasconde l'avviso vero: i collector prefissano SEMPRE con "Avviso:" ciò
+// che è pensato per l'utente (vedi git_stats_collector.sh e
+// git_multiproject_stats_collector.sh), quindi si filtra su quel prefisso.
+function showAvvisi(lines: string[]) {
+    const avvisi = lines
+        .map(line => line.trim())
+        .filter(line => line.startsWith('Avviso:'));
+    if (avvisi.length > 0) {
+        vscode.window.showWarningMessage(avvisi.join(' '));
+    }
+}
+
+async function runAnalysis(context: vscode.ExtensionContext, paths: string[], force: boolean = false) {
+    lastAnalysis = paths;
     const config = vscode.workspace.getConfiguration('git-activity');
     const startDateRaw = config.get<string>('startDate') || '30 days ago';
     const endDateRaw = config.get<string>('endDate') || 'now';
@@ -175,15 +334,48 @@ async function runAnalysis(context: vscode.ExtensionContext, paths: string[]) {
         return;
     }
 
+    const isMulti = paths.length > 1;
+    const runner = resolveRunner(context, isMulti);
+    const request = { paths, start: startDate, end: endDate };
+    const key = reportCacheKey(context, request, runner ? runner.scriptDir : null);
+    const cacheDir = key ? reportCacheDir(context) : null;
+    const cachedPng = cacheDir ? path.join(cacheDir, `${key}.png`) : null;
+    if (cachedPng && !force && fs.existsSync(cachedPng)) {
+        const now = new Date();
+        fs.utimesSync(cachedPng, now, now);
+        showImageInWebview(context, cachedPng);
+        return;
+    }
+
+    // Report pronto: entra in cache (e si applica il tetto LRU) solo se è stato scritto lì.
+    const showReport = (pngPath: string) => {
+        if (cacheDir && pngPath === cachedPng) {
+            evictReportCache(cacheDir);
+        }
+        showImageInWebview(context, pngPath);
+    };
+
     vscode.window.withProgress({
         location: vscode.ProgressLocation.Notification,
         title: paths.length > 1 ? `Analisi di ${paths.length} repository...` : "Generazione grafico attività Git...",
         cancellable: false
     }, async (progress) => {
-        return new Promise<void>((resolve, reject) => {
-            const isMulti = paths.length > 1;
-            const runner = resolveRunner(context, isMulti);
+        const reply = await requestFromServer(cachedPng ? { ...request, output: cachedPng } : request);
+        if (reply) {
+            if (!reply.ok) {
+                vscode.window.showErrorMessage(`Errore nell'esecuzione: ${reply.error}`);
+            } else {
+                showAvvisi(reply.warnings || []);
+                if (reply.png) {
+                    showReport(reply.png);
+                } else {
+                    vscode.window.showInformationMessage('Analisi completata, ma il file immagine non è stato individuato nel log.');
+                }
+            }
+            return;
+        }
 
+        return new Promise<void>((resolve, reject) => {
             if (!runner) {
                 const devScriptName = isMulti ? 'gitstat-multi.sh' : 'gitstat.sh';
                 const pathCommand = isMulti ? 'gitstats-multi' : 'gitstats';
@@ -195,7 +387,12 @@ async function runAnalysis(context: vscode.ExtensionContext, paths: string[]) {
                 return;
             }
 
+            // Con la cache il PNG va direttamente lì (--output): niente git_stats.png nel
+            // repository, sovrascritto da ogni intervallo diverso.
             const args = isMulti ? [startDate, endDate, ...paths] : [startDate, endDate];
+            if (cachedPng) {
+                args.unshift('--output', cachedPng);
+            }
 
             cp.execFile(runner.cmd, [...runner.baseArgs, ...args], { cwd: paths[0] }, (error, stdout, stderr) => {
                 if (error) {
@@ -204,20 +401,7 @@ async function runAnalysis(context: vscode.ExtensionContext, paths: string[]) {
                     return;
                 }
 
-                // Anche in caso di successo, stderr può contenere avvisi utili (es. "nessun
-                // commit trovato prima di...", ownership non calcolata, autore non trovato).
-                // stderr non è mai vuoto su una run normale (skip fetch, alias caricati, i
-                // warning di libreria di Python) — mostrare tutto ad ogni run sarebbe rumore
-                // che nasconde l'avviso vero: i collector prefissano SEMPRE con "Avviso:" ciò
-                // che è pensato per l'utente (vedi git_stats_collector.sh e
-                // git_multiproject_stats_collector.sh), quindi si filtra su quel prefisso.
-                const avvisi = stderr
-                    .split('\n')
-                    .map(line => line.trim())
-                    .filter(line => line.startsWith('Avviso:'));
-                if (avvisi.length > 0) {
-                    vscode.window.showWarningMessage(avvisi.join(' '));
-                }
+                showAvvisi(stderr.split('\n'));
 
                 const outputMatch = stdout.match(/Grafico generato con successo: (.*\.png)/) ||
                                    stdout.match(/Report multi-progetto .* generato con successo: (.*\.png)/);
@@ -225,7 +409,7 @@ async function runAnalysis(context: vscode.ExtensionContext, paths: string[]) {
                 if (outputMatch && outputMatch[1]) {
                     const pngName = outputMatch[1].trim();
                     const pngPath = path.isAbsolute(pngName) ? pngName : path.join(paths[0], pngName);
-                    showImageInWebview(context, pngPath);
+                    showReport(pngPath);
                 } else {
                     vscode.window.showInformationMessage('Analisi completata, ma il file immagine non è stato individuato nel log.');
                 }